@@ -0,0 +1,138 @@
+"""
+Рестарт после простоя: dp.start_polling из main.py против PollingSession,
+в которой уже лежит бэклог, плюс «живой» трафик сразу после старта.
+
+Бэклог по --chats чатам, по трети каждого вида:
+  - старые: путь мастера, отправленный 5–10 минут назад;
+  - кликеры: 5–15 свежих нажатий по меню (разделы, сценарии, /menu, Help);
+  - свежие: путь мастера за последнюю минуту.
+Живой трафик: каждые --live-every-ms новый чат шлёт /start; меряется время
+до ответа. С catch-up (по умолчанию) и без (--no-catch-up, CATCH_UP=0):
+задержка живых чатов, когда она вернулась к норме, и сколько вызовов Bot API
+ушло на бэклог.
+
+    python benchmarks/bench_catch_up.py
+    python benchmarks/bench_catch_up.py --chats 1000 --latency-ms 50
+    python benchmarks/bench_catch_up.py --no-catch-up
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiogram import Bot
+
+from bench_updates import load_main, percentile, scenario_scripts
+from fake_telegram import FAKE_TOKEN, PollingSession, message_payload
+
+MENU_TAPS = ("Create task formulation", "Vocabulary", "Grammar", "Reading", "Back to sections", "Help", "/menu")
+
+
+class LiveSession(PollingSession):
+    """PollingSession, по которой стенд узнаёт, что бот ответил в чат."""
+
+    def __init__(self, latency: float):
+        super().__init__(latency, history=1 << 30)
+        self.replied: dict[int, asyncio.Future] = {}
+
+    async def make_request(self, bot, method, timeout=None):
+        result = await super().make_request(bot, method, timeout)
+        future = self.replied.get(getattr(method, "chat_id", None))
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+        return result
+
+
+def backlog(chats: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    scripts = [s for paths in scenario_scripts().values() for s in paths]
+    starts = [script[0] for script in scripts]  # кнопки сценариев — на пути от меню
+    now = time.time()
+    per_chat: dict[int, list[tuple[float, str]]] = defaultdict(list)
+    for i in range(chats):
+        chat_id = 1000 + i
+        kind = i % 3
+        if kind == 0:
+            script = ("/menu", *rng.choice(scripts))
+            t0 = now - rng.uniform(300, 600)
+            per_chat[chat_id] = [(t0 + j * 2, text) for j, text in enumerate(script)]
+        elif kind == 1:
+            taps = [rng.choice(MENU_TAPS + tuple(starts[:10])) for _ in range(rng.randint(5, 15))]
+            t0 = now - rng.uniform(20, 60)
+            per_chat[chat_id] = [(t0 + j, text) for j, text in enumerate(taps)]
+        else:
+            script = ("/menu", *rng.choice(scripts))
+            t0 = now - 60
+            per_chat[chat_id] = [(t0 + j * 0.5, text) for j, text in enumerate(script)]
+    # в getUpdates — в порядке прихода
+    events = sorted((t, chat_id, text) for chat_id, own in per_chat.items() for t, text in own)
+    return [message_payload(n, chat_id, text, date=int(t)) for n, (t, chat_id, text) in enumerate(events, 1)]
+
+
+async def run(args) -> None:
+    os.environ["CATCH_UP"] = "0" if args.no_catch_up else "1"
+    main = load_main(Path(tempfile.mkdtemp(prefix="bench_catch_up_")))
+    session = LiveSession(args.latency_ms / 1000)
+    bot = Bot(FAKE_TOKEN, session=session)
+    updates = backlog(args.chats, args.seed)
+    for payload in updates:
+        session.push(payload)
+
+    polling = asyncio.create_task(main.dp.start_polling(
+        bot, handle_signals=False, close_bot_session=False, polling_timeout=1,
+        tasks_concurrency_limit=main.POLL_BACKLOG, catch_up_backlog=main.CATCH_UP))
+    start = time.perf_counter()
+    samples: list[tuple[float, float]] = []  # (когда отправлен, задержка)
+    update_id = len(updates) + 1
+    live_chat = 10 ** 6
+    waiting = []
+    while time.perf_counter() - start < args.seconds:
+        live_chat += 1
+        session.replied[live_chat] = asyncio.get_running_loop().create_future()
+        sent = time.perf_counter()
+        session.push(message_payload(update_id, live_chat, "/start", date=int(time.time())))
+        update_id += 1
+        waiting.append((sent, session.replied[live_chat]))
+        await asyncio.sleep(args.live_every_ms / 1000)
+    for sent, future in waiting:
+        await asyncio.wait([future, polling], return_when=asyncio.FIRST_COMPLETED)
+        if polling.done():
+            polling.result()  # polling упал — показать почему, а не ждать ответа вечно
+        samples.append((sent - start, future.result() - sent))
+    await main.dp.stop_polling()
+    await polling
+
+    live = sorted(latency for _, latency in samples)
+    first = sorted(latency for at, latency in samples if at < 1.0)
+    # восстановление: с какого момента все живые чаты отвечают быстрее --slo-ms
+    slow = [at for at, latency in samples if latency * 1e3 > args.slo_ms]
+    recovered = (max(slow) + args.live_every_ms / 1000) if slow else 0.0
+    backlog_calls = session.calls["sendMessage"] - len(samples)
+    print(f"catch-up={'off' if args.no_catch_up else 'on'} chats={args.chats} backlog={len(updates)} "
+          f"latency={args.latency_ms}ms live every {args.live_every_ms}ms")
+    print(f"live /start p50 {percentile(live, 0.5) * 1e3:8.1f} ms  p99 {percentile(live, 0.99) * 1e3:8.1f} ms  "
+          f"first second p50 {percentile(first, 0.5) * 1e3:8.1f} ms  max {first[-1] * 1e3:8.1f} ms")
+    print(f"live latency under {args.slo_ms:.0f} ms from t={recovered:.2f}s; "
+          f"sendMessage for the backlog: {backlog_calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=600, help="чатов в бэклоге")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="имитация RTT одного вызова Bot API")
+    parser.add_argument("--live-every-ms", type=float, default=50.0, help="период живых /start")
+    parser.add_argument("--seconds", type=float, default=6.0, help="сколько секунд слать живые /start")
+    parser.add_argument("--slo-ms", type=float, default=200.0, help="порог «нормальной» задержки")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-catch-up", action="store_true", help="CATCH_UP=0: бэклог как есть")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Стоимость клавиатуры в одном ответе: сборка ReplyKeyboardMarkup заново
+(как было в answer_with_keyboard) против готового объекта из keyboards.reply_kb.
+
+    python benchmarks/bench_keyboards.py
+    python benchmarks/bench_keyboards.py -n 50000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup  # noqa: E402
+
+from keyboards import MAIN_MENU, VOCABULARY_MENU, reply_kb, warm_up  # noqa: E402
+
+CASES = {
+    "yes/no (2 buttons)": ["Yes", "No"],
+    "main menu (4 buttons)": list(MAIN_MENU),
+    "vocabulary menu (7 buttons)": list(VOCABULARY_MENU),
+}
+
+
+def build(options: list[str]) -> ReplyKeyboardMarkup:
+    """Прежний способ: новый объект на каждый ответ."""
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=str(o))] for o in options],
+        resize_keyboard=True,
+    )
+
+
+def bench(fn, options: list[str], n: int) -> float:
+    for _ in range(200):  # прогрев
+        fn(options)
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(options)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=20_000, help="ответов на замер")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = warm_up()
+    print(f"warm-up: {count} keyboards in {(time.perf_counter() - start) * 1e3:.1f} ms\n")
+
+    print(f"{'case':30} {'build':>10} {'cached':>10} {'speedup':>8}")
+    for name, options in CASES.items():
+        old = bench(build, options, args.n)
+        new = bench(reply_kb, options, args.n)
+        print(f"{name:30} {old:7.2f} us {new:7.2f} us {old / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
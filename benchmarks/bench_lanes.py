@@ -0,0 +1,121 @@
+"""
+Очереди чатов (chat_lanes.py) под бэклогом: как после простоя polling,
+все апдейты чата приходят разом, и на каждый — отдельная задача
+(handle_as_tasks в aiogram). Ответы каждого чата сверяются с эталоном —
+теми же путями мастера, отправленными по одному, с ожиданием ответа.
+
+Ответы записываются в порядке доставки, RTT каждого вызова случаен
+(0..2×--latency-ms), как в сети. --no-lanes снимает ChatLanesMiddleware
+с dp: апдейты одного чата обрабатываются внахлёст, и ответ на второе
+сообщение обгоняет ответ на первое.
+
+    python benchmarks/bench_lanes.py
+    python benchmarks/bench_lanes.py --chats 200 --latency-ms 40 --concurrency 16
+    python benchmarks/bench_lanes.py --no-lanes
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiogram import Bot
+
+from bench_updates import load_main, scenario_scripts
+from fake_telegram import FAKE_TOKEN, RecordingSession, message_update
+
+import chat_lanes  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+
+
+class JitterSession(RecordingSession):
+    """RecordingSession со случайным RTT; вызов записывается, когда «дошёл»."""
+
+    def __init__(self, latency: float):
+        super().__init__(history=1 << 30)
+        self.max_latency = 2 * latency
+
+    async def make_request(self, bot, method, timeout=None):
+        await asyncio.sleep(random.uniform(0, self.max_latency))
+        return await super().make_request(bot, method, timeout)
+
+
+def replies(session: RecordingSession, base: int, chats: int) -> list[list[str]]:
+    by_chat: dict[int, list[str]] = defaultdict(list)
+    for name, chat_id, text in session.sent:
+        if name == "sendMessage" and base <= chat_id < base + chats:
+            by_chat[chat_id - base].append(text)
+    return [by_chat[i] for i in range(chats)]
+
+
+async def run(args) -> None:
+    os.environ["UPDATE_CONCURRENCY"] = str(args.concurrency)
+    main = load_main(Path(tempfile.mkdtemp(prefix="bench_lanes_")))
+    dp = main.dp
+    lanes = next(m for m in dp.update.outer_middleware if isinstance(m, chat_lanes.ChatLanesMiddleware))
+    if args.no_lanes:
+        dp.update.outer_middleware.unregister(lanes)
+    session = JitterSession(args.latency_ms / 1000)
+    bot = Bot(FAKE_TOKEN, session=session)
+
+    scripts = [s for paths in scenario_scripts().values() for s in paths]
+    n = min(args.chats, len(scripts))
+    work = [[text for script in scripts[i::n] for text in script] for i in range(n)]
+    update_ids = itertools.count(1)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        # эталон: чаты параллельно, внутри чата — по одному апдейту
+        async def chat(chat_id: int, texts: list[str]):
+            for text in texts:
+                await dp.feed_update(bot, message_update(bot, next(update_ids), chat_id, text))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(chat(10_000 + i, texts) for i, texts in enumerate(work)))
+        sequential = time.perf_counter() - start
+        expected = replies(session, 10_000, n)
+
+        # бэклог: все апдейты сразу, по задаче на апдейт, чаты вперемешку
+        peak = 0
+        tasks = []
+        start = time.perf_counter()
+        for step in range(max(map(len, work))):
+            for i, texts in enumerate(work):
+                if step < len(texts):
+                    update = message_update(bot, next(update_ids), 20_000 + i, texts[step])
+                    tasks.append(asyncio.create_task(dp.feed_update(bot, update)))
+        while not all(task.done() for task in tasks):
+            peak = max(peak, lanes.in_flight)
+            await asyncio.sleep(0.001)
+        burst = time.perf_counter() - start
+        got = replies(session, 20_000, n)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+    total = sum(map(len, work))
+    wrong = sum(a != b for a, b in zip(got, expected))
+    print(f"chats={n} updates={total} latency={args.latency_ms}ms "
+          f"lanes={'off' if args.no_lanes else f'on, concurrency {args.concurrency}'}")
+    print(f"sequential per chat  {sequential:6.2f}s {total / sequential:8.0f} updates/s")
+    print(f"backlog as tasks     {burst:6.2f}s {total / burst:8.0f} updates/s"
+          + ("" if args.no_lanes else f", peak in flight {peak}"))
+    print(f"chats with wrong replies: {wrong}/{n}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50, help="чатов")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="средний RTT одного вызова Bot API")
+    parser.add_argument("--concurrency", type=int, default=chat_lanes.UPDATE_CONCURRENCY,
+                        help="UPDATE_CONCURRENCY для прогона")
+    parser.add_argument("--no-lanes", action="store_true", help="без ChatLanesMiddleware")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Журнал действий: старая таблица logs (имя, текст кнопки и время строкой
+в каждой строке, без индексов) против схемы v2 из db_utils (словарь
+actions, users, events с ts в мс и индексами).
+
+Стенд пишет --rows синтетических строк в старом формате (тексты — пути
+мастера из scenarios, --users пользователей за --days дней), переносит их
+migrate_legacy и сравнивает:
+  - байт на строку в таблице и в каждом индексе (dbstat, после VACUUM);
+    старой таблице для честного сравнения добавлены такие же индексы;
+  - время запросов аналитики: история одного пользователя за день и
+    число нажатий одной кнопки по часам за неделю.
+
+    python benchmarks/bench_log_schema.py
+    python benchmarks/bench_log_schema.py --rows 1000000 --users 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench_updates import scenario_scripts
+
+import db_utils  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+
+LEGACY_SCHEMA = """
+CREATE TABLE logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    time_utc TEXT NOT NULL,
+    action TEXT NOT NULL
+);
+"""
+
+# те же выборки, что у events_user_ts и events_action_ts
+LEGACY_INDEXES = """
+CREATE INDEX logs_user_time ON logs (user_id, time_utc);
+CREATE INDEX logs_action_time ON logs (action, time_utc);
+"""
+
+QUERIES = {
+    "user history, 1 day": (
+        "SELECT time_utc, action FROM logs WHERE user_id = :user AND time_utc >= :day_iso ORDER BY time_utc",
+        "SELECT ts, action_id FROM events WHERE user_id = :user AND ts >= :day_ms ORDER BY ts",
+    ),
+    "button per hour, 7 days": (
+        "SELECT substr(time_utc, 1, 13), count(*) FROM logs WHERE action = :action AND time_utc >= :week_iso "
+        "GROUP BY 1",
+        "SELECT ts / 3600000, count(*) FROM events "
+        "WHERE action_id = (SELECT id FROM actions WHERE text = :action) AND ts >= :week_ms GROUP BY 1",
+    ),
+}
+
+
+def legacy_rows(rows: int, users: int, days: float, seed: int):
+    rng = random.Random(seed)
+    texts = [text for paths in scenario_scripts().values() for script in paths for text in script]
+    texts += ["/start", "/menu", "Help", "Back to sections"] * 20
+    end = time.time()
+    start = end - days * 86400
+    for t in sorted(rng.uniform(start, end) for _ in range(rows)):
+        user_id = 10 ** 8 + rng.randrange(users)
+        yield (user_id, f"student_{user_id % 100_000:05d}",
+               datetime.fromtimestamp(t, timezone.utc).isoformat(), rng.choice(texts))
+
+
+def sizes(path: Path, names: tuple[str, ...]) -> dict[str, int]:
+    """Байт на диске у таблиц и индексов names (страницы целиком, после VACUUM)."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return {name: conn.execute("SELECT sum(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0] or 0
+                for name in names}
+    finally:
+        conn.close()
+
+
+def timed(conn: sqlite3.Connection, sql: str, params: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat
+
+
+def sample(path: Path) -> tuple[int, str]:
+    """Самый активный пользователь и самая частая кнопка — чтобы запросам было что вернуть."""
+    conn = sqlite3.connect(path)
+    try:
+        user = conn.execute("SELECT user_id FROM logs GROUP BY 1 ORDER BY count(*) DESC LIMIT 1").fetchone()[0]
+        action = conn.execute("SELECT action FROM logs GROUP BY 1 ORDER BY count(*) DESC LIMIT 1").fetchone()[0]
+    finally:
+        conn.close()
+    return user, action
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300_000, help="строк журнала")
+    parser.add_argument("--users", type=int, default=5_000, help="пользователей")
+    parser.add_argument("--days", type=float, default=30, help="за сколько дней")
+    parser.add_argument("--repeat", type=int, default=20, help="повторов каждого запроса")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_log_schema_"))
+    db_utils.DB_PATH = workdir / "logs.db"
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    conn.executescript(LEGACY_SCHEMA + LEGACY_INDEXES)
+    with conn:
+        conn.executemany("INSERT INTO logs (user_id, username, time_utc, action) VALUES (?,?,?,?)",
+                         legacy_rows(args.rows, args.users, args.days, args.seed))
+    conn.close()
+    legacy = sizes(db_utils.DB_PATH, ("logs", "logs_user_time", "logs_action_time"))
+
+    now = time.time()
+    user, action = sample(db_utils.DB_PATH)
+    params = {
+        "user": user, "action": action,
+        "day_iso": datetime.fromtimestamp(now - 86400, timezone.utc).isoformat(), "day_ms": int(now - 86400) * 1000,
+        "week_iso": datetime.fromtimestamp(now - 7 * 86400, timezone.utc).isoformat(),
+        "week_ms": int(now - 7 * 86400) * 1000,
+    }
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    legacy_times = {name: timed(conn, sql, params, args.repeat) for name, (sql, _) in QUERIES.items()}
+    conn.close()
+
+    db_utils.init_db()
+    start = time.perf_counter()
+    moved = db_utils.migrate_legacy(pause=0)
+    migrate = time.perf_counter() - start
+    v2 = sizes(db_utils.DB_PATH, ("events", "events_user_ts", "events_action_ts", "actions", "users"))
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    v2_times = {name: timed(conn, sql, params, args.repeat) for name, (_, sql) in QUERIES.items()}
+    actions, users = (conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in ("actions", "users"))
+    conn.close()
+
+    print(f"rows={args.rows} users={args.users} days={args.days:g}; v2: {actions} actions, {users} users")
+    print(f"migration: {moved} rows in {migrate:.2f}s ({moved / migrate:.0f} rows/s)")
+    print(f"{'':32} {'legacy':>12} {'v2':>12}")
+    rows = [("table", legacy["logs"], v2["events"]),
+            ("index (user, time)", legacy["logs_user_time"], v2["events_user_ts"]),
+            ("index (action, time)", legacy["logs_action_time"], v2["events_action_ts"]),
+            ("actions + users", 0, v2["actions"] + v2["users"])]
+    rows.append(("total", sum(r[1] for r in rows), sum(r[2] for r in rows)))
+    for name, old, new in rows:
+        print(f"{name + ', bytes/row':32} {old / args.rows:12.1f} {new / args.rows:12.1f}")
+    for name in QUERIES:
+        print(f"{name + ', ms':32} {legacy_times[name] * 1e3:12.2f} {v2_times[name] * 1e3:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Пул воркеров (worker_pool.py) без Telegram: родитель раскладывает JSON
+апдейтов по процессам, Sender отправляет ответы в RecordingSession.
+
+Скрипты — пути мастера из bench_updates.py, разложенные по --chats чатам;
+все апдейты отдаются пулу сразу, в порядке внутри каждого чата. Замер —
+от первого апдейта до последнего ответа. Для каждого --workers из списка
+последовательность ответов каждого чата сверяется с эталоном — тем же
+прогоном через dp.feed_update в одном процессе, по очереди.
+
+    python benchmarks/bench_pool.py
+    python benchmarks/bench_pool.py --workers 1,2,4,8 --chats 200 --latency-ms 40
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from aiogram import Bot
+
+from bench_updates import load_main, scenario_scripts
+from fake_telegram import FAKE_TOKEN, RecordingSession, message_payload, message_update
+
+import send_scheduler  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+import worker_pool  # noqa: E402
+
+
+def chat_work(chats: int, repeat: int) -> dict[int, list[str]]:
+    scripts = [s for paths in scenario_scripts().values() for s in paths] * repeat
+    n = min(chats, len(scripts))
+    return {1000 + i: [text for script in scripts[i::n] for text in script] for i in range(n)}
+
+
+def replies_by_chat(session: RecordingSession) -> dict[int, list[str]]:
+    by_chat: dict[int, list[str]] = defaultdict(list)
+    for name, chat_id, text in session.sent:
+        if name == "sendMessage":
+            by_chat[chat_id].append(text)
+    return by_chat
+
+
+async def reference(work: dict[int, list[str]]) -> dict[int, list[str]]:
+    """Эталон: тот же dp в этом процессе, чат за чатом."""
+    main = load_main(Path(os.getcwd()))
+    session = RecordingSession(history=1 << 30)
+    bot = Bot(FAKE_TOKEN, session=session)
+    await main.dp.emit_startup(bot=bot, dispatcher=main.dp)
+    try:
+        update_id = 0
+        for chat_id, texts in work.items():
+            for text in texts:
+                update_id += 1
+                await main.dp.feed_update(bot, message_update(bot, update_id, chat_id, text))
+    finally:
+        await main.dp.emit_shutdown(bot=bot, dispatcher=main.dp)
+    return replies_by_chat(session)
+
+
+async def run_pool(workers: int, work: dict[int, list[str]], latency: float) -> tuple[float, RecordingSession]:
+    session = RecordingSession(latency, history=1 << 30)
+    bot = Bot(FAKE_TOKEN, session=session)
+    warnings = logging.StreamHandler()
+    warnings.setLevel(logging.WARNING)
+    # без ограничения скорости: меряем сами процессы, а не лимит Bot API
+    unlimited = send_scheduler.SendScheduler(1e9, 1e9, chat_rate=1e9, chat_burst=1e9, group_rate=1e9)
+    pool = worker_pool.WorkerPool(bot, workers, unlimited, [warnings])
+    await pool.start()
+    try:
+        # прогрев: по апдейту в каждый воркер, пока все не импортировали main.py
+        warm = {worker_pool.shard_of(message_payload(0, c, "/start"), workers): c for c in range(1, 1000)}
+        for i, chat_id in enumerate(warm.values()):
+            await pool.dispatch(message_payload(i, chat_id, "/start"))
+        while session.calls["sendMessage"] < len(warm):
+            await asyncio.sleep(0.01)
+        session.calls.clear()
+        session.sent.clear()
+
+        total = sum(len(texts) for texts in work.values())
+        start = time.perf_counter()
+        update_id = 1_000_000
+        for step in range(max(len(texts) for texts in work.values())):
+            for chat_id, texts in work.items():
+                if step < len(texts):
+                    update_id += 1
+                    await pool.dispatch(message_payload(update_id, chat_id, texts[step]))
+        while session.calls["sendMessage"] < total:
+            await asyncio.sleep(0.001)
+        return time.perf_counter() - start, session
+    finally:
+        await pool.stop()
+
+
+async def bench(args) -> None:
+    workdir = Path(tempfile.mkdtemp(prefix="bench_pool_"))
+    os.chdir(workdir)
+    os.environ.setdefault("BOT_TOKEN", FAKE_TOKEN)
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("LOG_CONSOLE", "0")
+    os.environ["SESSION_DB"] = str(workdir / "sessions.db")
+
+    work = chat_work(args.chats, args.repeat)
+    total = sum(len(texts) for texts in work.values())
+    expected = await reference(work)
+    print(f"chats={len(work)} updates={total} latency={args.latency_ms}ms cpus={os.cpu_count()}  (workdir {workdir})")
+    print(f"{'workers':>7} {'seconds':>8} {'updates/s':>10}  order")
+    for workers in (int(x) for x in args.workers.split(",")):
+        # свежие sessions.db на каждый прогон: сценарии начинаются с чистых сессий
+        os.environ["SESSION_DB"] = str(workdir / f"sessions-{workers}.db")
+        wall, session = await run_pool(workers, work, args.latency_ms / 1000)
+        got = replies_by_chat(session)
+        mismatched = [c for c in work if got.get(c) != expected.get(c)]
+        order = "ok" if not mismatched else f"{len(mismatched)} chats differ"
+        print(f"{workers:7} {wall:8.2f} {total / wall:10.0f}  {order}", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="размеры пула через запятую")
+    parser.add_argument("--chats", type=int, default=100, help="одновременных чатов")
+    parser.add_argument("--repeat", type=int, default=1, help="проходов по путям мастера")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="имитация RTT одного вызова Bot API")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
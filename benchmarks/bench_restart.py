@@ -0,0 +1,150 @@
+"""
+Рестарт посреди бэклога: сколько апдейтов бот обработает дважды.
+Дочерний процесс поднимает dp из main.py на PollingSession; «Telegram»
+хранит подтверждённый offset в файле (подтверждение — как у Bot API:
+offset следующего getUpdates).
+
+Первый запуск останавливается после --stop-after ответов — штатно
+(dp.stop_polling, как на деплое) или, с --kill, падает (os._exit). Второй
+запуск в том же каталоге дорабатывает бэклог. Каждый пишет update_id,
+дошедшие до хендлеров, в handled.log.
+
+Штатная остановка не подтверждает последнюю пачку, и Telegram присылает
+её снова: без учёта (--no-ledger: без DedupMiddleware и ResumeOffset) она
+обрабатывается второй раз. При падении aiogram уже подтвердил всё
+полученное; «потеряно» — подтверждённое, но не обработанное: его Telegram
+не пришлёт, учёт тут не поможет.
+
+    python benchmarks/bench_restart.py
+    python benchmarks/bench_restart.py --no-ledger
+    python benchmarks/bench_restart.py --kill --updates 3000 --stop-after 1234
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from aiogram import Bot
+
+from bench_updates import load_main, scenario_scripts
+from fake_telegram import FAKE_TOKEN, PollingSession, message_payload
+
+import update_ledger  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+
+
+class HandledLog:
+    """Внешняя мидлварь после DedupMiddleware: update_id каждого апдейта, дошедшего до обработки."""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "a", buffering=1)
+        self.count = 0
+
+    async def __call__(self, handler, event, data):
+        self.file.write(f"{event.update_id}\n")
+        self.count += 1
+        return await handler(event, data)
+
+
+class TelegramState(PollingSession):
+    """PollingSession, подтверждённый offset которой переживает процесс."""
+
+    def __init__(self, state: Path, updates: list[dict], stop_after: int, kill: bool):
+        super().__init__(0.002, history=1 << 30)
+        self.state = state
+        self.stop_after = stop_after
+        self.kill = kill
+        self.stopping: asyncio.Future = asyncio.get_running_loop().create_future()
+        confirmed = json.loads(state.read_text())["confirmed"] if state.exists() else 0
+        for payload in updates:
+            if payload["update_id"] >= confirmed:
+                self.push(payload)
+
+    async def make_request(self, bot, method, timeout=None):
+        offset = getattr(method, "offset", None)
+        if method.__api_method__ == "getUpdates" and offset is not None:
+            self.state.write_text(json.dumps({"confirmed": offset}))
+        result = await super().make_request(bot, method, timeout)
+        if method.__api_method__ == "sendMessage" and self.calls["sendMessage"] == self.stop_after:
+            if self.kill:
+                os._exit(1)  # падение: ни shutdown, ни финальной записи updates.db
+            self.stopping.set_result(None)
+        return result
+
+
+def workload(count: int) -> list[dict]:
+    texts = [text for paths in scenario_scripts().values() for script in paths for text in script]
+    return [message_payload(i, 1000 + i % 50, texts[i % len(texts)]) for i in range(1, count + 1)]
+
+
+async def child(args) -> None:
+    workdir = Path(args.workdir)
+    os.environ["UPDATE_FLUSH_INTERVAL"] = str(args.flush_interval)
+    os.environ["CATCH_UP"] = "0"
+    main = load_main(workdir)
+    updates = workload(args.updates)
+    session = TelegramState(workdir / "telegram.json", updates, args.stop_after, args.kill)
+    bot = Bot(FAKE_TOKEN, session=session)
+    if args.no_ledger:
+        dedup = next(m for m in main.dp.update.outer_middleware if isinstance(m, update_ledger.DedupMiddleware))
+        main.dp.update.outer_middleware.unregister(dedup)
+    else:
+        bot.session.middleware(update_ledger.ResumeOffset(main.ledger))
+
+    handled = main.dp.update.outer_middleware(HandledLog(workdir / "handled.log"))
+
+    polling = asyncio.create_task(main.dp.start_polling(bot, handle_signals=False, close_bot_session=False,
+                                                        polling_timeout=1, tasks_concurrency_limit=100))
+    # до конца бэклога: «Telegram» подтвердил последний апдейт, и обработка затихла
+    last = updates[-1]["update_id"]
+    count = -1
+    while not session.stopping.done() and (count != handled.count or not (
+            session.state.exists() and json.loads(session.state.read_text())["confirmed"] > last)):
+        count = handled.count
+        await asyncio.wait([session.stopping], timeout=0.3)
+    await main.dp.stop_polling()
+    await polling
+
+
+def parent(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_restart_")
+    command = [sys.executable, __file__, "--child", "--workdir", workdir, "--updates", str(args.updates),
+               "--flush-interval", str(args.flush_interval)] + (["--no-ledger"] if args.no_ledger else [])
+    subprocess.run(command + ["--stop-after", str(args.stop_after)] + (["--kill"] if args.kill else []),
+                   capture_output=True, text=True)
+    first = (Path(workdir) / "handled.log").read_text().split()
+    second = subprocess.run(command + ["--stop-after", "0"], capture_output=True, text=True)
+    if second.returncode:
+        raise SystemExit(second.stderr)
+    handled = (Path(workdir) / "handled.log").read_text().split()
+    twice = len(handled) - len(set(handled))
+    lost = args.updates - len(set(handled))
+    print(f"updates={args.updates} {'killed' if args.kill else 'stopped'} after {args.stop_after} replies, "
+          f"ledger={'off' if args.no_ledger else f'on, flush every {args.flush_interval}s'}")
+    print(f"handled: first run {len(first)}, second run {len(handled) - len(first)}; "
+          f"twice {twice}, lost {lost}  (workdir {workdir})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000, help="апдейтов в бэклоге")
+    parser.add_argument("--stop-after", type=int, default=750, help="ответов до остановки первого запуска")
+    parser.add_argument("--kill", action="store_true", help="первый запуск падает, а не останавливается")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="UPDATE_FLUSH_INTERVAL")
+    parser.add_argument("--no-ledger", action="store_true", help="без DedupMiddleware и ResumeOffset")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args))
+    else:
+        parent(args)
+
+
+if __name__ == "__main__":
+    main()
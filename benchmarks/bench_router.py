@@ -0,0 +1,129 @@
+"""
+Стоимость диспетчеризации одного апдейта: прежняя цепочка фильтров aiogram
+(~35 хендлеров F.text == ... перед catch-all) против CompiledRouter.
+
+Хендлеры пустые — меряется только выбор хендлера самим aiogram'ом.
+
+    python benchmarks/bench_router.py
+    python benchmarks/bench_router.py -n 50000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram import Bot, F, Router  # noqa: E402
+from aiogram.filters import Command, CommandStart  # noqa: E402
+from aiogram.types import Message  # noqa: E402
+
+from routing import CompiledRouter  # noqa: E402
+
+# кнопки в том порядке, в каком они были зарегистрированы в main.py
+BUTTONS = [
+    "Help", "Back to main menu", "Back to sections", "Create task formulation",
+    "Vocabulary", "Grammar", "Reading",
+    "Labelling", "Categorisation", "Word-building", "Matching", "Odd one out",
+    "Synonyms/antonyms/definitions/lexical sets",
+    "Grammar Multiple Choice", "Sentence/dialogue completion", "Transformation", "Error Correction",
+    "Reading Multiple Choice", "True/False",
+    "Back to Vocabulary", "Back to Grammar", "Back to Reading",
+    "Feedback",
+]
+EXTRAS = {
+    "additional_instructions": ("+", "-"),
+    "extras_work_mode": ("Individually", "In pairs", "In groups"),
+    "extras_time": ("1 min", "2 mins", "3 mins"),
+}
+FEEDBACK_WAITING: set[int] = set()
+STATE = "labelling_word_list_option"
+
+
+async def noop(message: Message):
+    return None
+
+
+def legacy_router() -> Router:
+    """Копия прежней цепочки регистрации хендлеров из main.py."""
+    rt = Router()
+    rt.message(CommandStart())(noop)
+    rt.message(Command("menu"))(noop)
+    for text in BUTTONS:
+        rt.message(F.text == text)(noop)
+    rt.message(Command("cancel"))(noop)
+    rt.message(lambda m: m.chat.id in FEEDBACK_WAITING)(noop)
+    rt.message(F.text == "Practice task formulation")(noop)
+    for texts in EXTRAS.values():
+        rt.message(F.text.in_(set(texts)))(noop)
+    rt.message()(noop)
+    return rt
+
+
+def compiled_router() -> Router:
+    table = CompiledRouter()
+    table.button("/start", "/menu", "/cancel", *BUTTONS)(noop)
+    table.button("Practice task formulation", except_states=("feedback",))(noop)
+    for state, texts in EXTRAS.items():
+        table.on(state, *texts)(noop)
+    table.default("feedback", noop)
+    table.default(STATE, noop)
+    table.fallback(noop)
+    table.compile()
+
+    rt = Router()
+
+    @rt.message()
+    async def dispatch_message(message: Message):
+        state = "feedback" if message.chat.id in FEEDBACK_WAITING else STATE
+        return await table.resolve(state, message.text)(message)
+
+    return rt
+
+
+def make_message(text: str) -> Message:
+    return Message.model_validate({
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+        "text": text,
+    })
+
+
+async def bench(router: Router, message: Message, n: int, bot: Bot) -> float:
+    for _ in range(200):  # прогрев
+        await router.propagate_event("message", message, bot=bot)
+    start = time.perf_counter()
+    for _ in range(n):
+        await router.propagate_event("message", message, bot=bot)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=20_000, help="апдейтов на замер")
+    args = parser.parse_args()
+
+    cases = {
+        "menu button (Help)": make_message("Help"),
+        "scenario start (True/False)": make_message("True/False"),
+        "mid-wizard answer (Yes)": make_message("Yes"),
+        "free text": make_message("Food and drinks"),
+    }
+    # токен фиктивный: сетевых запросов бенчмарк не делает
+    bot = Bot("123456:bench")
+    legacy, compiled = legacy_router(), compiled_router()
+    print(f"{'case':32} {'filter chain':>14} {'compiled':>10} {'speedup':>8}")
+    for name, message in cases.items():
+        old = await bench(legacy, message, args.n, bot)
+        new = await bench(compiled, message, args.n, bot)
+        print(f"{name:32} {old:11.1f} us {new:7.1f} us {old / new:7.1f}x")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Планировщик отправок (send_scheduler.py) против FloodSession — Bot API
+с лимитами Telegram, который на превышение отвечает 429.
+
+Интерактив: --chats чатов, каждый раз в --think секунд получает ответ
+бота (как пользователь, идущий по мастеру); меряется время от вызова
+send_message до результата. Фаза 1 — только интерактив, фаза 2 — он же
+плюс рассылка --bulk сообщений по разным чатам внутри bulk(). Задержка
+интерактива во второй фазе должна остаться такой же, как в первой.
+--no-scheduler — те же фазы без планировщика: видно, сколько 429.
+
+    python benchmarks/bench_sender.py
+    python benchmarks/bench_sender.py --bulk 1000 --chats 20 --seconds 15
+    python benchmarks/bench_sender.py --no-scheduler
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from bench_updates import percentile
+from fake_telegram import FAKE_TOKEN, FloodSession
+
+import metrics  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+import send_scheduler  # noqa: E402
+
+
+async def interactive(bot: Bot, chats: int, think: float, seconds: float) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    rejected = 0
+    deadline = time.perf_counter() + seconds
+
+    async def chat(chat_id: int, offset: float) -> None:
+        nonlocal rejected
+        await asyncio.sleep(offset)  # пользователи отвечают не в такт
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await bot.send_message(chat_id, "step")
+                latencies.append(time.perf_counter() - start)
+            except TelegramRetryAfter:
+                rejected += 1
+            await asyncio.sleep(think)
+
+    await asyncio.gather(*(chat(1 + i, think * i / chats) for i in range(chats)))
+    return latencies, rejected
+
+
+async def broadcast(bot: Bot, count: int) -> tuple[int, int, float]:
+    start = time.perf_counter()
+
+    async def one(chat_id: int) -> bool:
+        try:
+            await bot.send_message(chat_id, "news")
+            return True
+        except TelegramRetryAfter:
+            return False
+
+    with send_scheduler.bulk():
+        results = await asyncio.gather(*(one(100_000 + i) for i in range(count)))
+    return sum(results), count - sum(results), time.perf_counter() - start
+
+
+def report(name: str, latencies: list[float], rejected: int) -> None:
+    latencies.sort()
+    p50, p95, p99 = (percentile(latencies, q) * 1e3 for q in (0.5, 0.95, 0.99)) if latencies else (0, 0, 0)
+    print(f"{name:22} sent {len(latencies):5}  429 {rejected:5}  "
+          f"p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  p99 {p99:8.2f} ms")
+
+
+async def run(args) -> None:
+    session = FloodSession(args.latency_ms / 1000, rate=args.rate, burst=args.rate,
+                           chat_rate=send_scheduler.CHAT_RATE, chat_burst=send_scheduler.CHAT_BURST)
+    bot = Bot(FAKE_TOKEN, session=session)
+    if not args.no_scheduler:
+        bot.session.middleware(send_scheduler.SendScheduler(rate=args.rate, burst=args.rate))
+    print(f"rate={args.rate}/s chats={args.chats} think={args.think}s bulk={args.bulk} "
+          f"scheduler={'off' if args.no_scheduler else 'on'}")
+
+    latencies, rejected = await interactive(bot, args.chats, args.think, args.seconds)
+    report("interactive", latencies, rejected)
+
+    bulk_task = asyncio.create_task(broadcast(bot, args.bulk))
+    latencies, rejected = await interactive(bot, args.chats, args.think, args.seconds)
+    report("interactive + bulk", latencies, rejected)
+    sent, failed, wall = await bulk_task
+    print(f"{'bulk':22} sent {sent:5}  429 {failed:5}  in {wall:.1f}s ({sent / wall:.1f}/s)")
+
+    if not args.no_scheduler:
+        for prio, child in sorted(metrics.SEND_WAIT_SECONDS.children.items()):
+            print(f"wait {prio[0]:17} {child.count:6} calls, mean {child.sum / child.count * 1e3:8.2f} ms")
+        print(f"retry_after total: {dict(metrics.SEND_RETRY_AFTER.children)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10, help="интерактивных чатов")
+    parser.add_argument("--think", type=float, default=2.0, help="секунд между ответами в одном чате")
+    parser.add_argument("--seconds", type=float, default=10.0, help="длительность каждой фазы")
+    parser.add_argument("--bulk", type=int, default=400, help="сообщений в рассылке")
+    parser.add_argument("--rate", type=float, default=send_scheduler.SEND_RATE, help="лимит бота, сообщений/с")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="имитация RTT одного вызова Bot API")
+    parser.add_argument("--no-scheduler", action="store_true", help="слать напрямую, без send_scheduler")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
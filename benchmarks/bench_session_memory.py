@@ -0,0 +1,67 @@
+"""
+Память на сессию: старый dict из reset_session против слотового Session.
+
+    python benchmarks/bench_session_memory.py            # 1 000 000 сессий
+    python benchmarks/bench_session_memory.py -n 100000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sessions import Session  # noqa: E402
+
+
+def legacy_session(task_type=None) -> dict:
+    # точная копия словаря, который раньше строил reset_session
+    return {
+        "task_type": task_type,
+        "state": None,
+        "labelling": None, "categorising": None, "word_building": None, "matching": None,
+        "odd_one_out": None, "synonyms": None,
+        "grammar_mc": None, "grammar_completion": None, "grammar_transformation": None,
+        "grammar_error_correction": None,
+        "reading_mc": None, "reading_tf": None,
+        "pending_instruction": None,
+        "extras": {
+            "work_mode": None,
+            "time": None,
+        },
+    }
+
+
+def measure(factory, n: int) -> float:
+    """Байт на сессию, включая запись в словаре sessions[chat_id]."""
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    sessions = {}
+    for chat_id in range(10**9, 10**9 + n):
+        sessions[chat_id] = factory()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    gc.collect()
+    return (used - base) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=1_000_000, help="число синтетических чатов")
+    args = parser.parse_args()
+
+    before = measure(legacy_session, args.n)
+    after = measure(Session, args.n)
+    print(f"sessions: {args.n:,}")
+    print(f"dict (before):    {before:8.1f} bytes/session")
+    print(f"Session (after):  {after:8.1f} bytes/session")
+    print(f"saved:            {before - after:8.1f} bytes/session ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
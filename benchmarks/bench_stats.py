@@ -0,0 +1,104 @@
+"""
+/stats из сводок (usage_stats) против тех же цифр прямым SQL по events:
+активные пользователи по дням за неделю, топ действий за 24 часа, старты
+и завершения сценариев за неделю.
+
+events растёт ступенями --sizes (события равномерно за --days дней,
+--users пользователей, тексты — пути мастера из scenarios плюс строки
+DONE). На каждой ступени новые строки сворачиваются fold_all (только
+они — от отметки), затем меряются report() и прямые запросы.
+
+    python benchmarks/bench_stats.py
+    python benchmarks/bench_stats.py --sizes 100000,1000000,3000000 --users 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from bench_updates import scenario_scripts
+
+import db_utils  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+import usage_stats  # noqa: E402
+
+RAW_QUERIES = (
+    # DAU за неделю
+    "SELECT ts / 86400000, count(DISTINCT user_id) FROM events WHERE ts >= :week GROUP BY 1",
+    # топ действий за сутки
+    "SELECT a.text, count(*) FROM events e JOIN actions a ON a.id = e.action_id WHERE e.ts >= :day "
+    "GROUP BY e.action_id ORDER BY 2 DESC LIMIT 10",
+    # действия, из которых считаются старты и завершения, за неделю
+    "SELECT action_id, count(*) FROM events WHERE ts >= :week GROUP BY action_id",
+)
+
+
+def fill(conn: sqlite3.Connection, encoder: db_utils.Encoder, rows: int, users: int, days: float,
+         rng: random.Random) -> None:
+    scripts = [(key, script) for key, paths in scenario_scripts().items() for script in paths]
+    end = time.time()
+    batch = []
+    while len(batch) < rows:
+        key, script = rng.choice(scripts)
+        user_id = 10 ** 8 + rng.randrange(users)
+        t = rng.uniform(end - days * 86400, end - 60)
+        for i, text in enumerate((*script, f"DONE: {key}")):
+            batch.append((user_id, None, int((t + i * 3) * 1000), text, None))
+    batch.sort(key=lambda row: row[2])
+    with conn:
+        conn.executemany("INSERT INTO events (user_id, ts, action_id, detail) VALUES (?,?,?,?)",
+                         encoder.encode(conn, batch[:rows]))
+
+
+def classify(text: str):
+    if text.startswith("DONE: "):
+        return usage_stats.DONE, text[6:]
+    return None
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,300000,1000000", help="размеры events по ступеням")
+    parser.add_argument("--users", type=int, default=5_000, help="пользователей")
+    parser.add_argument("--days", type=float, default=60, help="за сколько дней события")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов каждого замера")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db_utils.DB_PATH = Path(tempfile.mkdtemp(prefix="bench_stats_")) / "logs.db"
+    db_utils.init_db()
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    encoder = db_utils.Encoder()
+    rollups = usage_stats.UsageRollups(db_utils.DB_PATH, classify)
+    rng = random.Random(args.seed)
+    now = time.time()
+    params = {"week": int((now - 7 * 86400) * 1000), "day": int((now - 86400) * 1000)}
+
+    print(f"users={args.users} days={args.days:g}")
+    print(f"{'events':>10} {'fold rows/s':>12} {'/stats ms':>10} {'raw SQL ms':>11}")
+    total = 0
+    for size in map(int, args.sizes.split(",")):
+        fill(conn, encoder, size - total, args.users, args.days, rng)
+        start = time.perf_counter()
+        folded = rollups.fold_all()
+        fold = time.perf_counter() - start
+        total = size
+        report = timed(lambda: usage_stats.format_report(rollups.report(now)), args.repeat)
+        raw = timed(lambda: [conn.execute(sql, params).fetchall() for sql in RAW_QUERIES], args.repeat)
+        print(f"{total:>10} {folded / fold:>12.0f} {report * 1e3:>10.2f} {raw * 1e3:>11.1f}")
+    rollups.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Пропускная способность бота целиком, без Telegram: dp из main.py,
+синтетические Update через Dispatcher.feed_update, Bot на RecordingSession.
+В замер входит всё, что стоит на пути апдейта в проде: DBLoggerMiddleware
+(фоновый писатель logs.db), CompiledRouter, мастер, клавиатуры, лог в файл.
+
+Для каждого сценария — все его пути мастера до конца (кнопки и свободный
+ввод), как их обходит wizard_paths: меню → раздел → сценарий → ответы → «-».
+Пути раскладываются по N чатам, чаты идут параллельно, внутри чата — строго
+по очереди, как у живого пользователя. Последняя строка — все сценарии вперемешку.
+
+    python benchmarks/bench_updates.py
+    python benchmarks/bench_updates.py --chats 200 --repeat 5
+    python benchmarks/bench_updates.py --chats 50 --latency-ms 40   # с RTT до Bot API
+    python benchmarks/bench_updates.py --scenario matching --scenario reading_tf
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fake_telegram import FAKE_TOKEN, make_bot, message_update  # noqa: E402
+
+EXTRAS_STATE = "additional_instructions"
+
+
+def load_main(workdir: Path):
+    """
+    Импорт main.py в рабочем каталоге workdir: logs.db, bot.log и sessions.db
+    бенчмарка не смешиваются с настоящими.
+    """
+    os.chdir(workdir)
+    os.environ.setdefault("BOT_TOKEN", FAKE_TOKEN)
+    os.environ.setdefault("METRICS_PORT", "0")  # /metrics бенчмарку не нужен, порт не занимаем
+    # консольная копия каждой строки лога в замере только мешает; файл bot.log остаётся, как в проде
+    os.environ.setdefault("LOG_CONSOLE", "0")
+    os.environ["SESSION_DB"] = str(workdir / "sessions.db")
+    import main
+    return main
+
+
+def scenario_scripts() -> dict[str, list[tuple[str, ...]]]:
+    """сценарий → тексты сообщений для каждого пути мастера от главного меню до конца."""
+    from generation import SCENARIO_GRAPH, CreateTaskFormulation
+    from wizard_paths import iter_steps
+
+    scripts: dict[str, list[tuple[str, ...]]] = {key: [] for key in SCENARIO_GRAPH.scenarios}
+    for step in iter_steps(CreateTaskFormulation):
+        if step.state != EXTRAS_STATE:
+            continue
+        scenario = SCENARIO_GRAPH.scenarios[step.scenario]
+        scripts[step.scenario].append((
+            "Create task formulation", scenario.section.capitalize(), scenario.button, *step.path, "-",
+        ))
+    return scripts
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))]
+
+
+class Phase:
+    def __init__(self, name: str, latencies: list[float], wall: float):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.wall = wall
+
+    def row(self) -> str:
+        lat = self.latencies
+        ms = [percentile(lat, q) * 1e3 for q in (0.5, 0.95, 0.99)]
+        return (f"{self.name:38} {len(lat):8} {ms[0]:8.2f} {ms[1]:8.2f} {ms[2]:8.2f} "
+                f"{statistics.fmean(lat) * 1e3:8.2f} {len(lat) / self.wall:10.0f}")
+
+
+async def run_phase(dp, bot, name: str, scripts: list[tuple[str, ...]], chats: int, repeat: int,
+                    update_ids) -> Phase:
+    work = scripts * repeat
+    latencies: list[float] = []
+
+    async def chat(chat_id: int, own: list[tuple[str, ...]]):
+        for script in own:
+            for text in script:
+                update = message_update(bot, next(update_ids), chat_id, text)
+                start = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies.append(time.perf_counter() - start)
+
+    n = min(chats, len(work))
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(1000 + i, work[i::n]) for i in range(n)))
+    return Phase(name, latencies, time.perf_counter() - start)
+
+
+async def bench(args) -> None:
+    workdir = Path(tempfile.mkdtemp(prefix="bench_updates_"))
+    main = load_main(workdir)
+    dp = main.dp
+    bot = make_bot(args.latency_ms / 1000)
+    scripts = scenario_scripts()
+    if args.scenario:
+        unknown = set(args.scenario) - scripts.keys()
+        if unknown:
+            raise SystemExit(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+        scripts = {key: scripts[key] for key in args.scenario}
+
+    update_ids = iter(range(1, 1 << 62))
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        # прогрев: один проход по всем путям одним чатом
+        everything = [s for paths in scripts.values() for s in paths]
+        await run_phase(dp, bot, "warm-up", everything, 1, 1, update_ids)
+
+        print(f"chats={args.chats} repeat={args.repeat} latency={args.latency_ms}ms  (workdir {workdir})")
+        print(f"{'scenario':38} {'updates':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'updates/s':>10}")
+        bot.session.calls.clear()
+        total = 0
+        for key, paths in scripts.items():
+            phase = await run_phase(dp, bot, f"{key} ({len(paths)} paths)", paths, args.chats, args.repeat, update_ids)
+            total += len(phase.latencies)
+            print(phase.row())
+        mixed = await run_phase(dp, bot, "all scenarios, mixed", everything, args.chats, args.repeat, update_ids)
+        total += len(mixed.latencies)
+        print(mixed.row())
+        print(f"{total} updates, Bot API calls: {dict(bot.session.calls)}")
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50, help="одновременных чатов")
+    parser.add_argument("--repeat", type=int, default=3, help="проходов по путям сценария")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="имитация RTT одного вызова Bot API")
+    parser.add_argument("--scenario", action="append", help="только эти сценарии (можно несколько раз)")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
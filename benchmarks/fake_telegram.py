@@ -0,0 +1,189 @@
+"""
+Telegram без сети: сессия Bot, которая записывает исходящие вызовы
+(sendMessage, answerCallbackQuery, ...) и сразу отвечает правдоподобным
+результатом, и фабрики входящих Update для Dispatcher.feed_update.
+
+FloodSession — то же, но с лимитами Telegram: сверх них вызов получает
+429 (TelegramRetryAfter), как от настоящего Bot API. PollingSession
+отвечает на getUpdates накопленными апдейтами — бэклог после простоя.
+
+Общий модуль для бенчмарков: bench_updates.py, реплей логов, bench_sender.py,
+bench_catch_up.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import time
+from collections import Counter, deque
+from typing import Any, AsyncGenerator, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.types import Message, Update, User
+
+# токен фиктивный: запросы дальше RecordingSession не уходят
+FAKE_TOKEN = "123456:fake"
+
+
+class RecordingSession(BaseSession):
+    """
+    Вместо HTTP — запись вызова. latency — имитация RTT до Bot API (секунды):
+    с ней видно, как ожидание сети перекрывается между чатами.
+    """
+
+    def __init__(self, latency: float = 0.0, history: int = 10_000):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        # последние вызовы: (метод, chat_id, text) — для проверок в тестах и отладки
+        self.sent: deque[tuple[str, Any, Optional[str]]] = deque(maxlen=history)
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        name = method.__api_method__
+        chat_id = getattr(method, "chat_id", None)
+        self.calls[name] += 1
+        self.sent.append((name, chat_id, getattr(method, "text", None)))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        returning = method.__returning__
+        if isinstance(returning, type) and issubclass(returning, Message):
+            return Message.model_validate({
+                "message_id": next(self._message_ids),
+                "date": 0,
+                "chat": {"id": chat_id or 0, "type": "private"},
+                "text": getattr(method, "text", None),
+            }, context={"bot": bot})
+        if returning is User:  # getMe: start_polling спрашивает имя бота
+            return User(id=bot.id, is_bot=True, first_name="bench", username="bench_bot")
+        return True
+
+    async def stream_content(self, url: str, headers: Optional[dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class FloodSession(RecordingSession):
+    """
+    RecordingSession с flood control: ведро на бота (rate в секунду, всплеск
+    burst) и ведро на каждый чат. Отправка без токена не записывается,
+    а получает TelegramRetryAfter с retry_after в целых секундах. Другие
+    методы (answerCallbackQuery, sendChatAction, ...) не ограничены.
+    """
+
+    def __init__(self, latency: float = 0.0, rate: float = 30.0, burst: float = 30,
+                 chat_rate: float = 1.0, chat_burst: float = 3, history: int = 10_000):
+        super().__init__(latency, history)
+        self.rate, self.burst = rate, burst
+        self.chat_rate, self.chat_burst = chat_rate, chat_burst
+        self.rejected: Counter[str] = Counter()
+        self._buckets: dict[Any, list[float]] = {}  # ключ → [токены, момент обновления]
+
+    def _take(self, key: Any, rate: float, burst: float, now: float) -> float:
+        """Взять токен; если его нет — сколько ждать."""
+        bucket = self._buckets.setdefault(key, [burst, now])
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        # 1e-6: планировщик и стенд считают время по одним часам, но в разные моменты
+        if bucket[0] < 1 - 1e-6:
+            return (1 - bucket[0]) / rate
+        bucket[0] -= 1
+        return 0.0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        name = method.__api_method__
+        if name.startswith(("send", "copy", "forward", "edit")) and name != "sendChatAction":
+            now = time.monotonic()
+            chat_id = getattr(method, "chat_id", None)
+            wait = self._take(None, self.rate, self.burst, now)
+            if not wait and chat_id is not None:
+                wait = self._take(chat_id, self.chat_rate, self.chat_burst, now)
+                if wait:
+                    self._buckets[None][0] += 1  # общий токен не потрачен
+            if wait:
+                self.rejected[name] += 1
+                retry_after = math.ceil(wait)
+                raise TelegramRetryAfter(method=method, message=f"Too Many Requests: retry after {retry_after}",
+                                         retry_after=retry_after)
+        return await super().make_request(bot, method, timeout)
+
+
+class PollingSession(RecordingSession):
+    """
+    RecordingSession с очередью апдейтов для getUpdates: push() кладёт JSON
+    апдейта (как message_payload), getUpdates с offset подтверждает всё,
+    что раньше него, и отдаёт до limit следующих. Пустая очередь —
+    long polling: ждём push или timeout.
+    """
+
+    def __init__(self, latency: float = 0.0, history: int = 10_000):
+        super().__init__(latency, history)
+        self.pending: deque[dict[str, Any]] = deque()
+        self._arrived = asyncio.Event()
+
+    def push(self, payload: dict[str, Any]) -> None:
+        self.pending.append(payload)
+        self._arrived.set()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        if not isinstance(method, GetUpdates):
+            return await super().make_request(bot, method, timeout)
+        self.calls[method.__api_method__] += 1
+        while self.pending and method.offset is not None and self.pending[0]["update_id"] < method.offset:
+            self.pending.popleft()
+        if not self.pending and method.timeout:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), method.timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = list(itertools.islice(self.pending, method.limit or 100))
+        return [Update.model_validate(payload, context={"bot": bot}) for payload in batch]
+
+
+def make_bot(latency: float = 0.0) -> Bot:
+    return Bot(FAKE_TOKEN, session=RecordingSession(latency))
+
+
+def _user(chat_id: int) -> dict[str, Any]:
+    return {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}", "username": f"user{chat_id}"}
+
+
+def message_payload(update_id: int, chat_id: int, text: str, date: int = 0) -> dict[str, Any]:
+    """JSON апдейта с текстовым сообщением — как его присылает Telegram (webhook, getUpdates)."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": date,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": _user(chat_id),
+            "text": text,
+        },
+    }
+
+
+def message_update(bot: Bot, update_id: int, chat_id: int, text: str) -> Update:
+    """Текстовое сообщение в личном чате; сразу привязано к bot (без пересборки в feed_update)."""
+    return Update.model_validate(message_payload(update_id, chat_id, text), context={"bot": bot})
+
+
+def callback_update(bot: Bot, update_id: int, chat_id: int, data: str) -> Update:
+    """Нажатие inline-кнопки под сообщением бота."""
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "from": _user(chat_id),
+            "message": {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": "-"},
+        },
+    }, context={"bot": bot})
@@ -0,0 +1,225 @@
+"""
+Нагрузка реальными кликами: реплей журнала действий из logs.db против dp из main.py
+на фейковом Telegram (fake_telegram.RecordingSession), без сети.
+
+Действия каждого пользователя собираются в сессии (пауза больше --session-gap
+начинает новую) и воспроизводятся с исходными интервалами:
+  --speed 1     — в реальном времени
+  --speed 10    — в 10 раз быстрее
+  --speed max   — без пауз, как можно быстрее
+Долгие простои всего лога (ночь без пользователей) сжимаются до --idle-cap.
+--fanout K размножает каждого пользователя в K клонов со своими chat_id,
+сдвинутых на случайные 0..--spread секунд: «в K раз больше пользователей».
+--sweep 1,10,100 прогоняет несколько fanout подряд и показывает, где
+задержка выходит за --slo-ms.
+
+    python benchmarks/replay_logs.py --speed max --fanout 100
+    python benchmarks/replay_logs.py --speed 10 --sweep 1,10,50,100 --latency-ms 30
+    python benchmarks/replay_logs.py --db /path/to/prod-logs.db --speed 1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from bench_updates import load_main, percentile
+from fake_telegram import callback_update, make_bot, message_update
+
+DEFAULT_DB = Path(__file__).resolve().parent.parent / "logs.db"
+CALLBACK_PREFIX = "CALLBACK: "
+# строки, которые пишет не middleware, а сам хендлер (дубль уже залогированного текста)
+DERIVED_PREFIXES = ("FEEDBACK: ", "DONE: ")
+CLONE_STRIDE = 10 ** 12  # chat_id клона = user_id + i * CLONE_STRIDE
+
+
+class Event(NamedTuple):
+    at: float  # секунды от начала лога, после сжатия простоев
+    action: str
+
+
+class UserSession(NamedTuple):
+    user_id: int
+    events: tuple[Event, ...]
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1].at - self.events[0].at
+
+
+def load_sessions(db: Path, session_gap: float, idle_cap: float) -> list[UserSession]:
+    # без -wal рядом база не открыта ботом: immutable не оставляет за собой -shm/-wal
+    live = db.with_name(db.name + "-wal").exists()
+    conn = sqlite3.connect(f"file:{db}?mode=ro{'' if live else '&immutable=1'}", uri=True)
+    try:
+        rows = read_actions(conn)
+    finally:
+        conn.close()
+
+    timeline: dict[int, list[Event]] = {}
+    offset, prev = 0.0, None
+    for t, user_id, action in rows:
+        if not action or action.startswith(DERIVED_PREFIXES):
+            continue  # документы и прочие не-текстовые апдейты не восстановить
+        if prev is not None:
+            offset += min(t - prev, idle_cap)
+        prev = t
+        timeline.setdefault(user_id, []).append(Event(offset, action))
+
+    sessions = []
+    for user_id, events in timeline.items():
+        current = [events[0]]
+        for event in events[1:]:
+            if event.at - current[-1].at > session_gap:
+                sessions.append(UserSession(user_id, tuple(current)))
+                current = []
+            current.append(event)
+        sessions.append(UserSession(user_id, tuple(current)))
+    return sessions
+
+
+def read_actions(conn: sqlite3.Connection) -> list[tuple[float, int, str]]:
+    """(время в секундах, user_id, действие) по времени: схема v2 плюс то, что ещё в старой logs."""
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    rows = []
+    if "events" in tables:
+        rows += [(ts / 1000, user_id, action) for user_id, ts, action in conn.execute(
+            "SELECT e.user_id, e.ts, a.text || coalesce(e.detail, '') "
+            "FROM events e JOIN actions a ON a.id = e.action_id ORDER BY e.ts, e.id")]
+    if "logs" in tables:
+        rows += [(datetime.fromisoformat(time_utc).timestamp(), user_id, action) for user_id, time_utc, action in
+                 conn.execute("SELECT user_id, time_utc, action FROM logs ORDER BY time_utc, id")]
+    rows.sort(key=lambda row: row[0])  # устойчивая: внутри одного времени — порядок записи
+    return rows
+
+
+class Result(NamedTuple):
+    fanout: int
+    chats: int
+    latencies: list[float]
+    lags: list[float]
+    wall: float
+    peak_inflight: int
+
+
+async def replay(dp, bot, sessions: list[UserSession], speed: float, fanout: int, spread: float,
+                 rng: random.Random, update_ids) -> Result:
+    # одна корутина на (пользователь, клон): его сессии идут строго по очереди
+    by_user: dict[int, list[Event]] = {}
+    for session in sessions:
+        by_user.setdefault(session.user_id, []).extend(session.events)
+
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    lags: list[float] = []
+    inflight = peak = 0
+
+    async def user(chat_id: int, events: list[Event], shift: float, t0: float):
+        nonlocal inflight, peak
+        for event in events:
+            if speed:
+                due = t0 + shift + event.at / speed
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lags.append(-delay)  # не успеваем за расписанием
+            if event.action.startswith(CALLBACK_PREFIX):
+                update = callback_update(bot, next(update_ids), chat_id, event.action[len(CALLBACK_PREFIX):])
+            else:
+                update = message_update(bot, next(update_ids), chat_id, event.action)
+            inflight += 1
+            peak = max(peak, inflight)
+            start = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            finally:
+                latencies.append(time.perf_counter() - start)
+                inflight -= 1
+
+    t0 = loop.time()
+    wall = time.perf_counter()
+    await asyncio.gather(*(
+        user(user_id + i * CLONE_STRIDE, events, rng.uniform(0, spread) if i else 0.0, t0)
+        for user_id, events in by_user.items()
+        for i in range(fanout)
+    ))
+    return Result(fanout, len(by_user) * fanout, latencies, lags, time.perf_counter() - wall, peak)
+
+
+def report_row(result: Result, slo_ms: float) -> str:
+    lat = sorted(result.latencies)
+    p50, p95, p99 = (percentile(lat, q) * 1e3 for q in (0.5, 0.95, 0.99))
+    lag = percentile(sorted(result.lags), 0.99) * 1e3 if result.lags else 0.0
+    mark = "  <-- over SLO" if p95 > slo_ms else ""
+    return (f"{result.fanout:7} {result.chats:7} {len(lat):8} {len(lat) / result.wall:10.0f} "
+            f"{p50:8.2f} {p95:8.2f} {p99:8.2f} {result.peak_inflight:9} {lag:10.1f}{mark}")
+
+
+def parse_speed(value: str) -> float:
+    return 0.0 if value == "max" else float(value)
+
+
+async def run(args) -> None:
+    sessions = load_sessions(args.db, args.session_gap, args.idle_cap)
+    if not sessions:
+        raise SystemExit(f"{args.db}: no replayable actions")
+    events = sum(len(s.events) for s in sessions)
+    span = max(s.events[-1].at for s in sessions)
+    avg = sum(s.duration for s in sessions) / len(sessions)
+    print(f"{args.db}: {len({s.user_id for s in sessions})} users, {len(sessions)} sessions "
+          f"(avg {avg:.0f}s), {events} actions, {span:.0f}s of traffic after idle cap")
+
+    main = load_main(Path(tempfile.mkdtemp(prefix="replay_logs_")))
+    dp = main.dp
+    bot = make_bot(args.latency_ms / 1000)
+    rng = random.Random(args.seed)
+    update_ids = iter(range(1, 1 << 62))
+    levels = [int(x) for x in args.sweep.split(",")] if args.sweep else [args.fanout]
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        await replay(dp, bot, sessions, 0.0, 1, 0.0, rng, update_ids)  # прогрев
+        print(f"speed={args.speed} latency={args.latency_ms}ms slo(p95)={args.slo_ms}ms")
+        print(f"{'fanout':>7} {'chats':>7} {'updates':>8} {'updates/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'inflight':>9} {'lag p99 ms':>10}")
+        degraded = None
+        for fanout in levels:
+            result = await replay(dp, bot, sessions, parse_speed(args.speed), fanout, args.spread, rng, update_ids)
+            print(report_row(result, args.slo_ms), flush=True)
+            if degraded is None and percentile(sorted(result.latencies), 0.95) * 1e3 > args.slo_ms:
+                degraded = fanout
+        if len(levels) > 1:
+            print(f"p95 exceeds {args.slo_ms} ms from fan-out {degraded}" if degraded
+                  else f"p95 within {args.slo_ms} ms at every level")
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="откуда брать логи (открывается только на чтение)")
+    parser.add_argument("--speed", default="max", help="1, 10, ... или max")
+    parser.add_argument("--fanout", type=int, default=1, help="клонов на каждого пользователя")
+    parser.add_argument("--sweep", help="несколько fanout через запятую, например 1,10,100")
+    parser.add_argument("--spread", type=float, default=60.0, help="сдвиг клонов: случайно 0..spread секунд")
+    parser.add_argument("--session-gap", type=float, default=1800.0, help="пауза, после которой начинается новая сессия")
+    parser.add_argument("--idle-cap", type=float, default=60.0, help="простой лога длиннее — сжимается до стольких секунд")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="имитация RTT одного вызова Bot API")
+    parser.add_argument("--slo-ms", type=float, default=50.0, help="порог p95 для --sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not args.db.exists():
+        parser.error(f"{args.db} not found")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Локальный стенд webhook-режима: вместо Telegram — aiohttp-клиент, который
+POST-ит JSON апдейтов на webhook_server.build_app с dp из main.py.
+Исходящие вызовы Bot API уходят в RecordingSession (fake_telegram.py).
+
+Сначала проверка секрета: без заголовка и с чужим токеном — 401.
+Потом пути мастера (как в bench_updates.py) по N чатам через пул из
+--connections соединений — как max_connections у setWebhook. Каждый чат
+шлёт следующее сообщение только после ответа бота на предыдущее, как
+живой пользователь.
+
+    python benchmarks/webhook_poster.py
+    python benchmarks/webhook_poster.py --chats 200 --connections 40 --concurrency 16
+    python benchmarks/webhook_poster.py --latency-ms 40 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import secrets
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import aiohttp
+from aiogram import Bot
+from aiohttp import web
+
+from bench_updates import load_main, percentile, scenario_scripts
+from fake_telegram import FAKE_TOKEN, RecordingSession, message_payload
+
+import webhook_server  # noqa: E402  (корень репозитория — в sys.path после bench_updates)
+
+
+class ReplySession(RecordingSession):
+    """RecordingSession, по которой стенд узнаёт, что бот ответил в чат."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.replies: dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+
+    async def make_request(self, bot, method, timeout=None):
+        result = await super().make_request(bot, method, timeout)
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            self.replies[chat_id].put_nowait(method.__api_method__)
+        return result
+
+
+async def check_secret(http: aiohttp.ClientSession, url: str, secret: str) -> None:
+    update = message_payload(1, 1, "/start")
+    for headers in ({}, {webhook_server.SECRET_HEADER: "wrong"}):
+        async with http.post(url, json=update, headers=headers) as resp:
+            if resp.status != 401:
+                raise SystemExit(f"expected 401 for headers {headers}, got {resp.status}")
+    print("secret token: missing/wrong -> 401")
+
+
+async def run(args) -> None:
+    main = load_main(Path(tempfile.mkdtemp(prefix="webhook_poster_")))
+    session = ReplySession(args.latency_ms / 1000)
+    bot = Bot(FAKE_TOKEN, session=session)
+    secret = secrets.token_urlsafe(32)
+    app = webhook_server.build_app(main.dp, bot, secret, concurrency=args.concurrency)
+    handler = app[webhook_server.HANDLER_KEY]
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}{webhook_server.WEBHOOK_PATH}"
+
+    scripts = [s for paths in scenario_scripts().values() for s in paths] * args.repeat
+    n = min(args.chats, len(scripts))
+    update_ids = iter(range(1, 1 << 62))
+    acks: list[float] = []
+    replies: list[float] = []
+    peak = 0
+
+    async def chat(http, chat_id: int, own):
+        nonlocal peak
+        inbox = session.replies[chat_id]
+        for script in own:
+            for text in script:
+                start = time.perf_counter()
+                async with http.post(url, json=message_payload(next(update_ids), chat_id, text),
+                                     headers={webhook_server.SECRET_HEADER: secret}) as resp:
+                    resp.raise_for_status()
+                acks.append(time.perf_counter() - start)
+                peak = max(peak, handler.in_flight)
+                await inbox.get()
+                replies.append(time.perf_counter() - start)
+
+    try:
+        connector = aiohttp.TCPConnector(limit=args.connections)
+        async with aiohttp.ClientSession(connector=connector) as http:
+            await check_secret(http, url, secret)
+            wall = time.perf_counter()
+            await asyncio.gather(*(chat(http, 1000 + i, scripts[i::n]) for i in range(n)))
+            wall = time.perf_counter() - wall
+    finally:
+        await runner.cleanup()
+
+    acks.sort()
+    replies.sort()
+    print(f"chats={n} connections={args.connections} concurrency={args.concurrency} latency={args.latency_ms}ms")
+    print(f"{len(replies)} updates in {wall:.2f}s: {len(replies) / wall:.0f} updates/s, "
+          f"peak in flight {peak}/{args.concurrency}")
+    for name, values in (("POST -> 200", acks), ("POST -> reply", replies)):
+        p50, p95, p99 = (percentile(values, q) * 1e3 for q in (0.5, 0.95, 0.99))
+        print(f"{name:14} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms")
+    print(f"Bot API calls: {dict(session.calls)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50, help="одновременных чатов")
+    parser.add_argument("--repeat", type=int, default=1, help="проходов по путям мастера")
+    parser.add_argument("--connections", type=int, default=40, help="соединений стенда (max_connections Telegram)")
+    parser.add_argument("--concurrency", type=int, default=64, help="WEBHOOK_CONCURRENCY сервера")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="имитация RTT одного вызова Bot API")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,14 @@ from typing import Any, Dict, Optional
 
 from aiogram import Bot, Dispatcher, F, Router
 from aiogram.filters import CommandStart, Command, Text
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import Message, ReplyKeyboardMarkup
 
 from config import BOT_TOKEN
 # ВАЖНО: тут твой класс из generation.py
-# Должен иметь методы start_* и последующие шаги, как в твоём коде,
-# и хранить состояние в _s(chat_id)["state"] (или иметь get_state()).
-from generation import CreateTaskFormulation
+# Сценарии запускаются через start(chat_id, key), шаги — через handle(chat_id, text),
+# состояние хранится в _s(chat_id)["state"] (или есть get_state()).
+from generation import SCENARIO_GRAPH, CreateTaskFormulation
+from keyboards import reply_kb, warm_up, SECTIONS, VOCABULARY_MENU, GRAMMAR_MENU, READING_MENU, AFTER_DONE
 
 
 # -------------------- базовая настройка --------------------
@@ -21,6 +22,7 @@ rt = Router()
 dp.include_router(rt)
 
 gen = CreateTaskFormulation()  # единый формировщик из generation.py
+warm_up(CreateTaskFormulation)  # клавиатуры всех шагов строим заранее
 
 
 # -------------------- текст помощи --------------------
@@ -36,53 +38,28 @@ BOT_DESCRIPTION = (
 
 
 # -------------------- клавиатуры --------------------
+# готовые объекты из общего кэша keyboards.py (тот же, что и в main.py)
 def kb(options: list[str]) -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=o)] for o in options],
-        resize_keyboard=True
-    )
+    return reply_kb(options)
 
 def kb_main() -> ReplyKeyboardMarkup:
-    return kb(["Create task formulation", "Help"])
+    return reply_kb(("Create task formulation", "Help"))
 
 def kb_sections() -> ReplyKeyboardMarkup:
-    return kb(["Vocabulary", "Grammar", "Reading", "Back to main menu"])
+    return reply_kb(SECTIONS)
 
 def kb_vocab() -> ReplyKeyboardMarkup:
-    return kb([
-        "Labelling",
-        "Categorisation",
-        "Word-building",
-        "Matching",
-        "Odd one out",
-        "Synonyms/antonyms/definitions/lexical sets",
-        "Back to sections",
-    ])
+    return reply_kb(VOCABULARY_MENU)
 
 def kb_grammar() -> ReplyKeyboardMarkup:
-    return kb([
-        "Grammar Multiple Choice",
-        "Sentence/dialogue completion",
-        "Transformation",
-        "Error Correction",
-        "Back to sections",
-    ])
+    return reply_kb(GRAMMAR_MENU)
 
 def kb_reading() -> ReplyKeyboardMarkup:
-    return kb([
-        "Reading Multiple Choice",
-        "True/False",
-        "Back to sections",
-    ])
+    return reply_kb(READING_MENU)
 
 def kb_after_done(section: str) -> ReplyKeyboardMarkup:
     # section ∈ {'vocabulary','grammar','reading'}
-    back_map = {
-        "grammar": "Back to Grammar",
-        "reading": "Back to Reading",
-        "vocabulary": "Back to Vocabulary",
-    }
-    return kb([back_map.get(section, "Back to Vocabulary"), "Back to sections", "Back to main menu"])
+    return reply_kb(AFTER_DONE.get(section, AFTER_DONE["vocabulary"]))
 
 
 # -------------------- вспомогательные адаптеры --------------------
@@ -131,7 +108,7 @@ async def render_step(message: Message, result: Dict[str, Any]):
 
     # промежуточные шаги
     if "options" in result:
-        await message.answer(result.get("text") or "Choose:", reply_markup=kb(list(map(str, result["options"]))))
+        await message.answer(result.get("text") or "Choose:", reply_markup=kb(result["options"]))
     else:
         await message.answer(result.get("text") or "OK")
 
@@ -180,94 +157,32 @@ async def on_reading(message: Message):
 
 # ВХОДНЫЕ КНОПКИ ДЛЯ КАЖДОГО СЦЕНАРИЯ
 
-@rt.message(Text("Labelling"))
-async def start_labelling(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_labelling(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Categorisation"))
-async def start_categorisation(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_categorising(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Word-building"))
-async def start_word_building(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_word_building(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Matching"))
-async def start_matching(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_matching(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Odd one out"))
-async def start_odd_one_out(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_odd_one_out(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Synonyms/antonyms/definitions/lexical sets"))
-async def start_synonyms(message: Message):
-    set_task_type(gen, message.chat.id, "vocabulary")
-    res = gen.start_synonyms(message.chat.id)
-    await render_step(message, res)
+def _start_handler(scenario):
+    async def start(message: Message):
+        set_task_type(gen, message.chat.id, scenario.section)
+        res = gen.start(message.chat.id, scenario.key)
+        await render_step(message, res)
+    start.__name__ = f"start_{scenario.key}"
+    return start
 
-@rt.message(Text("Grammar Multiple Choice"))
-async def start_grammar_mc(message: Message):
-    set_task_type(gen, message.chat.id, "grammar")
-    res = gen.start_grammar_mc(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Sentence/dialogue completion"))
-async def start_grammar_completion(message: Message):
-    set_task_type(gen, message.chat.id, "grammar")
-    res = gen.start_grammar_completion(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Transformation"))
-async def start_grammar_transformation(message: Message):
-    set_task_type(gen, message.chat.id, "grammar")
-    res = gen.start_grammar_transformation(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Error Correction"))
-async def start_grammar_error_correction(message: Message):
-    set_task_type(gen, message.chat.id, "grammar")
-    res = gen.start_grammar_error_correction(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("Reading Multiple Choice"))
-async def start_reading_mc(message: Message):
-    set_task_type(gen, message.chat.id, "reading")
-    res = gen.start_reading_multiple_choice(message.chat.id)
-    await render_step(message, res)
-
-@rt.message(Text("True/False"))
-async def start_reading_tf(message: Message):
-    set_task_type(gen, message.chat.id, "reading")
-    res = gen.start_reading_true_false(message.chat.id)
-    await render_step(message, res)
+for _scenario in SCENARIO_GRAPH.scenarios.values():
+    rt.message(Text(_scenario.button))(_start_handler(_scenario))
 
 
 # -------------------- УНИВЕРСАЛЬНЫЙ ОБРАБОТЧИК ШАГОВ --------------------
 @rt.message(F.text)
 async def state_driver(message: Message):
     """
-    Универсальный обработчик: берёт текущее состояние из generation
-    и вызывает метод с таким же именем, передавая (chat_id, text).
+    Универсальный обработчик: текущее состояние из generation
+    и ответ пользователя уходят в интерпретатор сценариев.
     """
     st = get_state(gen, message.chat.id)
     if not st:
         return  # вне сценария
-    if not hasattr(gen, st):
+    if not gen.handles(st):
         # неизвестное состояние — просто ничего не делаем
         return
-    func = getattr(gen, st)
-    res = func(message.chat.id, message.text or "")
+    res = gen.handle(message.chat.id, message.text or "")
     await render_step(message, res)
 
 
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional
+
+from instructions import ParamError, build_instruction
+
+# Пакетная генерация: файл с заданиями (CSV или JSON) → CSV с инструкциями.
+# Вход читается потоково, строка за строкой, результат пишется сразу же,
+# поэтому память не зависит от размера файла.
+BULK_MAX_BYTES = 20 * 1024 * 1024  # больше Bot API скачать не даёт
+JSON_CHUNK = 64 * 1024
+POOL_CHUNK = 1000  # строк на одну задачу воркеру
+RESULT_FIELDS = ("row", "task", "instruction", "error")
+FORMATS = {".csv": "csv", ".json": "json", ".jsonl": "json", ".ndjson": "json"}
+
+BULK_USAGE = (
+    "Send a .csv or .json file: one task per row/object.\n"
+    "Columns: task (labelling, matching, ...) plus the task parameters, "
+    "e.g. task=matching, matching_type=Sentences to pictures, sentences=1-5, pictures=a-f, "
+    "work_mode=In pairs, time=2.\n"
+    "You'll get back a CSV with the instruction (or the error) for every row."
+)
+
+
+class BulkStats(NamedTuple):
+    rows: int
+    ok: int
+    failed: int
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    return FORMATS.get(Path(filename or "").suffix.lower())
+
+
+# ---------- чтение ----------
+def iter_csv(fp: IO[str]) -> Iterator[dict[str, Any]]:
+    reader = csv.DictReader(fp)
+    if reader.fieldnames:
+        reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    yield from reader
+
+
+def iter_json(fp: IO[str], chunk_size: int = JSON_CHUNK) -> Iterator[Any]:
+    """
+    Потоковый разбор JSON-массива объектов или JSON Lines:
+    в памяти только текущий кусок файла и один объект.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    in_array: Optional[bool] = None
+
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (in_array and buf[pos] == ",")):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+
+        if in_array is None:
+            in_array = buf[pos] == "["
+            pos += in_array
+            continue
+        if in_array and buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        if end is None or (end == len(buf) and not eof):
+            # объект (или число) может продолжаться в следующем куске
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+        pos = end
+        yield obj
+
+
+def iter_rows(path: Path, fmt: str) -> Iterator[Any]:
+    # utf-8-sig: Excel сохраняет CSV с BOM
+    with open(path, encoding="utf-8-sig", newline="") as fp:
+        yield from (iter_csv(fp) if fmt == "csv" else iter_json(fp))
+
+
+# ---------- генерация ----------
+def generate(rows: Iterable[Any]) -> Iterator[tuple[int, str, str, str]]:
+    """(номер строки, сценарий, инструкция, ошибка) для каждой входной строки."""
+    for n, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            yield n, "", "", "row must be an object"
+            continue
+        task = str(row.get("task") or row.get("scenario") or "")
+        try:
+            yield n, task, build_instruction(row), ""
+        except ParamError as e:
+            yield n, task, "", str(e)
+
+
+def _generate_chunk(start: int, rows: list[Any]) -> list[tuple[int, str, str, str]]:
+    return [(start + n, *rest) for n, *rest in generate(rows)]
+
+
+def generate_parallel(rows: Iterable[Any], workers: int, chunk: int = POOL_CHUNK) -> Iterator[tuple[int, str, str, str]]:
+    """
+    То же, что generate, но на пуле процессов. Порядок строк сохраняется.
+    В полёте не больше 2*workers кусков: входной файл не вычитывается
+    в память целиком, как это сделал бы Pool.imap.
+    """
+    rows = iter(rows)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        start = 0
+        while True:
+            while len(pending) < 2 * workers:
+                batch = list(itertools.islice(rows, chunk))
+                if not batch:
+                    break
+                pending.append(pool.submit(_generate_chunk, start, batch))
+                start += len(batch)
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def write_results(results: Iterable[tuple[int, str, str, str]], fp: IO[str]) -> BulkStats:
+    writer = csv.writer(fp)
+    writer.writerow(RESULT_FIELDS)
+    rows = failed = 0
+    for result in results:
+        writer.writerow(result)
+        rows += 1
+        failed += bool(result[3])
+    return BulkStats(rows, rows - failed, failed)
+
+
+def convert(src: Path, dst: Path, fmt: str, workers: int = 1) -> BulkStats:
+    """
+    Файл заданий src → CSV с инструкциями dst. Синхронно: из бота — через to_thread.
+    workers > 1 — генерация на пуле процессов (для очень больших файлов).
+    """
+    rows = iter_rows(src, fmt)
+    results = generate(rows) if workers <= 1 else generate_parallel(rows, workers)
+    with open(dst, "w", encoding="utf-8", newline="") as out:
+        try:
+            return write_results(results, out)
+        except (ValueError, csv.Error) as e:
+            # битый JSON/CSV — всё, что успели, уже в файле
+            raise ParamError(f"Cannot parse the file: {e}") from None
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Iterable, NamedTuple, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Update
+
+from routing import route_text
+
+if TYPE_CHECKING:
+    from update_ledger import UpdateLedger
+
+# Разбор бэклога после простоя. Первый getUpdates после рестарта отдаёт
+# всё, что накопилось, и раньше бот честно проигрывал это по порядку:
+# десятки ответов на нажатия, которые пользователь давно забыл, и минуты
+# до ответа на то, что он пишет сейчас. Здесь бэклог выбирается целиком
+# (getUpdates с timeout=0), раскладывается по чатам и прореживается:
+#   - апдейт старше CATCH_UP_MAX_AGE не обрабатывается, как и всё, что
+#     чат прислал до него (следующие шаги от него зависят); чату — одно
+#     сообщение с просьбой повторить. Кроме документов: файл для пакетной
+#     генерации не зависит от шагов мастера, и ответ на него не устаревает;
+#   - нажатие, которое перекрыто следующим апдейтом того же чата
+#     (несколько переходов по меню подряд — важен только последний),
+#     пропускается.
+# Остальное уходит в dp в исходном порядке, и опрос стартует, когда оно
+# обработано. Подтверждает бэклог (offset) только этот первый getUpdates
+# опроса — с offset учёта update_ledger, куда попадают и обработанные, и
+# отброшенные апдейты; упавший посреди разбора бот получит их снова.
+
+CATCH_UP_MAX_AGE = 120.0   # сек
+CATCH_UP_BATCH = 100       # апдейтов за один getUpdates (максимум Bot API)
+CATCH_UP_NOTICE = (
+    "Sorry, the bot was offline for a while, and {count} of your messages are too old to answer now. "
+    "Please send them again."
+)
+
+logger = logging.getLogger(__name__)
+
+# что делает апдейт с состоянием чата — от этого зависит, чем он перекрывается
+VIEW = "view"          # только показывает экран (Help, /start, ...)
+START = "start"        # начинает сценарий: состояние мастера — с нуля
+RESET = "reset"        # полный сброс сессии (/menu)
+CALLBACK = "callback"  # inline-кнопка: экран целиком выводится из callback_data
+
+# предыдущий вид → какими следующими апдейтами он перекрыт (None — любым)
+_SUPERSEDED_BY: dict[str, Optional[frozenset]] = {
+    VIEW: None,
+    START: frozenset({START, RESET}),
+    RESET: frozenset({RESET}),
+    CALLBACK: frozenset({CALLBACK}),
+}
+
+
+class CatchUpRules(NamedTuple):
+    """Тексты кнопок по видам; их знает тот, кто регистрирует хендлеры (main.py)."""
+    view: frozenset[str] = frozenset()
+    starts: frozenset[str] = frozenset()
+    resets: frozenset[str] = frozenset()
+
+    def kind(self, update: Update) -> Optional[str]:
+        if update.callback_query is not None:
+            return CALLBACK
+        message = update.message
+        if message is None or message.text is None:
+            return None  # документы и прочее не перекрываются ничем
+        text = route_text(message.text)
+        if text in self.view:
+            return VIEW
+        if text in self.starts:
+            return START
+        if text in self.resets:
+            return RESET
+        return None
+
+
+class CatchUpPlan(NamedTuple):
+    keep: list[Update]       # в исходном порядке
+    stale: dict[int, int]    # chat_id → сколько апдейтов чата отброшено по возрасту
+    superseded: int
+
+
+def is_document(update: Update) -> bool:
+    return update.message is not None and update.message.document is not None
+
+
+def update_time(update: Update) -> Optional[float]:
+    event = update.event
+    date = getattr(event, "date", None)
+    return date.timestamp() if date is not None else None
+
+
+def plan(updates: Iterable[Update], rules: CatchUpRules = CatchUpRules(),
+         max_age: float = CATCH_UP_MAX_AGE, now: Optional[float] = None) -> CatchUpPlan:
+    """
+    Что из бэклога обработать: без сети и dp, только по самим апдейтам.
+    Документы не отбрасываются ни по возрасту, ни перекрытием.
+    """
+    now = time.time() if now is None else now
+    by_chat: dict[Any, list[tuple[int, Update]]] = defaultdict(list)
+    for position, update in enumerate(updates):
+        chat = UserContextMiddleware.resolve_event_context(event=update).chat
+        by_chat[chat.id if chat is not None else None].append((position, update))
+
+    keep: list[tuple[int, Update]] = []
+    stale: dict[int, int] = {}
+    superseded = 0
+    for chat_id, own in by_chat.items():
+        if chat_id is None:
+            keep.extend(own)
+            continue
+        # последний слишком старый апдейт и всё до него — мимо, кроме документов
+        cut = 0
+        for i, (_, update) in enumerate(own):
+            sent = update_time(update)
+            if sent is not None and now - sent > max_age and not is_document(update):
+                cut = i + 1
+        documents = [item for item in own[:cut] if is_document(item[1])]
+        if cut - len(documents):
+            stale[chat_id] = cut - len(documents)
+        # с конца: апдейт сравнивается со следующим оставленным
+        kept: list[tuple[int, Update]] = []
+        next_kind = None
+        for position, update in reversed(documents + own[cut:]):
+            kind = rules.kind(update)
+            if kept:
+                later = _SUPERSEDED_BY.get(kind, frozenset())
+                if later is None or next_kind in later:
+                    superseded += 1
+                    continue
+            kept.append((position, update))
+            next_kind = kind
+        keep.extend(kept)
+    keep.sort(key=lambda item: item[0])
+    return CatchUpPlan([update for _, update in keep], stale, superseded)
+
+
+async def drain(bot: Bot, allowed_updates: Optional[list[str]] = None) -> list[Update]:
+    """
+    Весь бэклог без ожидания. Последняя пачка не подтверждается — это
+    сделает опрос после обработки. Листать бэклог можно только offset'ом,
+    поэтому пачки до последней Telegram забывает, как только запрошена
+    следующая: падение посреди бэклога больше CATCH_UP_BATCH их теряет.
+    """
+    updates: list[Update] = []
+    offset = None
+    while True:
+        batch = await bot.get_updates(offset=offset, limit=CATCH_UP_BATCH, timeout=0,
+                                      allowed_updates=allowed_updates)
+        updates.extend(batch)
+        if len(batch) < CATCH_UP_BATCH:
+            return updates
+        offset = batch[-1].update_id + 1
+
+
+def mark_dropped(ledger: UpdateLedger, backlog: list[Update], result: CatchUpPlan) -> None:
+    """Отброшенное (старое, перекрытое) — в учёт как обработанное: после рестарта не вернётся."""
+    keep = {update.update_id for update in result.keep}
+    for update in backlog:
+        if update.update_id not in keep and ledger.claim(update.update_id):
+            ledger.done(update.update_id)
+
+
+async def notify_stale(bot: Bot, stale: dict[int, int], notice: str = CATCH_UP_NOTICE) -> None:
+    async def one(chat_id: int, count: int) -> None:
+        try:
+            await bot.send_message(chat_id, notice.format(count=count))
+        except TelegramAPIError as e:
+            logger.warning("Catch-up notice to %s failed: %s", chat_id, e)
+
+    await asyncio.gather(*(one(chat_id, count) for chat_id, count in stale.items()))
+
+
+def log_plan(total: int, result: CatchUpPlan) -> None:
+    logger.info("Catch-up: %d updates in backlog, %d stale in %d chats, %d superseded, %d to handle",
+                total, sum(result.stale.values()), len(result.stale), result.superseded, len(result.keep))
+
+
+async def run(dp: Dispatcher, bot: Bot, ledger: UpdateLedger, rules: CatchUpRules = CatchUpRules(),
+              max_age: float = CATCH_UP_MAX_AGE, **data: Any) -> CatchUpPlan:
+    """
+    Разобрать бэклог и обработать оставшееся в dp. Возвращается, когда
+    обработано всё: только после этого опрос подтверждает бэклог. Апдейты
+    идут задачами, как из polling, порядок внутри чата держит chat_lanes;
+    учёт ledger — тот же, что у DedupMiddleware и ResumeOffset.
+    Вызывать после startup диспетчера (сессии и писатели уже открыты).
+    """
+    updates = await drain(bot, dp.resolve_used_update_types())
+    result = plan(updates, rules, max_age)
+    if updates:
+        log_plan(len(updates), result)
+    mark_dropped(ledger, updates, result)
+    # просьба повторить — раньше ответов на свежие апдейты того же чата
+    await notify_stale(bot, result.stale)
+    await asyncio.gather(*(_feed(dp, bot, update, data) for update in result.keep))
+    return result
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: Update, data: dict[str, Any]) -> None:
+    try:
+        await dp.feed_update(bot, update, **data)
+    except Exception:
+        logger.exception("Catch-up update id=%s failed", update.update_id)
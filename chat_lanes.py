@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+from aiogram import BaseMiddleware
+
+# Апдейты одного чата — строго по очереди, разные чаты — параллельно.
+# aiogram обрабатывает апдейты из polling конкурентными задачами, и два
+# быстрых нажатия в одном чате иначе переплетаются внутри шагов
+# CreateTaskFormulation (sess["state"] и объект сценария без блокировок).
+# Сверху — общий лимит одновременно работающих хендлеров: бэклог после
+# простоя не превращается в тысячи одновременных обработок.
+
+UPDATE_CONCURRENCY = 64   # хендлеров в работе одновременно на весь бот
+POLL_BACKLOG = 1_000      # задач апдейтов в polling (tasks_concurrency_limit)
+
+
+class _Lane:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # очередь ожидающих у asyncio.Lock — FIFO
+        self.users = 0              # апдейтов чата в работе и в очереди
+
+
+class ChatLanesMiddleware(BaseMiddleware):
+    """
+    Внешняя мидлварь апдейта: dp.update.outer_middleware(ChatLanesMiddleware()).
+    Стоит после UserContextMiddleware диспетчера, поэтому чат уже известен
+    (event_chat, для апдейтов без чата — event_from_user).
+
+    Сначала — очередь своего чата, потом — общий слот: апдейт, ждущий
+    занятый чат, не держит слот, и один "горячий" чат не тормозит остальных.
+    Замок чата удаляется, как только у чата не осталось апдейтов.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY):
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._lanes: dict[int, _Lane] = {}
+        self.in_flight = 0
+
+    @property
+    def chats(self) -> int:
+        """Чатов с апдейтами в работе или в очереди."""
+        return len(self._lanes)
+
+    @staticmethod
+    def chat_key(data: dict[str, Any]) -> Optional[int]:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        user = data.get("event_from_user")
+        return user.id if user is not None else None
+
+    async def __call__(self, handler, event, data):
+        key = self.chat_key(data)
+        if key is None:
+            return await self._run(handler, event, data)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        lane.users += 1
+        try:
+            async with lane.lock:
+                return await self._run(handler, event, data)
+        finally:
+            lane.users -= 1
+            if not lane.users:
+                del self._lanes[key]
+
+    async def _run(self, handler, event, data):
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await handler(event, data)
+            finally:
+                self.in_flight -= 1
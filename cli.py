@@ -0,0 +1,84 @@
+"""
+Генерация инструкций без Telegram: ни Bot, ни сессий generation.py.
+
+    python cli.py make task=matching matching_type="Sentences to pictures" sentences=1-5 pictures=a-f
+    python cli.py make '{"task": "reading_tf", "read_first": "yes"}'
+    python cli.py batch tasks.csv -o instructions.csv --workers 8
+    python cli.py batch tasks.jsonl -o -          # результат в stdout
+
+Параметры — те же, что у instructions.build_instruction (см. модуль instructions).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import bulk
+from instructions import ParamError, build_instruction
+
+
+def _parse_params(items: list[str]) -> dict:
+    if len(items) == 1 and items[0].lstrip().startswith("{"):
+        return json.loads(items[0])
+    params = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ParamError(f"expected key=value, got '{item}'")
+        params[key.strip().lower()] = value
+    return params
+
+
+def cmd_make(args) -> int:
+    try:
+        print(build_instruction(_parse_params(args.params)))
+    except (ParamError, json.JSONDecodeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_batch(args) -> int:
+    fmt = args.format or bulk.detect_format(args.input)
+    if fmt is None:
+        print("error: cannot tell the format from the file name, pass --format", file=sys.stderr)
+        return 2
+    try:
+        if args.output == "-":
+            rows = bulk.iter_rows(Path(args.input), fmt)
+            results = bulk.generate(rows) if args.workers <= 1 else bulk.generate_parallel(rows, args.workers)
+            stats = bulk.write_results(results, sys.stdout)
+        else:
+            stats = bulk.convert(Path(args.input), Path(args.output), fmt, workers=args.workers)
+    except ParamError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(f"{stats.rows} rows: {stats.ok} ok, {stats.failed} failed", file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    make = sub.add_parser("make", help="одна инструкция по параметрам")
+    make.add_argument("params", nargs="+", help="key=value ... или один JSON-объект")
+    make.set_defaults(func=cmd_make)
+
+    batch = sub.add_parser("batch", help="файл заданий (CSV/JSON) → CSV с инструкциями")
+    batch.add_argument("input")
+    batch.add_argument("-o", "--output", default="instructions.csv", help="'-' — в stdout")
+    batch.add_argument("--format", choices=("csv", "json"))
+    batch.add_argument("--workers", type=int, default=1,
+                       help=f"процессов для генерации (на этой машине ядер: {os.cpu_count()})")
+    batch.set_defaults(func=cmd_batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,375 @@
 from __future__ import annotations
 
+import logging
+import queue
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime
+from typing import Callable, Optional
 
 DB_PATH = Path("logs.db")
 
+# --- настройки фонового писателя ---
+LOG_QUEUE_SIZE = 10_000      # максимум событий в очереди (при переполнении — отбрасываем)
+LOG_FLUSH_INTERVAL = 0.5     # сек: окно накопления одной транзакции
+LOG_FLUSH_BATCH = 500        # строк: флешим раньше, если набралось столько
+
+# --- перенос старой таблицы logs в схему v2 ---
+LOG_MIGRATE_CHUNK = 2_000    # строк за транзакцию
+LOG_MIGRATE_PAUSE = 0.05     # сек между транзакциями: живой писатель не ждёт блокировку
+ACTION_CACHE_SIZE = 10_000   # текстов в кэше id писателя
+USER_CACHE_SIZE = 10_000     # последних имён пользователей в кэше писателя
+
+logger = logging.getLogger(__name__)
+
+# полный текст действия → (действие для словаря actions, detail); его знает main.py
+Split = Callable[[str], tuple[str, Optional[str]]]
+
+# Схема v2. В старой таблице logs каждая строка несла имя пользователя,
+# полный текст кнопки и время строкой ISO — десятки байт на то, что
+# повторяется из строки в строку. Теперь:
+#   - actions — словарь известных действий (кнопки, команды, префиксы
+#     вроде "FEEDBACK: "), в events — id;
+#   - users — имя пользователя, пишется только когда оно изменилось;
+#   - events — (user_id, ts, action_id, detail), ts — миллисекунды UTC от
+#     эпохи, detail — свободный текст (отзыв, ответ мастеру, аргументы
+#     команды) или NULL: в словарь он не попадает, иначе тот рос бы с
+#     каждым сообщением;
+#   - индексы (user_id, ts) и (action_id, ts) под выборки аналитики.
+# action_log — представление в прежнем виде (действие + detail) для ручных запросов.
 _SCHEMA = """
-CREATE TABLE IF NOT EXISTS logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
     username TEXT,
-    time_utc TEXT NOT NULL,
-    action TEXT NOT NULL
+    updated_ms INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    action_id INTEGER NOT NULL REFERENCES actions(id),
+    detail TEXT
 );
+CREATE INDEX IF NOT EXISTS events_user_ts ON events (user_id, ts);
+CREATE INDEX IF NOT EXISTS events_action_ts ON events (action_id, ts);
+"""
+# пересоздаётся на каждом старте: базы до detail держат старое определение
+_VIEW = """
+DROP VIEW IF EXISTS action_log;
+CREATE VIEW IF NOT EXISTS action_log AS
+    SELECT e.id, e.user_id, u.username, e.ts, a.text || coalesce(e.detail, '') AS action
+    FROM events e JOIN actions a ON a.id = e.action_id LEFT JOIN users u ON u.user_id = e.user_id;
+"""
+
+_INSERT = "INSERT INTO events (user_id, ts, action_id, detail) VALUES (?,?,?,?)"
+_UPSERT_USER = """
+INSERT INTO users (user_id, username, updated_ms) VALUES (?,?,?)
+ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, updated_ms = excluded.updated_ms
+WHERE excluded.updated_ms >= users.updated_ms AND excluded.username IS NOT users.username
 """
 
 def _get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     return conn
 
+def _has_legacy(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs'").fetchone() is not None
+
 def init_db() -> None:
     conn = _get_conn()
     try:
         conn.executescript(_SCHEMA)
+        if "detail" not in {row[1] for row in conn.execute("PRAGMA table_info(events)")}:
+            try:
+                conn.execute("ALTER TABLE events ADD COLUMN detail TEXT")
+            except sqlite3.OperationalError:
+                # соседний процесс (worker_pool) успел добавить колонку раньше
+                if "detail" not in {row[1] for row in conn.execute("PRAGMA table_info(events)")}:
+                    raise
+        conn.executescript(_VIEW)
         conn.commit()
+        if _has_legacy(conn):
+            logger.info("logs.db: legacy table logs found, start_log_migration() moves it to v2")
     finally:
         conn.close()
 
-def log_user_action(user_id: int, username: str | None, action: str) -> None:
+
+def _whole(text: str) -> tuple[str, str | None]:
+    return text, None
+
+
+class Encoder:
     """
-    Пишем в таблицу logs. Время — UTC в ISO 8601.
+    Строки (user_id, username, ts_ms, action, detail) → строки events. Id
+    действий и последние имена пользователей держит в памяти: в базу идут
+    только новые действия и сменившиеся имена. Оба кэша ограничены и при
+    переполнении просто сбрасываются. Вызывать внутри транзакции conn.
+    """
+
+    def __init__(self, cache_size: int = ACTION_CACHE_SIZE, user_cache_size: int = USER_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.user_cache_size = user_cache_size
+        self.action_ids: dict[str, int] = {}
+        self.usernames: dict[int, str | None] = {}
+
+    def action_id(self, conn: sqlite3.Connection, text: str) -> int:
+        action_id = self.action_ids.get(text)
+        if action_id is None:
+            conn.execute("INSERT OR IGNORE INTO actions (text) VALUES (?)", (text,))
+            action_id = conn.execute("SELECT id FROM actions WHERE text = ?", (text,)).fetchone()[0]
+            if len(self.action_ids) >= self.cache_size:
+                self.action_ids.clear()
+            self.action_ids[text] = action_id
+        return action_id
+
+    def encode(self, conn: sqlite3.Connection, rows: list[tuple]) -> list[tuple]:
+        events = []
+        for user_id, username, ts_ms, action, detail in rows:
+            if self.usernames.get(user_id, ()) != username:
+                conn.execute(_UPSERT_USER, (user_id, username, ts_ms))
+                if len(self.usernames) >= self.user_cache_size:
+                    self.usernames.clear()
+                self.usernames[user_id] = username
+            events.append((user_id, ts_ms, self.action_id(conn, action), detail))
+        return events
+
+    def forget_users(self) -> None:
+        # чужие записи (перенос, другие процессы) могли поменять users — сверимся заново
+        self.usernames.clear()
+
+    def rolled_back(self) -> None:
+        """Транзакция откатилась: id действий, выданные в ней, SQLite отдаст другим текстам."""
+        self.action_ids.clear()
+        self.usernames.clear()
+
+
+def migrate_legacy(chunk: int = LOG_MIGRATE_CHUNK, pause: float = LOG_MIGRATE_PAUSE,
+                   split: Split = _whole) -> int:
+    """
+    Перенос строк старой logs в events, без остановки бота. Каждая пачка
+    вставляется в events и удаляется из logs одной транзакцией — после
+    падения перенос продолжается с того же места, строки не двоятся.
+    split делит старый полный текст на (действие, detail) — его знает
+    main.py. Пустая logs удаляется. Возвращает число перенесённых строк.
     """
-    iso_utc = datetime.now(timezone.utc).isoformat()
     conn = _get_conn()
+    encoder = Encoder()
+    moved = 0
     try:
-        conn.execute(
-            "INSERT INTO logs (user_id, username, time_utc, action) VALUES (?,?,?,?)",
-            (user_id, username, iso_utc, action),
-        )
-        conn.commit()
+        while _has_legacy(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")  # несколько процессов (worker_pool) не возьмут одну пачку
+                rows = conn.execute(
+                    "SELECT id, user_id, username, time_utc, action FROM logs ORDER BY id LIMIT ?", (chunk,)
+                ).fetchall()
+                if not rows:
+                    conn.execute("DROP TABLE logs")
+                    break
+                encoder.forget_users()
+                conn.executemany(_INSERT, encoder.encode(conn, [
+                    (user_id, username, _iso_to_ms(time_utc), *split(action))
+                    for _, user_id, username, time_utc, action in rows
+                ]))
+                conn.execute("DELETE FROM logs WHERE id <= ?", (rows[-1][0],))
+            moved += len(rows)
+            time.sleep(pause)
+    finally:
+        conn.close()
+    if moved:
+        logger.info("logs.db: %d legacy rows moved to the v2 schema", moved)
+    return moved
+
+def _iso_to_ms(time_utc: str) -> int:
+    return round(datetime.fromisoformat(time_utc).timestamp() * 1000)
+
+_migration: threading.Thread | None = None
+
+def start_log_migration(split: Split = _whole) -> threading.Thread | None:
+    """Фоновый migrate_legacy, если в базе есть старая logs (и он ещё не идёт)."""
+    global _migration
+    if _migration is not None and _migration.is_alive():
+        return _migration
+    conn = _get_conn()
+    try:
+        if not _has_legacy(conn):
+            return None
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+    _migration = threading.Thread(target=_run_migration, args=(split,), name="db-log-migrate", daemon=True)
+    _migration.start()
+    return _migration
+
+def _run_migration(split: Split) -> None:
+    try:
+        migrate_legacy(split=split)
+    except (sqlite3.Error, ValueError):
+        logger.exception("logs.db: legacy migration stopped, will resume on next start")
+
+
+# маркер остановки для потока-писателя
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Фоновый писатель журнала действий (events).
+
+    Хендлеры только кладут строку в ограниченную очередь (put_nowait),
+    отдельный поток держит одно соединение и пишет накопленное через
+    executemany одной транзакцией. Флеш — по таймеру или по размеру пачки.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = LOG_QUEUE_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        batch_size: int = LOG_FLUSH_BATCH,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, row: tuple) -> bool:
+        """Неблокирующая постановка строки в очередь. False — очередь переполнена."""
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("DB log queue is full, dropped %d rows so far", self.dropped)
+            return False
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Дождаться записи всего, что уже стоит в очереди."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        """Чистая остановка: дописываем хвост очереди и закрываем соединение."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # писатель не успевает: хвост отбрасываем, чтобы маркер остановки точно дошёл
+            dropped = self._drain()
+            logger.warning("DB log queue still full at shutdown, dropped %d rows", dropped)
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.error("DB log writer did not get the stop marker, leaving the thread behind")
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _drain(self) -> int:
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            if isinstance(item, threading.Event):
+                item.set()  # flush, который ждёт этот маркер, не должен висеть
+            else:
+                dropped += 1
+
+    # ---------- поток-писатель ----------
+    def _next_batch(self) -> list:
+        # ждём первое событие без таймаута, дальше копим до дедлайна или batch_size;
+        # маркеры flush/stop закрывают пачку сразу
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn: sqlite3.Connection, encoder: Encoder, rows: list[tuple]) -> None:
+        if not rows:
+            return
+        try:
+            with conn:
+                conn.executemany(_INSERT, encoder.encode(conn, rows))
+        except sqlite3.Error:
+            # откатились и новые actions, и запись users: кэшам больше нельзя верить
+            encoder.rolled_back()
+            logger.exception("DB log batch of %d rows failed", len(rows))
+
+    def _run(self) -> None:
+        conn = _get_conn()
+        encoder = Encoder()
+        try:
+            while True:
+                batch = self._next_batch()
+                rows = [item for item in batch if isinstance(item, tuple)]
+                self._write(conn, encoder, rows)
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                if batch[-1] is _STOP:
+                    break
+        finally:
+            conn.close()
+
+
+_writer: LogWriter | None = None
+
+def start_log_writer(**kwargs) -> LogWriter:
+    """Запускает фоновый писатель; после этого log_user_action не трогает диск."""
+    global _writer
+    if _writer is None:
+        _writer = LogWriter(**kwargs)
+        _writer.start()
+    return _writer
+
+def stop_log_writer() -> None:
+    """Флеш остатка очереди и остановка потока (вызывать на shutdown)."""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+def log_user_action(user_id: int, username: str | None, action: str, detail: str | None = None) -> None:
+    """
+    Пишем в events. action — известное действие (уходит в словарь actions),
+    detail — свободный текст к нему. Время — миллисекунды UTC от эпохи, в
+    момент вызова. Если запущен фоновый писатель — только ставим строку в очередь.
+    """
+    row = (user_id, username, time.time_ns() // 1_000_000, action, detail)
+    if _writer is not None:
+        _writer.put(row)
+        return
+    conn = _get_conn()
+    try:
+        with conn:
+            conn.executemany(_INSERT, Encoder().encode(conn, [row]))
+    finally:
+        conn.close()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import re
+import shlex
+from typing import Optional, Sequence
+
+from generation import CreateTaskFormulation
+from wizard_paths import SCENARIOS
+
+# /formulate <сценарий> <ответ> <ответ> ... [режим работы] [минуты]
+#   /formulate matching sentences 1-5 a-f pairs 2
+#   /formulate labelling other "food and drinks" just yes
+# Ответы идут в том же порядке, что и вопросы мастера. На шаге с кнопками
+# ответ сверяется с вариантами (это значения enum'ов из scenarios/*.py):
+# точное совпадение, одно из слов варианта или его начало. Свободный ввод
+# («Other», диапазоны) берётся как есть; фразу с пробелами — в кавычки.
+# Хвост после инструкции — доп. параметры: режим работы и время.
+COMMAND_USAGE = (
+    "Usage: /formulate <task> <answers...> [individually|pairs|groups] [1|2|3]\n"
+    "Example: /formulate matching sentences 1-5 a-f pairs 2\n"
+    "Tasks: " + ", ".join(SCENARIOS)
+)
+
+_EXTRAS_STATE = "additional_instructions"
+_BACK_PREFIX = "Back to "
+_CHAT = 0
+
+
+class FormulateError(ValueError):
+    """Команда не разбирается или параметры не подходят к сценарию."""
+
+
+_formulator: Optional[CreateTaskFormulation] = None
+
+
+def _scratch() -> CreateTaskFormulation:
+    global _formulator
+    if _formulator is None:
+        _formulator = CreateTaskFormulation()
+    return _formulator
+
+
+def _words(option: str) -> list[str]:
+    return re.findall(r"[0-9a-z]+", option.casefold())
+
+
+def _pick(answer: str, options: Sequence[str]) -> str:
+    """Вариант кнопки по ответу пользователя; неоднозначность — ошибка."""
+    needle = answer.casefold()
+    options = [o for o in options if not o.startswith(_BACK_PREFIX)]
+    rules = (
+        lambda o: o.casefold() == needle,
+        lambda o: needle in _words(o),
+        lambda o: o.casefold().startswith(needle),
+    )
+    for rule in rules:
+        hits = [o for o in options if rule(o)]
+        if len(hits) == 1:
+            return hits[0]
+        if hits:
+            raise FormulateError(f"'{answer}' is ambiguous: {', '.join(hits)}")
+    raise FormulateError(f"'{answer}' is not one of: {', '.join(options)}")
+
+
+def scenario_key(name: str) -> str:
+    key = name.casefold().replace("-", "_")
+    if key not in SCENARIOS:
+        raise FormulateError(f"Unknown task '{name}'. Tasks: {', '.join(SCENARIOS)}")
+    return key
+
+
+def formulate(scenario: str, answers: Sequence[str]) -> str:
+    """
+    Проходит весь мастер сценария за один вызов и возвращает итоговый текст.
+    Шаги выполняет тот же интерпретатор CreateTaskFormulation, что и в диалоге.
+    """
+    formulator = _scratch()
+    formulator.reset_session(_CHAT)
+    result = formulator.start(_CHAT, scenario_key(scenario))
+    answers = list(answers)
+    pos = 0
+    while (state := formulator.get_state(_CHAT)) is not None:
+        options = result.get("options") or ()
+        if state == _EXTRAS_STATE:
+            # «+»/«-» можно не писать: есть хвост — значит доп. параметры нужны
+            if pos < len(answers) and answers[pos] in ("+", "-"):
+                text = answers[pos]
+                pos += 1
+            else:
+                text = "+" if pos < len(answers) else "-"
+        elif pos >= len(answers):
+            hint = f" Options: {', '.join(o for o in options if not o.startswith(_BACK_PREFIX))}" if options else ""
+            raise FormulateError(f"Missing answer for: {result.get('text', '')}{hint}")
+        else:
+            text = _pick(answers[pos], options) if options else answers[pos]
+            pos += 1
+        result = formulator.handle(_CHAT, text)
+        if formulator.get_state(_CHAT) == state:
+            # шаг не принял ответ и переспрашивает
+            raise FormulateError(f"'{text}' rejected: {result.get('text', '')}")
+    if pos < len(answers):
+        raise FormulateError(f"Unexpected extra parameters: {' '.join(answers[pos:])}")
+    return result["text"]
+
+
+def parse_command(text: str) -> tuple[str, list[str]]:
+    """'/formulate matching sentences 1-5' → ('matching', ['sentences', '1-5'])."""
+    _, _, args = (text or "").partition(" ")
+    try:
+        parts = shlex.split(args)
+    except ValueError as e:  # незакрытая кавычка
+        raise FormulateError(str(e)) from None
+    if not parts:
+        raise FormulateError(COMMAND_USAGE)
+    return parts[0], parts[1:]
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import itertools
+import string
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Union
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+import metrics
+from generation import SCENARIO_GRAPH, CreateTaskFormulation
+from keyboards import AFTER_DONE
+from wizard_paths import SCENARIOS
+
+# Весь путь по мастеру лежит в callback_data кнопки:
+#   "w" + код сценария + по символу на шаг [+ "|" + свободные ответы]
+#   шаг — индекс выбранного варианта (0-9a-zA-Z) или FREE для свободного ввода.
+# Сервер сессию для таких путей не хранит: каждый клик проигрывается заново
+# на служебном формуляторе, поэтому клик может обработать любой воркер.
+WIZARD_PREFIX = "w"
+MENU_PREFIX = "m"
+TOKEN_PREFIX = "t"  # путь не влез в 64 байта — хранится на сервере по токену
+FREE = "."
+TEXT_SEP = "|"
+CALLBACK_DATA_MAX = 64  # лимит Telegram, в байтах
+
+# сколько «длинных» путей и ожидающих ввода чатов держим в памяти
+LONG_PATHS_MAX = 10_000
+PENDING_MAX = 10_000
+
+_ALPHABET = string.digits + string.ascii_letters
+
+
+def _section_items(section: str) -> tuple[tuple[str, str], ...]:
+    return tuple((sc.button, sc.key) for sc in SCENARIO_GRAPH.scenarios.values() if sc.section == section)
+
+
+# код меню → (раздел, заголовок, [(кнопка, сценарий), ...])
+SECTION_MENUS = {
+    "v": ("vocabulary", "Vocabulary tasks:", _section_items("vocabulary")),
+    "g": ("grammar", "Grammar tasks:", _section_items("grammar")),
+    "r": ("reading", "Reading tasks:", _section_items("reading")),
+}
+SECTIONS_MENU = "s"
+MAIN_MENU = "x"
+_MENU_OF_SECTION = {section: code for code, (section, _, _) in SECTION_MENUS.items()}
+_SECTION_OF = {sc: section for section, _, items in SECTION_MENUS.values() for _, sc in items}
+_BACK_BUTTONS = {
+    "Back to Vocabulary": "v",
+    "Back to Grammar": "g",
+    "Back to Reading": "r",
+    "Back to sections": SECTIONS_MENU,
+    "Back to main menu": MAIN_MENU,
+}
+
+PathItem = Union[int, str]  # индекс кнопки или свободный ответ
+
+
+class Screen(NamedTuple):
+    text: str
+    markup: Optional[InlineKeyboardMarkup] = None
+    # (сценарий, путь), если шаг ждёт свободный ввод
+    pending: Optional[tuple[str, tuple[PathItem, ...]]] = None
+    # пользователь ушёл в главное меню (reply-клавиатура)
+    main_menu: bool = False
+    # сценарий, чья инструкция на этом экране (мастер завершён)
+    done: Optional[str] = None
+
+
+class StaleCallback(ValueError):
+    """callback_data не разбирается или больше не соответствует мастеру."""
+
+
+# служебный формулятор: на нём проигрываются пути, реальные чаты сюда не попадают
+_scratch = CreateTaskFormulation(stage=metrics.stage)
+_CHAT = 0
+
+_long_paths: "OrderedDict[str, tuple[str, tuple[PathItem, ...]]]" = OrderedDict()
+_token_seq = itertools.count()
+_pending: "OrderedDict[int, tuple[str, tuple[PathItem, ...]]]" = OrderedDict()
+
+
+# ---------- кодирование пути ----------
+def _b62(n: int) -> str:
+    digits = []
+    while True:
+        n, r = divmod(n, len(_ALPHABET))
+        digits.append(_ALPHABET[r])
+        if not n:
+            return "".join(reversed(digits))
+
+
+def encode(scenario: str, path: tuple[PathItem, ...]) -> str:
+    steps = "".join(FREE if isinstance(p, str) else _ALPHABET[p] for p in path)
+    texts = [p for p in path if isinstance(p, str)]
+    data = WIZARD_PREFIX + _ALPHABET[SCENARIOS.index(scenario)] + steps
+    if texts:
+        data += TEXT_SEP + TEXT_SEP.join(texts)
+    if len(data.encode("utf-8")) <= CALLBACK_DATA_MAX and not any(TEXT_SEP in t for t in texts):
+        return data
+
+    # длинный свободный ввод — единственный случай, когда путь хранится на сервере
+    token = _b62(next(_token_seq))
+    _long_paths[token] = (scenario, path)
+    if len(_long_paths) > LONG_PATHS_MAX:
+        _long_paths.popitem(last=False)
+    return TOKEN_PREFIX + token
+
+
+def decode(data: str) -> tuple[str, tuple[PathItem, ...]]:
+    if data.startswith(TOKEN_PREFIX):
+        try:
+            return _long_paths[data[1:]]
+        except KeyError:
+            raise StaleCallback(data) from None
+    if not data.startswith(WIZARD_PREFIX) or len(data) < 2:
+        raise StaleCallback(data)
+
+    head, sep, tail = data[1:].partition(TEXT_SEP)
+    # по разделителю, а не по непустому хвосту: пустой ответ — тоже ответ
+    texts = tail.split(TEXT_SEP) if sep else []
+    if head[1:].count(FREE) != len(texts):
+        raise StaleCallback(data)
+    answers = iter(texts)
+    try:
+        scenario = SCENARIOS[_ALPHABET.index(head[0])]
+        path = tuple(next(answers) if c == FREE else _ALPHABET.index(c) for c in head[1:])
+    except (ValueError, IndexError):
+        raise StaleCallback(data) from None
+    return scenario, path
+
+
+def split_data(data: str) -> tuple[str, Optional[str]]:
+    """Данные кнопки → (путь по кнопкам, свободный ввод или токен): второе — не для словаря действий."""
+    if data.startswith(TOKEN_PREFIX):
+        return TOKEN_PREFIX, data[len(TOKEN_PREFIX):]
+    head, sep, tail = data.partition(TEXT_SEP)
+    return head, (sep + tail) if sep else None
+
+
+# ---------- проигрывание пути ----------
+def _replay(scenario: str, path: tuple[PathItem, ...]) -> tuple[dict, Optional[str]]:
+    formulator = _scratch
+    formulator.reset_session(_CHAT)
+    result = formulator.start(_CHAT, scenario)
+    for item in path:
+        state = formulator.get_state(_CHAT)
+        if state is None:
+            raise StaleCallback(scenario)
+        if isinstance(item, int):
+            options = result.get("options") or ()
+            if item >= len(options):
+                raise StaleCallback(scenario)
+            item = options[item]
+        result = formulator.handle(_CHAT, item)
+    return result, formulator.get_state(_CHAT)
+
+
+def _markup(buttons) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data=data)] for text, data in buttons
+    ])
+
+
+def _screen(scenario: str, path: tuple[PathItem, ...], result: dict, state: Optional[str]) -> Screen:
+    action = result.get("action")
+    if action == "done":
+        back = AFTER_DONE[_SECTION_OF[scenario]]
+        return Screen(result["text"], _markup((b, MENU_PREFIX + _BACK_BUTTONS[b]) for b in back), done=scenario)
+    if action and action.startswith("back_to_"):
+        return menu_screen(_MENU_OF_SECTION[action[len("back_to_"):]])
+
+    options = result.get("options")
+    if options:
+        return Screen(result["text"], _markup(
+            (option, encode(scenario, path + (i,))) for i, option in enumerate(options)
+        ))
+    return Screen(result["text"], pending=(scenario, path))
+
+
+def menu_screen(code: str) -> Screen:
+    if code == MAIN_MENU:
+        return Screen("Main menu. Please select an option:", main_menu=True)
+    if code == SECTIONS_MENU:
+        return Screen("Select a section:", _markup(
+            (("Vocabulary", MENU_PREFIX + "v"), ("Grammar", MENU_PREFIX + "g"),
+             ("Reading", MENU_PREFIX + "r"), ("Back to main menu", MENU_PREFIX + MAIN_MENU))
+        ))
+    try:
+        _, title, items = SECTION_MENUS[code]
+    except KeyError:
+        raise StaleCallback(code) from None
+    return Screen(title, _markup(
+        [(label, WIZARD_PREFIX + _ALPHABET[SCENARIOS.index(sc)]) for label, sc in items]
+        + [("Back to sections", MENU_PREFIX + SECTIONS_MENU)]
+    ))
+
+
+def restart_screen() -> Screen:
+    return menu_screen(SECTIONS_MENU)._replace(text="This menu is outdated. Please select a section again:")
+
+
+def on_callback(chat_id: int, data: str) -> Screen:
+    """Экран для нажатой inline-кнопки. Бросает StaleCallback на устаревших/чужих данных."""
+    cancel(chat_id)
+    if data.startswith(MENU_PREFIX):
+        return menu_screen(data[1:])
+    scenario, path = decode(data)
+    screen = _screen(scenario, path, *_replay(scenario, path))
+    if screen.pending:
+        _wait_text(chat_id, screen.pending)
+    return screen
+
+
+def on_text(chat_id: int, text: str) -> Screen:
+    """Свободный ввод для чата, который ждёт ответ на шаге без кнопок."""
+    scenario, path = _pending.pop(chat_id)
+    try:
+        _, before = _replay(scenario, path)
+    except (ValueError, KeyError):
+        # путь больше не проходит по графу (мастер поменялся после деплоя)
+        return restart_screen()
+    try:
+        result, state = _replay(scenario, path + (text,))
+    except ValueError:
+        result, state = {"text": "Please try again."}, before
+    if state is not None and state == before:
+        # ответ не принят — повторный вопрос, ждём дальше
+        _wait_text(chat_id, (scenario, path))
+        return Screen(result.get("text", "Please try again."), pending=(scenario, path))
+    screen = _screen(scenario, path + (text,), result, state)
+    if screen.pending:
+        _wait_text(chat_id, screen.pending)
+    return screen
+
+
+# ---------- чаты, ожидающие свободный ввод ----------
+def _wait_text(chat_id: int, pending: tuple[str, tuple[PathItem, ...]]) -> None:
+    _pending[chat_id] = pending
+    _pending.move_to_end(chat_id)
+    if len(_pending) > PENDING_MAX:
+        _pending.popitem(last=False)
+
+
+def is_waiting(chat_id: int) -> bool:
+    return chat_id in _pending
+
+
+def cancel(chat_id: int) -> None:
+    _pending.pop(chat_id, None)
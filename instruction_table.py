@@ -0,0 +1,113 @@
+"""
+Таблица готовых инструкций для всех путей мастера, пройденных только кнопками.
+
+Текст инструкции — чистая функция полей объекта сценария, поэтому таблицу
+можно посчитать заранее: на последнем шаге мастера вместо generate_instruction()
+делается поиск в словаре. Пути со свободным вводом («Other», диапазоны)
+в таблицу не попадают и идут через шаблон как раньше.
+
+Та же таблица, записанная по path id, — эталонный корпус для регрессии:
+
+    python instruction_table.py            # сверить генерацию с instruction_table.json
+    python instruction_table.py --write    # перезаписать эталон
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Hashable, Iterable, Iterator
+
+from wizard_paths import SHARED_STATES, iter_steps, replay
+
+GOLDEN_PATH = Path(__file__).with_name("instruction_table.json")
+PATH_SEP = " > "
+
+
+def path_id(scenario: str, path: Iterable[str]) -> str:
+    """'labelling > Actions (verbs) > Just label the pictures > Yes'"""
+    return PATH_SEP.join((scenario, *path))
+
+
+def state_key(scenario_obj: Any) -> Hashable:
+    """Ключ по полям объекта сценария: enum'ы, строки, bool — всё хешируется."""
+    return type(scenario_obj), tuple(scenario_obj.__dict__.values())
+
+
+def enumerate_paths(factory: Callable[[], Any]) -> Iterator[tuple[str, tuple[str, ...], Any, str]]:
+    """(сценарий, путь, объект сценария, инструкция) для каждого кнопочного пути до доп. инструкций."""
+    formulator = factory()
+    for step in iter_steps(factory):
+        if step.buttons_only and step.state in SHARED_STATES:
+            replay(formulator, step.scenario, step.path)
+            sess = formulator._s(0)
+            yield step.scenario, step.path, sess.scenario, sess["pending_instruction"]
+
+
+class InstructionTable:
+    def __init__(self, entries: Iterable[tuple[str, Any, str]]):
+        by_path: dict[str, str] = {}
+        by_state: dict[Hashable, str] = {}
+        for pid, scenario_obj, instruction in entries:
+            by_path[pid] = instruction
+            by_state[state_key(scenario_obj)] = instruction
+        self.by_path = MappingProxyType(by_path)
+        self._by_state = MappingProxyType(by_state)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def build(cls, factory: Callable[[], Any]) -> "InstructionTable":
+        return cls(
+            (path_id(scenario, path), obj, instruction)
+            for scenario, path, obj, instruction in enumerate_paths(factory)
+        )
+
+    def instruction(self, scenario_obj: Any) -> str:
+        """Готовый текст из таблицы, иначе — шаблон сценария (пути со свободным вводом)."""
+        try:
+            text = self._by_state.get(state_key(scenario_obj))
+        except TypeError:  # в полях оказалось что-то нехешируемое
+            text = None
+        if text is None:
+            self.misses += 1
+            return scenario_obj.generate_instruction()
+        self.hits += 1
+        return text
+
+    def __len__(self) -> int:
+        return len(self.by_path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write", action="store_true", help="перезаписать эталонный корпус")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH)
+    args = parser.parse_args()
+
+    from generation import CreateTaskFormulation
+
+    current = dict(sorted(InstructionTable.build(CreateTaskFormulation).by_path.items()))
+    if args.write:
+        args.golden.write_text(json.dumps(current, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        print(f"{len(current)} paths written to {args.golden}")
+        return 0
+
+    golden = json.loads(args.golden.read_text(encoding="utf-8"))
+    changed = [pid for pid in golden.keys() & current.keys() if golden[pid] != current[pid]]
+    missing = golden.keys() - current.keys()
+    added = current.keys() - golden.keys()
+    for pid in sorted(changed):
+        print(f"CHANGED {pid}\n  was: {golden[pid]}\n  now: {current[pid]}")
+    for pid in sorted(missing):
+        print(f"MISSING {pid}")
+    for pid in sorted(added):
+        print(f"NEW     {pid}")
+    print(f"{len(current)} paths: {len(changed)} changed, {len(missing)} missing, {len(added)} new")
+    return 1 if changed or missing or added else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
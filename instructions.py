@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+
+from scenario_graph import CompiledChoice, CompiledText
+from scenarios import SCENARIO_GRAPH
+
+# Параметры задания → текст инструкции без сессий и без Telegram. Шаги и
+# их варианты — те же, что у мастера: build_instruction проходит граф
+# сценария (scenarios.SCENARIO_GRAPH) и на каждом шаге берёт ответ из
+# параметра шага (param в scenarios/*.py). Ключи словаря:
+#   task — сценарий (labelling, matching, grammar_completion, ...);
+#   параметры шагов — текст кнопки (регистр не важен, «_» вместо пробелов
+#   можно), для да/нет — yes/no; для шага без кнопок — сам текст;
+#   своё значение вместо «Other» — в поле <параметр>_other или прямо в
+#   самом параметре, если его нет среди кнопок;
+#   work_mode / time — доп. параметры, как на последнем шаге мастера.
+#   {"task": "matching", "matching_type": "Sentences to pictures",
+#    "sentences": "1-5", "pictures": "a-f", "work_mode": "In pairs", "time": 2}
+
+WORK_MODES = {
+    "Individually": "Work individually.",
+    "In pairs": "Work in pairs.",
+    "In groups": "Work in groups.",
+}
+_TRUE = {"yes", "y", "true", "1", "+"}
+_FALSE = {"no", "n", "false", "0", "-"}
+
+
+class ParamError(ValueError):
+    """Параметры не подходят к сценарию."""
+
+
+# ---------- разбор значений ----------
+def _get(params: Mapping[str, Any], key: str) -> Any:
+    value = params.get(key)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, "") else value
+
+
+# ---------- проход по графу мастера ----------
+def _choose(step: CompiledChoice, obj, params: Mapping[str, Any]) -> tuple[str, Optional[str]]:
+    """Кнопка шага по параметру и, если вместо «Other» дан свой текст, — он сам."""
+    answers = step.answers(obj)
+    value = _get(params, step.param)
+    if value is None:
+        value = step.default
+    if value is None:
+        raise ParamError(f"'{step.param}' is required (one of: {', '.join(answers)})")
+    if isinstance(value, bool):
+        value = "yes" if value else "no"
+    needle = str(value).casefold()
+    if "Yes" in answers:
+        needle = "yes" if needle in _TRUE else "no" if needle in _FALSE else needle
+    for label in answers:
+        if needle in (label.casefold(), label.casefold().replace(" ", "_")):
+            return label, None
+    if "Other" in answers:
+        # «Other» без своего действия ведёт на ввод своего варианта — туда и значение
+        tr = step.transition(obj, "Other")
+        if tr.apply is None and isinstance(SCENARIO_GRAPH.steps.get(tr.next), CompiledText):
+            return "Other", str(value)
+    raise ParamError(f"'{step.param}': '{value}' is not one of: {', '.join(answers)}")
+
+
+def _enter(step: CompiledText, params: Mapping[str, Any], carried: Optional[str]) -> str:
+    value = _get(params, step.param)
+    if value is None:
+        value = carried
+    if value is None:
+        raise ParamError(f"'{step.param}' is required")
+    return str(value)
+
+
+def _walk(scenario: str, params: Mapping[str, Any]) -> str:
+    spec = SCENARIO_GRAPH.scenarios[scenario]
+    obj = spec.factory()
+    state, carried = spec.start, None
+    while True:
+        step = SCENARIO_GRAPH.steps[state]
+        if isinstance(step, CompiledText):
+            text, carried = _enter(step, params, carried), None
+        else:
+            text, carried = _choose(step, obj, params)
+        outcome = step.advance(obj, text)
+        if outcome.kind == "invalid":
+            raise ParamError(f"'{step.param}': {outcome.result['text']}")
+        if outcome.kind == "finish":
+            return obj.generate_instruction()
+        state = outcome.state
+
+
+def with_extras(instruction: str, work_mode: Optional[str], time_min: Optional[int]) -> str:
+    """Инструкция плюс режим работы и время — как на шаге доп. инструкций мастера."""
+    parts = [instruction.rstrip()]
+    if work_mode in WORK_MODES:
+        parts.append(WORK_MODES[work_mode])
+    if isinstance(time_min, int):
+        parts.append("You have 1 minute." if time_min == 1 else f"You have {time_min} minutes.")
+    return " ".join(p.strip() for p in parts if p and p.strip())
+
+
+def _extras(params: Mapping[str, Any]) -> tuple[Optional[str], Optional[int]]:
+    work_mode = _get(params, "work_mode")
+    if work_mode is not None:
+        needle = str(work_mode).casefold()
+        for mode in WORK_MODES:
+            if needle in (mode.casefold(), mode.split()[-1].casefold()):
+                work_mode = mode
+                break
+        else:
+            raise ParamError(f"'work_mode': '{work_mode}' is not one of: {', '.join(WORK_MODES)}")
+    time_min = _get(params, "time")
+    if time_min is not None:
+        try:
+            time_min = int(str(time_min).split()[0])
+        except ValueError:
+            raise ParamError(f"'time' must be a number of minutes, got '{time_min}'") from None
+        if time_min <= 0:
+            raise ParamError("'time' must be positive")
+    return work_mode, time_min
+
+
+def build_instruction(params: Mapping[str, Any]) -> str:
+    """Текст инструкции по словарю параметров (см. комментарий в начале модуля)."""
+    scenarios = SCENARIO_GRAPH.scenarios
+    task = _get(params, "task") or _get(params, "scenario")
+    if task is None:
+        raise ParamError(f"'task' is required (one of: {', '.join(scenarios)})")
+    scenario = str(task).casefold().replace("-", "_")
+    if scenario not in scenarios:
+        raise ParamError(f"Unknown task '{task}'. Tasks: {', '.join(scenarios)}")
+    try:
+        instruction = _walk(scenario, params)
+    except ParamError:
+        raise
+    except (ValueError, AttributeError) as e:
+        # проверки внутри классов сценариев
+        raise ParamError(str(e)) from None
+    work_mode, time_min = _extras(params)
+    if work_mode is None and time_min is None:
+        return instruction
+    return with_extras(instruction, work_mode, time_min)
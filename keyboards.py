@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+from typing import Iterable
+
+from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
+
+from generation import SCENARIO_GRAPH
+
+logger = logging.getLogger(__name__)
+
+# защита от неограниченного роста, если варианты вдруг станут динамическими
+KEYBOARD_CACHE_MAX = 1024
+
+
+def section_menu(section: str) -> tuple[str, ...]:
+    """Кнопки сценариев раздела — в порядке реестра SCENARIO_GRAPH."""
+    buttons = tuple(s.button for s in SCENARIO_GRAPH.scenarios.values() if s.section == section)
+    return buttons + ("Back to sections",)
+
+
+# меню обоих ботов — тоже попадают в кэш при прогреве
+MAIN_MENU = ("Create task formulation", "Practice task formulation", "Feedback", "Help")
+SECTIONS = ("Vocabulary", "Grammar", "Reading", "Back to main menu")
+VOCABULARY_MENU = section_menu("vocabulary")
+GRAMMAR_MENU = section_menu("grammar")
+READING_MENU = section_menu("reading")
+AFTER_DONE = {
+    "grammar": ("Back to Grammar", "Back to sections", "Back to main menu"),
+    "reading": ("Back to Reading", "Back to sections", "Back to main menu"),
+    "vocabulary": ("Back to Vocabulary", "Back to sections", "Back to main menu"),
+}
+AFTER_EXTRAS = ("Back to sections", "Back to main menu")
+MENUS = (MAIN_MENU, SECTIONS, VOCABULARY_MENU, GRAMMAR_MENU, READING_MENU, AFTER_EXTRAS,
+         *AFTER_DONE.values())
+
+_cache: dict[tuple[str, ...], ReplyKeyboardMarkup] = {}
+
+
+def reply_kb(options: Iterable[str]) -> ReplyKeyboardMarkup:
+    """
+    Клавиатура «одна кнопка в ряд» для набора вариантов.
+
+    Модели aiogram неизменяемые (frozen), поэтому один и тот же объект
+    можно отдавать во все ответы: pydantic-конструирование и валидация
+    происходят один раз на набор вариантов, а не на каждое сообщение.
+    """
+    key = options if isinstance(options, tuple) else tuple(options)
+    kb = _cache.get(key)
+    if kb is None:
+        kb = ReplyKeyboardMarkup(
+            resize_keyboard=True,
+            keyboard=[[KeyboardButton(text=str(o))] for o in key],
+        )
+        if len(_cache) < KEYBOARD_CACHE_MAX:
+            _cache[key] = kb
+    return kb
+
+
+def warm_up(factory=None) -> int:
+    """
+    Строит заранее клавиатуры для всех меню и всех наборов вариантов,
+    которые может вернуть CreateTaskFormulation (включая повторные вопросы).
+    """
+    from wizard_paths import iter_steps
+
+    if factory is None:
+        from generation import CreateTaskFormulation as factory
+
+    for menu in MENUS:
+        reply_kb(menu)
+    for step in iter_steps(factory, include_invalid=True):
+        if step.options:
+            reply_kb(step.options)
+    logger.info("Keyboard cache warmed up: %d keyboards", len(_cache))
+    return len(_cache)
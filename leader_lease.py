@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+# Один опрашивающий экземпляр на токен: аренда (lease) в SQLite с heartbeat.
+# Лидер продлевает аренду каждые LEASE_HEARTBEAT секунд; второй экземпляр
+# ждёт в горячем резерве и забирает аренду, как только она освобождена
+# (штатная остановка) или просрочена (лидер упал / завис дольше LEASE_TTL).
+# Срок — несколько периодов продления: продление идёт через to_thread и
+# SQLite, и одна пропущенная пауза (GC, занятый пул потоков) не должна
+# отнимать аренду у живого лидера. По умолчанию резерв начинает опрос не
+# позже чем через LEASE_TTL + LEASE_POLL (< 1 с) после падения лидера; на
+# медленном диске срок поднимают через LEASE_TTL / LEASE_HEARTBEAT ценой
+# более долгого переключения.
+
+LEASE_DB_PATH = Path("lease.db")
+LEASE_NAME = "polling"
+LEASE_TTL = 0.8          # сек: без продления дольше — аренда считается брошенной
+LEASE_HEARTBEAT = 0.2    # сек: период продления лидером
+LEASE_MIN_RENEWALS = 2   # продлений за срок, не меньше
+LEASE_POLL = 0.1         # сек: как часто резерв проверяет аренду
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires REAL NOT NULL,
+    acquired REAL NOT NULL
+);
+"""
+
+
+class SQLiteLease:
+    """
+    Аренда имени name в файле path. Время — time.time(): экземпляры
+    работают на одной машине (файл общий), часы у них общие.
+
+    Все обращения к базе — короткие транзакции BEGIN IMMEDIATE, так что
+    захват атомарен: из двух резервов аренду получит ровно один.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = LEASE_DB_PATH,
+        name: str = LEASE_NAME,
+        ttl: float = LEASE_TTL,
+        heartbeat: float = LEASE_HEARTBEAT,
+        poll: float = LEASE_POLL,
+        holder: Optional[str] = None,
+    ):
+        if heartbeat * LEASE_MIN_RENEWALS > ttl:
+            raise ValueError(f"ttl must cover at least {LEASE_MIN_RENEWALS} heartbeats")
+        self.path = Path(path)
+        self.name = name
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.poll = poll
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.expires = 0.0       # до какого момента аренда точно наша
+        self.lost = False        # последний hold() кончился потерей аренды, а не выходом из блока
+        self._conn: sqlite3.Connection | None = None
+        # операции идут из разных потоков to_thread; одно соединение — по очереди
+        self._lock = threading.Lock()
+
+    # ---------- синхронные операции (вызываются через to_thread) ----------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.heartbeat, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def try_acquire(self) -> bool:
+        """Забрать аренду, если она свободна, просрочена или уже наша."""
+        with self._lock:
+            return self._try_acquire()
+
+    def _try_acquire(self) -> bool:
+        conn = self._db()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT holder, expires FROM lease WHERE name = ?", (self.name,)).fetchone()
+            if row is not None and row[0] != self.holder and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO lease (name, holder, expires, acquired) VALUES (?,?,?,?)",
+                (self.name, self.holder, now + self.ttl, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.expires = now + self.ttl
+        return True
+
+    def renew(self) -> bool:
+        """Продлить свою аренду; False — её уже забрал другой."""
+        now = time.time()
+        with self._lock:
+            cur = self._db().execute(
+                "UPDATE lease SET expires = ? WHERE name = ? AND holder = ?",
+                (now + self.ttl, self.name, self.holder),
+            )
+        if cur.rowcount != 1:
+            return False
+        self.expires = now + self.ttl
+        return True
+
+    def release(self) -> None:
+        """Отдать аренду сразу — резерв заберёт её за LEASE_POLL, не дожидаясь TTL."""
+        with self._lock:
+            self._db().execute("DELETE FROM lease WHERE name = ? AND holder = ?", (self.name, self.holder))
+        self.expires = 0.0
+
+    def current(self) -> Optional[tuple[str, float]]:
+        """(holder, expires) текущей аренды или None."""
+        with self._lock:
+            return self._db().execute("SELECT holder, expires FROM lease WHERE name = ?", (self.name,)).fetchone()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------- асинхронная обвязка ----------
+    async def wait(self) -> None:
+        """Ждать аренды (горячий резерв). Возвращается, когда мы — лидер."""
+        announced = False
+        while True:
+            try:
+                if await asyncio.to_thread(self.try_acquire):
+                    logger.info("Lease %r acquired by %s", self.name, self.holder)
+                    return
+                if not announced:
+                    current = await asyncio.to_thread(self.current)
+                    logger.info("Standby: lease %r is held by %s", self.name, current[0] if current else "?")
+                    announced = True
+            except sqlite3.Error:
+                logger.exception("Lease check failed")
+            await asyncio.sleep(self.poll)
+
+    async def _keep(self, on_lost: Callable[[], Awaitable[object]]) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                if await asyncio.to_thread(self.renew):
+                    continue
+                reason = "taken over by another instance"
+            except sqlite3.Error:
+                # временная ошибка базы: аренда ещё наша, пока не истёк срок
+                if time.time() < self.expires:
+                    logger.warning("Lease renew failed, retrying", exc_info=True)
+                    continue
+                reason = "could not be renewed before expiry"
+            logger.error("Lease %r lost: %s", self.name, reason)
+            self.lost = True
+            await on_lost()
+            return
+
+    @asynccontextmanager
+    async def hold(self, on_lost: Callable[[], Awaitable[object]]):
+        """
+        Держать аренду (heartbeat) на время блока. on_lost — что сделать,
+        если аренда потеряна: лидер должен перестать опрашивать Telegram.
+        На выходе аренда освобождается; lost — потеряна ли она по дороге.
+        """
+        self.lost = False
+        keeper = asyncio.create_task(self._keep(on_lost))
+        try:
+            yield self
+        finally:
+            keeper.cancel()
+            try:
+                await asyncio.to_thread(self.release)
+            except sqlite3.Error:
+                logger.exception("Lease release failed")
+            self.close()
+
+
+def from_env(**kwargs) -> SQLiteLease:
+    """Аренда с настройками из окружения: LEASE_DB, LEASE_TTL, LEASE_HEARTBEAT."""
+    return SQLiteLease(
+        os.getenv("LEASE_DB", LEASE_DB_PATH),
+        ttl=float(os.getenv("LEASE_TTL", LEASE_TTL)),
+        heartbeat=float(os.getenv("LEASE_HEARTBEAT", LEASE_HEARTBEAT)),
+        **kwargs,
+    )
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# Логи без диска на event loop: корневой логгер пишет только в очередь
+# (QueueHandler), а форматирование в файл/консоль, ротация и сжатие —
+# в потоке QueueListener. Ротированный файл сжимается в gzip ещё одним
+# фоновым потоком, чтобы сжатие не тормозило и сам listener.
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+LOG_QUEUE_SIZE = 50_000          # записей; при переполнении — отбрасываем, как LogWriter в db_utils
+LOG_MAX_BYTES = 2_000_000
+LOG_BACKUP_COUNT = 5
+LOG_UPDATE_SAMPLE = 1.0          # доля строк «Update id=... is handled» на уровне INFO
+LOG_SLOW_UPDATE_MS = 500         # медленные апдейты пишутся всегда
+
+# aiogram пишет строку на каждый апдейт сюда
+UPDATE_LOGGER = "aiogram.event"
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler, чьи архивы — bot.log.1.gz ... bot.log.N.gz.
+
+    В doRollover остаётся только быстрое: закрыть файл, переименовать его
+    во временный и открыть новый. Сдвиг архивов и сжатие уходят в
+    отдельный поток — по порядку, поэтому две ротации подряд
+    не перепутают номера.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._archiver = threading.Thread(target=self._run_archiver, name="log-gzip", daemon=True)
+        self._archiver.start()
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.backupCount > 0 and os.path.exists(self.baseFilename):
+            pending = f"{self.baseFilename}.{time.time_ns()}.tmp"
+            os.rename(self.baseFilename, pending)
+            self._pending.put(pending)
+        if not self.delay:
+            self.stream = self._open()
+
+    def _run_archiver(self) -> None:
+        while True:
+            pending = self._pending.get()
+            if pending is None:
+                break
+            try:
+                self._archive(pending)
+            except OSError:
+                # не через logging: запись ушла бы в тот же файл, который мы сейчас ротируем
+                print(f"log archive of {pending} failed", file=sys.stderr)
+
+    def _archive(self, pending: str) -> None:
+        base = self.baseFilename
+        for i in range(self.backupCount - 1, 0, -1):
+            src, dst = f"{base}.{i}.gz", f"{base}.{i + 1}.gz"
+            if os.path.exists(src):
+                os.replace(src, dst)
+        with open(pending, "rb") as f_in, gzip.open(f"{base}.1.gz.tmp", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(f"{base}.1.gz.tmp", f"{base}.1.gz")
+        os.remove(pending)
+
+    def close(self) -> None:
+        """Закрыть файл и дождаться сжатия уже ротированных частей."""
+        super().close()
+        if self._archiver.is_alive():
+            self._pending.put(None)
+            self._archiver.join()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который при полной очереди считает потери, а не печатает traceback.
+
+    В очередь своего процесса запись кладётся без форматирования: строку
+    сообщения и traceback из exc_info собирает уже поток listener'а, а не
+    event loop (QueueHandler.prepare делал бы это здесь). Очередь другого
+    процесса (pickle=True) получает запись как у QueueHandler — уже
+    отформатированной: args и traceback могут не пережить pickle.
+    """
+
+    def __init__(self, q, pickle: bool = False):
+        super().__init__(q)
+        self.pickle = pickle
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if self.pickle:
+            return super().prepare(record)
+        # снимок записи: args — кортеж (или копия словаря), сообщение из него соберёт listener
+        record = copy.copy(record)
+        if isinstance(record.args, dict):
+            record.args = dict(record.args)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class UpdateLogSampler(logging.Filter):
+    """
+    Прореживает строки aiogram «Update id=... is handled. Duration N ms».
+
+    Из каждых 1/rate строк на INFO остаётся одна, остальные понижаются
+    до DEBUG (и видны только при LOG_LEVEL=DEBUG). Необработанные и
+    медленные (>= slow_ms) апдейты не прореживаются. Выборка детерминированная:
+    rate=0.1 — ровно каждая десятая строка.
+    """
+
+    def __init__(self, rate: float = LOG_UPDATE_SAMPLE, slow_ms: float = LOG_SLOW_UPDATE_MS):
+        super().__init__()
+        self.rate = rate
+        self.slow_ms = slow_ms
+        self._credit = 0.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name != UPDATE_LOGGER or record.levelno != logging.INFO or self.rate >= 1:
+            return True
+        args = record.args
+        # args: (update_id, "handled" | "not handled", duration_ms, bot_id)
+        if isinstance(args, tuple) and len(args) == 4 and (args[1] != "handled" or args[2] >= self.slow_ms):
+            return True
+        self._credit += self.rate
+        if self._credit >= 1:
+            self._credit -= 1
+            return True
+        record.levelno, record.levelname = logging.DEBUG, "DEBUG"
+        return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+# очередь родителя, если этот процесс — воркер пула (worker_pool.py)
+_forward_queue = None
+
+
+def forward_to(q) -> None:
+    """
+    Вызвать в дочернем процессе до setup(): записи пойдут не в свой файл,
+    а в multiprocessing-очередь родителя — bot.log пишет только он.
+    """
+    global _forward_queue
+    _forward_queue = q
+
+
+def listen(q, handlers) -> QueueListener:
+    """В родителе: ещё один listener — на очередь воркеров, обычно с handlers из setup()."""
+    extra = QueueListener(q, *handlers, respect_handler_level=True)
+    extra.start()
+    atexit.register(extra.stop)
+    return extra
+
+
+def setup(
+    log_file: str,
+    level: str = "INFO",
+    update_sample: float = LOG_UPDATE_SAMPLE,
+    slow_update_ms: float = LOG_SLOW_UPDATE_MS,
+    console: bool = True,
+    max_bytes: int = LOG_MAX_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+    queue_size: int = LOG_QUEUE_SIZE,
+) -> Optional[QueueListener]:
+    """
+    Корневой логгер → очередь → поток-listener → файл (+ консоль).
+    Listener останавливается при выходе из процесса (atexit): хвост очереди дописывается.
+    В воркере пула (forward_to) — только QueueHandler в очередь родителя, без listener.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _forward_queue is not None:
+        forward = DroppingQueueHandler(_forward_queue, pickle=True)
+        forward.addFilter(UpdateLogSampler(update_sample, slow_update_ms))
+        root.addHandler(forward)
+        return None
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = GzipRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    handlers: list[logging.Handler] = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))  # как было с basicConfig
+        handlers.append(console_handler)
+
+    q: queue.Queue = queue.Queue(queue_size)
+    queue_handler = DroppingQueueHandler(q)
+    queue_handler.addFilter(UpdateLogSampler(update_sample, slow_update_ms))
+
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+
+    def _stop():
+        listener.stop()
+        for handler in handlers:
+            handler.close()
+        if queue_handler.dropped:
+            print(f"logging queue overflow: {queue_handler.dropped} records dropped", file=sys.stderr)
+
+    atexit.register(_stop)
+    return listener
+
@@ -1,29 +1,60 @@
 # main.py
 import asyncio
 import logging
+import tempfile
 from os import getenv
-from logging.handlers import RotatingFileHandler  # ← добавлено
+from pathlib import Path
 
-from aiogram import Bot, Dispatcher, F, BaseMiddleware  # ← добавлено BaseMiddleware
-from aiogram.types import Message, KeyboardButton, ReplyKeyboardMarkup
-from aiogram.filters import CommandStart, Command
+from aiogram import Bot, Dispatcher, BaseMiddleware, F  # ← добавлено BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, FSInputFile, Message, ReplyKeyboardMarkup
 from dotenv import load_dotenv
 
-from generation import CreateTaskFormulation
-from db_utils import init_db, log_user_action  # ← добавлено
+from generation import SCENARIO_GRAPH, CreateTaskFormulation
+from sessions import SessionStore, SESSION_TTL, SESSION_MAX
+from session_backend import SQLiteSessionBackend, SESSION_DB_PATH, SESSION_FLUSH_INTERVAL
+from routing import CompiledRouter, route_text
+import inline_wizard
+from formulate import formulate, parse_command, scenario_key, FormulateError
+import bulk
+import catch_up
+import chat_lanes
+import log_pipeline
+import leader_lease
+import metrics
+import send_scheduler
+import update_ledger
+import usage_stats
+import webhook_server
+from instructions import ParamError
+from instruction_table import InstructionTable
+from keyboards import (
+    reply_kb, warm_up as warm_up_keyboards,
+    MAIN_MENU, SECTIONS, VOCABULARY_MENU, GRAMMAR_MENU, READING_MENU, AFTER_DONE, AFTER_EXTRAS,
+)
+from db_utils import init_db, log_user_action, start_log_migration, start_log_writer, stop_log_writer  # ← добавлено
 
 load_dotenv()
 BOT_TOKEN = getenv("BOT_TOKEN")
+# кому отвечает /stats: ADMIN_IDS=123,456
+ADMIN_IDS = frozenset(int(uid) for uid in getenv("ADMIN_IDS", "").replace(",", " ").split())
 FEEDBACK_WAITING: set[int] = set()
+# псевдо-состояние для роутера: чат сейчас пишет отзыв
+FEEDBACK_STATE = "feedback"
+# псевдо-состояние: inline-мастер ждёт свободный ввод («Other», диапазоны)
+INLINE_TEXT_STATE = "inline_text"
 
-# --- базовая настройка логов (оставлено как у тебя) ---
-logging.basicConfig(level=logging.INFO)
-
-# --- + файл-лог с ротацией (добавлено) ---hjjlkhnjklhjklhjklh
+# --- логи: консоль + файл с ротацией; на event loop — только постановка в очередь ---
+# ротация и gzip архивов — в фоновых потоках (log_pipeline.py)
 LOG_FILE = "bot.log"
-_file_handler = RotatingFileHandler(LOG_FILE, maxBytes=2_000_000, backupCount=5, encoding="utf-8")
-_file_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
-logging.getLogger().addHandler(_file_handler)
+log_pipeline.setup(
+    LOG_FILE,
+    level=getenv("LOG_LEVEL", "INFO"),
+    # доля строк aiogram «Update id=... is handled» на INFO; остальные — DEBUG
+    update_sample=float(getenv("LOG_UPDATE_SAMPLE", log_pipeline.LOG_UPDATE_SAMPLE)),
+    slow_update_ms=float(getenv("LOG_SLOW_UPDATE_MS", log_pipeline.LOG_SLOW_UPDATE_MS)),
+    console=getenv("LOG_CONSOLE", "1") != "0",
+)
 logger = logging.getLogger("bot")
 
 # --- инициализация БД (добавлено) ---
@@ -34,29 +65,159 @@ if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN is not set. Add it to .env (BOT_TOKEN=1234:ABC...)")
 
 bot = Bot(BOT_TOKEN)
+# все отправки — через общие лимиты Telegram (бот и каждый чат), ответы мастера вперёд рассылок
+bot.session.middleware(send_scheduler.SendScheduler(
+    rate=float(getenv("SEND_RATE", send_scheduler.SEND_RATE)),
+    burst=float(getenv("SEND_BURST", send_scheduler.SEND_BURST)),
+    chat_rate=float(getenv("SEND_CHAT_RATE", send_scheduler.CHAT_RATE)),
+    chat_burst=float(getenv("SEND_CHAT_BURST", send_scheduler.CHAT_BURST)),
+    group_rate=float(getenv("SEND_GROUP_RATE", send_scheduler.GROUP_RATE)),
+))
+# каждый исходящий вызов Bot API (sendMessage, ...) — отдельная стадия в /metrics
+bot.session.middleware(metrics.RequestTimer())
 dp = Dispatcher()
+# все текстовые кнопки и шаги мастера — в одной таблице (state, text) → хендлер
+router = CompiledRouter()
+
+# --- журнал действий: в словарь actions — только известные тексты ---
+CALLBACK_PREFIX = "CALLBACK: "
+FEEDBACK_PREFIX = "FEEDBACK: "
+DONE_PREFIX = "DONE: "
+FREE_TEXT = ""  # действие для свободного ввода: сам текст — в detail
+# кнопки роутера и мастера; заполняется после router.compile()
+KNOWN_ACTIONS: frozenset[str] = frozenset()
+
+def split_action(text: str) -> tuple[str, str | None]:
+    """Полный текст действия → (действие для словаря, свободный текст или None)."""
+    if not text or text in KNOWN_ACTIONS or text.removeprefix(DONE_PREFIX) in SCENARIO_GRAPH.scenarios:
+        return text, None
+    if text.startswith(CALLBACK_PREFIX):
+        # в данных inline-мастера бывает свободный ввод и токены длинных путей
+        data, detail = inline_wizard.split_data(text[len(CALLBACK_PREFIX):])
+        return f"{CALLBACK_PREFIX}{data}", detail
+    if text.startswith(FEEDBACK_PREFIX):
+        return FEEDBACK_PREFIX, text[len(FEEDBACK_PREFIX):]
+    command, sep, args = text.partition(" ")
+    if sep and route_text(command) in KNOWN_ACTIONS:
+        # /formulate matching ... — команда в словарь, аргументы в detail
+        return f"{route_text(command)} ", args
+    return FREE_TEXT, text
 
 # --- Middleware для логирования действий в БД (добавлено) ---
 class DBLoggerMiddleware(BaseMiddleware):
     async def __call__(self, handler, event, data):
-        # логируем только входящие сообщения от пользователей
-        if isinstance(event, Message) and event.from_user:
+        # логируем только входящие сообщения и нажатия inline-кнопок от пользователей
+        if isinstance(event, (Message, CallbackQuery)) and event.from_user:
             uid = event.from_user.id
             uname = event.from_user.username or event.from_user.full_name
-            action_text = (event.text or "").strip()
+            if isinstance(event, Message):
+                action_text = (event.text or "").strip()
+            else:
+                action_text = f"{CALLBACK_PREFIX}{event.data}"
             try:
-                log_user_action(uid, uname, action_text)
+                with metrics.stage("db_log"):
+                    log_user_action(uid, uname, *split_action(action_text))
             except Exception as e:
                 logger.exception("DB log failed: %s", e)
         return await handler(event, data)
 
-# регистрация мидлвари (добавлено)
+# обработанные update_id: повтор после падения или рестарта отсекается раньше всего остального
+ledger = update_ledger.UpdateLedger(
+    getenv("UPDATE_DB", update_ledger.UPDATE_DB_PATH),
+    name=getenv("UPDATE_LEDGER_NAME", update_ledger.UPDATE_LEDGER_NAME),
+)
+dp.update.outer_middleware(update_ledger.DedupMiddleware(ledger))
+bot.session.middleware(update_ledger.ResumeOffset(ledger))
+# апдейты одного чата — по очереди, хендлеров в работе — не больше UPDATE_CONCURRENCY
+dp.update.outer_middleware(chat_lanes.ChatLanesMiddleware(
+    int(getenv("UPDATE_CONCURRENCY", chat_lanes.UPDATE_CONCURRENCY))))
+# регистрация мидлвари (добавлено); замер хендлера — первым из внутренних слоёв
+dp.message.middleware(metrics.MetricsMiddleware())
+dp.callback_query.middleware(metrics.MetricsMiddleware())
 dp.message.middleware(DBLoggerMiddleware())
-
-# единый формулятор
-formulator = CreateTaskFormulation()
-
-# --- быстрые клавиатуры ---
+dp.callback_query.middleware(DBLoggerMiddleware())
+
+# --- сводки для /stats: старты и завершения сценариев по текстам действий ---
+SCENARIO_STARTS = {scenario.button: scenario.key for scenario in SCENARIO_GRAPH.scenarios.values()}
+# inline-мастер: нажатие сценария в меню — callback с пустым путём
+SCENARIO_STARTS.update(
+    {f"{CALLBACK_PREFIX}{inline_wizard.encode(key, ())}": key for key in SCENARIO_GRAPH.scenarios})
+
+def classify_action(text: str):
+    if text.startswith(DONE_PREFIX):
+        return usage_stats.DONE, text[len(DONE_PREFIX):]
+    scenario = SCENARIO_STARTS.get(text)
+    if scenario is not None:
+        return usage_stats.START, scenario
+    if route_text(text) == "/formulate":
+        try:
+            return usage_stats.START, scenario_key(parse_command(text)[0])
+        except FormulateError:
+            return None
+    return None
+
+usage = usage_stats.UsageRollups(classify=classify_action)
+
+def log_completion(user, scenario: str | None) -> None:
+    """Мастер выдал инструкцию: строка DONE в журнал — для сводки завершений."""
+    if user is None or scenario is None:
+        return
+    with metrics.stage("db_log"):
+        log_user_action(user.id, user.username or user.full_name, f"{DONE_PREFIX}{scenario}")
+
+# единый формулятор; сессии ограничены по простою (TTL) и по количеству (LRU)
+# и переживают рестарт: грязные сессии пишутся в SQLite фоновым потоком
+formulator = CreateTaskFormulation(SessionStore(
+    ttl=float(getenv("SESSION_TTL", SESSION_TTL)),
+    max_size=int(getenv("SESSION_MAX", SESSION_MAX)),
+    backend=SQLiteSessionBackend(getenv("SESSION_DB", SESSION_DB_PATH)),
+), stage=metrics.stage)
+
+async def _flush_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_FLUSH_INTERVAL)
+        try:
+            formulator.sessions.flush_dirty()
+        except Exception:
+            logger.exception("Session flush failed")
+
+_background_tasks: list[asyncio.Task] = []
+_metrics_server = None
+
+# --- фоновые писатели: хендлеры только ставят данные в очередь ---
+@dp.startup()
+async def on_startup():
+    global _metrics_server
+    start_log_writer()
+    # старая таблица logs переезжает в схему v2 в фоне, пачками
+    start_log_migration(split=split_action)
+    formulator.sessions.open()
+    await asyncio.to_thread(ledger.load)
+    _background_tasks.append(asyncio.create_task(_flush_sessions_periodically()))
+    _background_tasks.append(asyncio.create_task(ledger.flush_periodically(
+        float(getenv("UPDATE_FLUSH_INTERVAL", update_ledger.UPDATE_FLUSH_INTERVAL)))))
+    _background_tasks.append(asyncio.create_task(usage.fold_periodically(
+        float(getenv("STATS_FOLD_INTERVAL", usage_stats.STATS_FOLD_INTERVAL)))))
+    _metrics_server = await metrics.start_server(
+        getenv("METRICS_HOST", metrics.METRICS_HOST), int(getenv("METRICS_PORT", metrics.METRICS_PORT)))
+
+@dp.shutdown()
+async def on_shutdown():
+    # апдейты последней пачки дообрабатываем, пока сессии и писатели открыты
+    await ledger.wait_idle(float(getenv("UPDATE_DRAIN_TIMEOUT", update_ledger.UPDATE_DRAIN_TIMEOUT)))
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    await metrics.stop_server(_metrics_server)
+    # дописываем хвосты очередей, не блокируя event loop
+    formulator.sessions.flush_dirty()
+    await asyncio.to_thread(formulator.sessions.close)
+    await ledger.flush()
+    await asyncio.to_thread(ledger.close)
+    await asyncio.to_thread(usage.close)
+    await asyncio.to_thread(stop_log_writer)
+
+# --- быстрые клавиатуры (готовые объекты из общего кэша keyboards.py) ---
 
 async def answer_with_keyboard(message, result: dict):
     """
@@ -70,83 +231,32 @@ async def answer_with_keyboard(message, result: dict):
 
     # Финальный шаг
     if result.get("action") == "done":
-        kb = ReplyKeyboardMarkup(
-            resize_keyboard=True,
-            keyboard=[
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ],
-        )
-        await message.answer(result["text"], reply_markup=kb)
+        log_completion(message.from_user, result.get("scenario"))
+        await message.answer(result["text"], reply_markup=reply_kb(AFTER_EXTRAS))
         return
 
     # Вопрос с вариантами
     if "options" in result and isinstance(result["options"], (list, tuple)):
-        rows = [[KeyboardButton(text=opt)] for opt in result["options"]]
-        kb = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=rows)
-        await message.answer(result["text"], reply_markup=kb)
+        await message.answer(result["text"], reply_markup=reply_kb(result["options"]))
         return
 
     # Простой текст
     await message.answer(result.get("text", ""))
 
 def main_menu_kb():
-    return ReplyKeyboardMarkup(
-        resize_keyboard=True,
-        keyboard=[
-            [KeyboardButton(text="Create task formulation")],
-            [KeyboardButton(text="Practice task formulation")],
-            [KeyboardButton(text="Feedback")],
-            [KeyboardButton(text="Help")]
-        ]
-    )
+    return reply_kb(MAIN_MENU)
 
 def sections_kb():
-    return ReplyKeyboardMarkup(
-        resize_keyboard=True,
-        keyboard=[
-            [KeyboardButton(text="Vocabulary")],
-            [KeyboardButton(text="Grammar")],
-            [KeyboardButton(text="Reading")],
-            [KeyboardButton(text="Back to main menu")],
-        ]
-    )
+    return reply_kb(SECTIONS)
 
 def vocabulary_menu_kb():
-    return ReplyKeyboardMarkup(
-        resize_keyboard=True,
-        keyboard=[
-            [KeyboardButton(text="Labelling")],
-            [KeyboardButton(text="Categorisation")],
-            [KeyboardButton(text="Word-building")],
-            [KeyboardButton(text="Matching")],
-            [KeyboardButton(text="Odd one out")],
-            [KeyboardButton(text="Synonyms/antonyms/definitions/lexical sets")],
-            [KeyboardButton(text="Back to sections")],
-        ]
-    )
+    return reply_kb(VOCABULARY_MENU)
 
 def grammar_menu_kb():
-    return ReplyKeyboardMarkup(
-        resize_keyboard=True,
-        keyboard=[
-            [KeyboardButton(text="Grammar Multiple Choice")],
-            [KeyboardButton(text="Sentence/dialogue completion")],
-            [KeyboardButton(text="Transformation")],
-            [KeyboardButton(text="Error Correction")],
-            [KeyboardButton(text="Back to sections")],
-        ]
-    )
+    return reply_kb(GRAMMAR_MENU)
 
 def reading_menu_kb():
-    return ReplyKeyboardMarkup(
-        resize_keyboard=True,
-        keyboard=[
-            [KeyboardButton(text="Reading Multiple Choice")],
-            [KeyboardButton(text="True/False")],
-            [KeyboardButton(text="Back to sections")],
-        ]
-    )
+    return reply_kb(READING_MENU)
 
 BOT_DESCRIPTION = (
     "Welcome to the Task Formulation Bot!\n\n"
@@ -192,256 +302,91 @@ async def send_result(message: Message, result: dict, after_done_kb: ReplyKeyboa
 
     # если закончили — показать кнопки возврата для текущего раздела
     if result.get("action") == "done":
+        log_completion(message.from_user, result.get("scenario"))
         section = formulator._s(message.chat.id).get("task_type")
-        if section == "grammar":
-            kb = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=[
-                [KeyboardButton(text="Back to Grammar")],
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ])
-        elif section == "reading":
-            kb = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=[
-                [KeyboardButton(text="Back to Reading")],
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ])
-        else:
-            kb = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=[
-                [KeyboardButton(text="Back to Vocabulary")],
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ])
+        kb = reply_kb(AFTER_DONE.get(section, AFTER_DONE["vocabulary"]))
         await message.answer(result["text"], reply_markup=kb)
         return
 
     # если нам прислали варианты — показать их
     if "options" in result:
-        kb = ReplyKeyboardMarkup(resize_keyboard=True,
-                                 keyboard=[[KeyboardButton(text=o)] for o in result["options"]])
-        await message.answer(result["text"], reply_markup=kb)
+        await message.answer(result["text"], reply_markup=reply_kb(result["options"]))
     else:
         await message.answer(result["text"], reply_markup=after_done_kb)
 
 # ---------- команды ----------
-@dp.message(CommandStart())
+@router.button("/start")
 async def cmd_start(message: Message):
     await message.answer(BOT_DESCRIPTION, reply_markup=main_menu_kb())
 
-@dp.message(Command("menu"))
+@router.button("/menu")
 async def cmd_menu(message: Message):
     # полный сброс
     formulator.reset_session(message.chat.id, None)
+    inline_wizard.cancel(message.chat.id)
     await message.answer("Main menu. Please select an option:", reply_markup=main_menu_kb())
 
 # ---------- навигация верхнего уровня ----------
 
 
-@dp.message(F.text == "Help")
+@router.button("Help")
 async def handle_help(message: Message):
     await message.answer(BOT_DESCRIPTION, reply_markup=main_menu_kb())
 
-@dp.message(F.text == "Back to main menu")
+@router.button("Back to main menu")
 async def handle_back_to_main(message: Message):
     formulator.reset_session(message.chat.id, None)
+    inline_wizard.cancel(message.chat.id)
     await message.answer("Main menu. Please select an option:", reply_markup=main_menu_kb())
 
-@dp.message(F.text == "Back to sections")
+@router.button("Back to sections")
 async def handle_back_to_sections(message: Message):
     await message.answer("Select a section:", reply_markup=sections_kb())
 
-@dp.message(F.text == "Create task formulation")
+@router.button("Create task formulation")
 async def handle_create_task_formulation(message: Message):
     await message.answer("Select a section:", reply_markup=sections_kb())
 
 # ---------- разделы ----------
-@dp.message(F.text == "Vocabulary")
+@router.button("Vocabulary")
 async def handle_vocabulary(message: Message):
     formulator.set_task_type(message.chat.id, "vocabulary")
     await message.answer("Vocabulary tasks:", reply_markup=vocabulary_menu_kb())
 
-@dp.message(F.text == "Grammar")
+@router.button("Grammar")
 async def handle_grammar(message: Message):
     formulator.set_task_type(message.chat.id, "grammar")
     await message.answer("Grammar tasks:", reply_markup=grammar_menu_kb())
 
-@dp.message(F.text == "Reading")
+@router.button("Reading")
 async def handle_reading(message: Message):
     formulator.set_task_type(message.chat.id, "reading")
     await message.answer("Reading tasks:", reply_markup=reading_menu_kb())
 
-# ---------- Vocabulary: старты ----------
-@dp.message(F.text == "Labelling")
-async def start_labelling(message: Message):
-    res = formulator.start_labelling(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Categorisation")
-async def start_categorising(message: Message):
-    res = formulator.start_categorising(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Word-building")
-async def start_word_building(message: Message):
-    res = formulator.start_word_building(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Matching")
-async def start_matching(message: Message):
-    res = formulator.start_matching(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Odd one out")
-async def start_odd_one_out(message: Message):
-    res = formulator.start_odd_one_out(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Synonyms/antonyms/definitions/lexical sets")
-async def start_synonyms(message: Message):
-    res = formulator.start_synonyms(message.chat.id)
-    await send_result(message, res)
-
-# ---------- Grammar: старты ----------
-@dp.message(F.text == "Grammar Multiple Choice")
-async def start_grammar_mc(message: Message):
-    res = formulator.start_grammar_mc(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Sentence/dialogue completion")
-async def start_grammar_completion(message: Message):
-    res = formulator.start_grammar_completion(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Transformation")
-async def start_grammar_transformation(message: Message):
-    res = formulator.start_grammar_transformation(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "Error Correction")
-async def start_grammar_error_correction(message: Message):
-    res = formulator.start_grammar_error_correction(message.chat.id)
-    await send_result(message, res)
-
-# ---------- Reading: старты ----------
-@dp.message(F.text == "Reading Multiple Choice")
-async def start_reading_mc(message: Message):
-    res = formulator.start_reading_multiple_choice(message.chat.id)
-    await send_result(message, res)
-
-@dp.message(F.text == "True/False")
-async def start_reading_tf(message: Message):
-    res = formulator.start_reading_true_false(message.chat.id)
-    await send_result(message, res)
+# ---------- старты сценариев: кнопки из scenarios/*.py ----------
+def _start_handler(scenario: str):
+    async def handle(message: Message):
+        await send_result(message, formulator.start(message.chat.id, scenario))
+    handle.__name__ = f"start_{scenario}"
+    return handle
+
+for _scenario in SCENARIO_GRAPH.scenarios.values():
+    router.button(_scenario.button)(_start_handler(_scenario.key))
 
 # ---------- кнопки "назад" в разделах ----------
-@dp.message(F.text == "Back to Vocabulary")
+@router.button("Back to Vocabulary")
 async def back_to_vocabulary(message: Message):
     await handle_vocabulary(message)
 
-@dp.message(F.text == "Back to Grammar")
+@router.button("Back to Grammar")
 async def back_to_grammar(message: Message):
     await handle_grammar(message)
 
-@dp.message(F.text == "Back to Reading")
+@router.button("Back to Reading")
 async def back_to_reading(message: Message):
     await handle_reading(message)
 
-# ---------- ЕДИНЫЙ роутер состояний ----------
-# Сопоставление state -> метода в generation.py
-STATE_TO_HANDLER = {
-    # Labelling
-    "labelling_label_type": formulator.labelling_label_type,
-    "labelling_label_type_other": formulator.labelling_label_type_other,
-    "labelling_task_format": formulator.labelling_task_format,
-    "labelling_word_list_option": formulator.labelling_word_list_option,
-
-    # Categorising
-    "categorising_task_type": formulator.categorising_task_type,
-    "categorising_table_type": formulator.categorising_table_type,
-    "categorising_table_type_other": formulator.categorising_table_type_other,
-
-    # Word-building
-    "word_building_task_type": formulator.word_building_task_type,
-    "word_building_missing_word_type": formulator.word_building_missing_word_type,
-    "word_building_missing_word_type_other": formulator.word_building_missing_word_type_other,
-    "word_building_missing_type": formulator.word_building_missing_type,
-    "word_building_words_from_letters_type": formulator.word_building_words_from_letters_type,
-    "word_building_words_from_letters_type_other": formulator.word_building_words_from_letters_type_other,
-    "word_building_forms_build_type": formulator.word_building_forms_build_type,
-    "word_building_forms_build_type_other": formulator.word_building_forms_build_type_other,
-    "word_building_forms_given_type": formulator.word_building_forms_given_type,
-    "word_building_forms_given_type_other": formulator.word_building_forms_given_type_other,
-
-    # Matching
-    "matching_type": formulator.matching_type,
-    "matching_sentences_range": formulator.matching_sentences_range,
-    "matching_pictures_range": formulator.matching_pictures_range,
-    "matching_desc_word_type": formulator.matching_desc_word_type,
-    "matching_desc_word_type_other": formulator.matching_desc_word_type_other,
-    "matching_questions_range": formulator.matching_questions_range,
-    "matching_answers_range": formulator.matching_answers_range,
-    "matching_other_first": formulator.matching_other_first,
-    "matching_other_second": formulator.matching_other_second,
-    "matching_other_second_other": formulator.matching_other_second_other,
-
-    # Odd one out
-    "odd_one_out_type": formulator.odd_one_out_type,
-    "odd_one_out_criterion": formulator.odd_one_out_criterion,
-    "odd_one_out_criterion_other": formulator.odd_one_out_criterion_other,
-    "odd_one_out_sound": formulator.odd_one_out_sound,
-
-    # Synonyms
-    "synonyms_task_type": formulator.synonyms_task_type,
-    "synonyms_pos1": formulator.synonyms_pos1,
-    "synonyms_pos1_other": formulator.synonyms_pos1_other,
-    "synonyms_pos2": formulator.synonyms_pos2,
-    "synonyms_pos2_other": formulator.synonyms_pos2_other,
-    "synonyms_adj_type": formulator.synonyms_adj_type,
-
-    # Grammar MC
-    "grammar_mc_type": formulator.grammar_mc_type,
-    "grammar_mc_subject": formulator.grammar_mc_subject,
-    "grammar_mc_subject_other": formulator.grammar_mc_subject_other,
-
-    # Grammar completion
-    "grammar_completion_text_type": formulator.grammar_completion_text_type,
-    "grammar_completion_text_type_other": formulator.grammar_completion_text_type_other,
-    "grammar_completion_task_type": formulator.grammar_completion_task_type,
-    "grammar_completion_verbs_given": formulator.grammar_completion_verbs_given,
-    "grammar_completion_where": formulator.grammar_completion_where,
-    "grammar_completion_tense": formulator.grammar_completion_tense,
-    "grammar_completion_tense_custom": formulator.grammar_completion_tense_custom,
-    "grammar_completion_tense1": formulator.grammar_completion_tense1,
-    "grammar_completion_tense1_custom": formulator.grammar_completion_tense1_custom,
-    "grammar_completion_tense2": formulator.grammar_completion_tense2,
-    "grammar_completion_tense2_custom": formulator.grammar_completion_tense2_custom,
-    "grammar_completion_phrases_given": formulator.grammar_completion_phrases_given,
-    "grammar_completion_other_word": formulator.grammar_completion_other_word,
-    "grammar_completion_other_given": formulator.grammar_completion_other_given,
-
-    # Grammar transformation
-    "grammar_transformation_type": formulator.grammar_transformation_type,
-    "grammar_transformation_tense1": formulator.grammar_transformation_tense1,
-    "grammar_transformation_tense1_other": formulator.grammar_transformation_tense1_other,
-    "grammar_transformation_tense2": formulator.grammar_transformation_tense2,
-    "grammar_transformation_tense2_other": formulator.grammar_transformation_tense2_other,
-
-    # Grammar error correction
-    "grammar_error_correction_type": formulator.grammar_error_correction_type,
-    "grammar_error_correction_type_other": formulator.grammar_error_correction_type_other,
-    "grammar_error_correction_need_correction": formulator.grammar_error_correction_need_correction,
-    "grammar_error_correction_prep_info": formulator.grammar_error_correction_prep_info,
-    "grammar_error_correction_prep_info_type": formulator.grammar_error_correction_prep_info_type,
-    "grammar_error_correction_prep_info_clarify": formulator.grammar_error_correction_prep_info_clarify,
-    "grammar_error_correction_prep_info_clarify_other": formulator.grammar_error_correction_prep_info_clarify_other,
-
-    # Reading MC + TF
-    "reading_multiple_choice_type": formulator.reading_multiple_choice_type,
-    "reading_multiple_choice_type_other": formulator.reading_multiple_choice_type_other,
-    "reading_true_false_read_first": formulator.reading_true_false_read_first,
-}
-
-
-@dp.message(F.text == "Feedback")
+@router.button("Feedback")
 async def h_feedback(message: Message):
     FEEDBACK_WAITING.add(message.chat.id)
     await message.answer(
@@ -449,13 +394,12 @@ async def h_feedback(message: Message):
         "Please type your feedback below. Send /cancel to stop."
     )
 
-@dp.message(Command("cancel"))
+@router.button("/cancel")
 async def h_cancel(message: Message):
     if message.chat.id in FEEDBACK_WAITING:
         FEEDBACK_WAITING.discard(message.chat.id)
         await message.answer("Feedback cancelled. Back to main menu.")
 
-@dp.message(lambda m: m.chat.id in FEEDBACK_WAITING)
 async def h_feedback_text(message: Message):
     text = (message.text or "").strip()
     if not text:
@@ -463,46 +407,144 @@ async def h_feedback_text(message: Message):
         return
 
     # логируем как обычное действие
-    log_user_action(
-        user_id=message.from_user.id,
-        username=message.from_user.username or message.from_user.full_name,
-        action=f"FEEDBACK: {text}",
-    )
+    with metrics.stage("db_log"):
+        log_user_action(
+            user_id=message.from_user.id,
+            username=message.from_user.username or message.from_user.full_name,
+            action=FEEDBACK_PREFIX,
+            detail=text,
+        )
 
     FEEDBACK_WAITING.discard(message.chat.id)
     await message.answer("Thank you! Your feedback has been recorded 🙌")
 
-@dp.message(F.text == "Practice task formulation")
+router.default(FEEDBACK_STATE, h_feedback_text)
+
+@router.button("Practice task formulation", except_states=(FEEDBACK_STATE,))
 async def h_practice(message: Message):
     await message.answer("Currently unavailable.")
 
 # --- EXTRA QUESTIONS (должны идти ДО fallback'ов) ---
 
 # 1) Do you want to give additional instructions? -> Yes/No
-@dp.message(F.text.in_({"+", "-"}))
+@router.on("additional_instructions", "+", "-")
 async def h_additional_instructions(message: Message):
-    if formulator.get_state(message.chat.id) != "additional_instructions":
-        return  # не наш шаг — пропускаем
     result = formulator.additional_instructions(message.chat.id, message.text)
     await answer_with_keyboard(message, result)
 
 # 2) How do you prefer students to work? -> Individually / In pairs / In groups
-@dp.message(F.text.in_({"Individually", "In pairs", "In groups"}))
+@router.on("extras_work_mode", "Individually", "In pairs", "In groups")
 async def h_extras_work_mode(message: Message):
-    if formulator.get_state(message.chat.id) != "extras_work_mode":
-        return
     result = formulator.extras_work_mode(message.chat.id, message.text)
     await answer_with_keyboard(message, result)
 
 # 3) How much time do your students have? -> 1 min / 2 mins / 3 mins
-@dp.message(F.text.in_({"1 min", "2 mins", "3 mins"}))
+@router.on("extras_time", "1 min", "2 mins", "3 mins")
 async def h_extras_time(message: Message):
-    if formulator.get_state(message.chat.id) != "extras_time":
-        return
     result = formulator.extras_time(message.chat.id, message.text)
     await answer_with_keyboard(message, result)
 
-@dp.message()  # универсальный обработчик "шага мастера"
+# --- ОДНОЙ КОМАНДОЙ: /formulate <сценарий> <ответы...> — без пошагового диалога ---
+
+@router.button("/formulate")
+async def cmd_formulate(message: Message):
+    try:
+        scenario, answers = parse_command(message.text)
+        text = formulate(scenario, answers)
+    except FormulateError as e:
+        await message.answer(str(e))
+        return
+    log_completion(message.from_user, scenario_key(scenario))
+    await message.answer(text)
+
+# --- ПАКЕТНО: файл с заданиями (CSV/JSON) → CSV с инструкциями ---
+
+@router.button("/bulk")
+async def cmd_bulk(message: Message):
+    await message.answer(bulk.BULK_USAGE)
+
+@dp.message(F.document)
+async def handle_document(message: Message):
+    doc = message.document
+    fmt = bulk.detect_format(doc.file_name)
+    if fmt is None:
+        await message.answer(bulk.BULK_USAGE)
+        return
+    if (doc.file_size or 0) > bulk.BULK_MAX_BYTES:
+        await message.answer("The file is too large (max 20 MB). Please split it into parts.")
+        return
+
+    # и вход, и результат живут на диске: память не зависит от числа строк
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = Path(tmp) / f"input.{fmt}", Path(tmp) / f"{Path(doc.file_name).stem}_instructions.csv"
+        await message.bot.download(doc, destination=src)
+        try:
+            stats = await asyncio.to_thread(bulk.convert, src, dst, fmt)
+        except ParamError as e:
+            await message.answer(str(e))
+            return
+        # большой файл — в очередь рассылок: не задерживает ответы мастера другим пользователям
+        with send_scheduler.bulk():
+            await message.answer_document(
+                FSInputFile(dst),
+                caption=f"Done: {stats.ok} instructions, {stats.failed} rows with errors.",
+            )
+
+# --- СТАТИСТИКА: только из сводок usage_stats, для ADMIN_IDS ---
+
+@router.button("/stats")
+async def cmd_stats(message: Message):
+    if message.from_user is None or message.from_user.id not in ADMIN_IDS:
+        # остальным — молча: команда скрытая, и шаг мастера она не трогает
+        return
+    report = await asyncio.to_thread(usage.report)
+    await message.answer(usage_stats.format_report(report))
+
+# --- INLINE-МАСТЕР: весь путь в callback_data, сообщение редактируется на месте ---
+
+@router.button("/inline")
+async def cmd_inline(message: Message):
+    screen = inline_wizard.menu_screen(inline_wizard.SECTIONS_MENU)
+    await message.answer(screen.text, reply_markup=screen.markup)
+
+async def show_inline_screen(query: CallbackQuery, screen: inline_wizard.Screen):
+    if screen.main_menu:
+        await query.message.edit_reply_markup(reply_markup=None)
+        await query.message.answer(screen.text, reply_markup=main_menu_kb())
+        return
+    try:
+        await query.message.edit_text(screen.text, reply_markup=screen.markup)
+    except TelegramBadRequest as e:
+        # повторное нажатие той же кнопки — сообщение уже в нужном виде
+        if "message is not modified" not in str(e):
+            raise
+
+@dp.callback_query()
+async def dispatch_callback(query: CallbackQuery):
+    if not isinstance(query.message, Message):
+        # сообщение слишком старое, редактировать его нельзя
+        await query.answer("This menu is outdated. Send /inline to start again.", show_alert=True)
+        return
+    try:
+        screen = inline_wizard.on_callback(query.message.chat.id, query.data or "")
+    except inline_wizard.StaleCallback:
+        await query.answer("This menu is outdated. Send /inline to start again.", show_alert=True)
+        return
+    log_completion(query.from_user, screen.done)
+    await show_inline_screen(query, screen)
+    await query.answer()
+
+async def h_inline_text(message: Message):
+    screen = inline_wizard.on_text(message.chat.id, message.text or "")
+    log_completion(message.from_user, screen.done)
+    if screen.main_menu:
+        await message.answer(screen.text, reply_markup=main_menu_kb())
+    else:
+        await message.answer(screen.text, reply_markup=screen.markup)
+
+router.default(INLINE_TEXT_STATE, h_inline_text)
+
+@router.fallback  # нет активного шага или неизвестное состояние
 async def handle_step(message: Message):
     state = formulator.get_state(message.chat.id)
     if not state:
@@ -511,77 +553,98 @@ async def handle_step(message: Message):
             "Choose an option from the menu 🙂",
             reply_markup=main_menu_kb()
         )
-    handler = STATE_TO_HANDLER.get(state)
-    if not handler:
-        return await message.answer("Something went wrong. Try /menu")
-    result = handler(message.chat.id, message.text)
-    await send_result(message, result)
+    await message.answer("Something went wrong. Try /menu")
 
-async def main():
-    await dp.start_polling(bot)
+# ---------- ЕДИНЫЙ роутер состояний ----------
+# каждый шаг любого сценария — одна и та же точка входа в интерпретатор
+async def h_scenario_step(message: Message):
+    await send_result(message, formulator.handle(message.chat.id, message.text))
+
+for _state in SCENARIO_GRAPH.steps:
+    router.default(_state, h_scenario_step)
+router.compile()
+KNOWN_ACTIONS = router.texts() | SCENARIO_GRAPH.labels()
+# все клавиатуры мастера строятся один раз, до первого апдейта
+warm_up_keyboards(CreateTaskFormulation)
+# и все инструкции кнопочных путей: последний шаг мастера — поиск в словаре
+CreateTaskFormulation.instruction_table = InstructionTable.build(CreateTaskFormulation)
+logger.info("Instruction table: %d button-only paths", len(CreateTaskFormulation.instruction_table))
+
+# ---------- единая точка входа для всех текстовых сообщений ----------
+@dp.message()
+async def dispatch_message(message: Message):
+    chat_id = message.chat.id
+    if chat_id in FEEDBACK_WAITING:
+        state = FEEDBACK_STATE
+    elif inline_wizard.is_waiting(chat_id):
+        state = INLINE_TEXT_STATE
+    else:
+        state = formulator.get_state(chat_id)
+    handler = router.resolve(state, message.text)
+    # шаги мастера делят один хендлер — в метриках различаем их по состоянию
+    metrics.set_route(state if handler is h_scenario_step else handler.__name__)
+    return await handler(message)
+
+# ---------- бэклог после простоя (catch_up.py) ----------
+# какие нажатия перекрываются следующими апдейтами того же чата
+CATCH_UP_RULES = catch_up.CatchUpRules(
+    view=frozenset({"/start", "Help", "Back to sections", "Create task formulation", "/bulk", "/inline"}),
+    starts=frozenset(scenario.button for scenario in SCENARIO_GRAPH.scenarios.values()),
+    resets=frozenset({"/menu", "Back to main menu"}),
+)
+CATCH_UP = getenv("CATCH_UP", "1") != "0"
 
-if __name__ == "__main__":
-    asyncio.run(main())
+@dp.startup()
+async def on_startup_catch_up(bot: Bot, catch_up_backlog: bool = False):
+    # только из polling (start_polling(..., catch_up_backlog=True)): у webhook
+    # getUpdates нет, воркеры worker_pool апдейты сами не получают.
+    # Опрос стартует после обработки бэклога и подтверждает его offset'ом учёта
+    if catch_up_backlog:
+        await catch_up.run(dp, bot, ledger, CATCH_UP_RULES,
+                           max_age=float(getenv("CATCH_UP_MAX_AGE", catch_up.CATCH_UP_MAX_AGE)))
 
+# задач апдейтов в polling: дальше start_polling ждёт, а не копит бэклог в памяти
+POLL_BACKLOG = int(getenv("POLL_BACKLOG", chat_lanes.POLL_BACKLOG))
 
-# === helpers ===
-def _make_kb(options: list[str] | None):
-    if not options:
-        return None
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=o)] for o in options],
-        resize_keyboard=True
-    )
+async def main():
+    # WEBHOOK_MODE=1 — апдейты приходят POST-ом на локальный aiohttp (webhook_server.py);
+    # иначе long polling; при LEASE=1 (по умолчанию) — только у держателя аренды
+    if getenv("WEBHOOK_MODE", "0") == "1":
+        await webhook_server.run_webhook(
+            dp, bot,
+            url=getenv("WEBHOOK_URL"),
+            secret_token=getenv("WEBHOOK_SECRET"),
+            host=getenv("WEBHOOK_HOST", webhook_server.WEBHOOK_HOST),
+            port=int(getenv("WEBHOOK_PORT", webhook_server.WEBHOOK_PORT)),
+            path=getenv("WEBHOOK_PATH", webhook_server.WEBHOOK_PATH),
+            concurrency=int(getenv("WEBHOOK_CONCURRENCY", webhook_server.WEBHOOK_CONCURRENCY)),
+        )
+    elif getenv("LEASE", "1") == "0":
+        await dp.start_polling(bot, tasks_concurrency_limit=POLL_BACKLOG, catch_up_backlog=CATCH_UP)
+    else:
+        await poll_as_leader()
 
-async def answer_with_keyboard(message: Message, result: dict):
+async def poll_as_leader():
     """
-    Универсальная отправка ответа:
-    - если в result есть 'options' — рисуем клавиатуру с кнопками
-    - если action == 'done' — показываем «Back to sections / Back to main menu»
+    Опрашивать Telegram, только держа аренду (leader_lease.py): второй
+    экземпляр с тем же токеном ждёт в горячем резерве — всё импортировано,
+    таблицы и клавиатуры собраны, backend сессий открыт — и забирает
+    опрос, как только лидер остановился или перестал продлевать аренду.
     """
-    if not result:
-        return
-
-    # Если сценарий завершён
-    if result.get("action") == "done":
-        kb = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ],
-            resize_keyboard=True
-        )
-        await message.answer(result["text"], reply_markup=kb)
-        return
+    lease = leader_lease.from_env()
+    # прогрев резерва: соединение и схема sessions.db; список сессий
+    # перечитается при захвате аренды (on_startup), когда лидер их уже сбросил
+    formulator.sessions.open()
+    while True:
+        await lease.wait()
+        async with lease.hold(on_lost=dp.stop_polling):
+            await dp.start_polling(bot, tasks_concurrency_limit=POLL_BACKLOG, catch_up_backlog=CATCH_UP)
+        if not lease.lost:
+            return
+        # аренду забрал другой экземпляр: on_shutdown уже сбросил сессии и
+        # очереди — снова ждём в резерве, а не завершаем процесс
+        logger.warning("Polling stopped: lease lost, back to standby")
 
-    # Иначе просто шаг с вариантами
-    kb = _make_kb(result.get("options"))
-    await message.answer(result["text"], reply_markup=kb)
-
-# === helpers for extra-step replies ===
-def _make_kb(options: list[str] | None):
-    if not options:
-        return None
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=o)] for o in options],
-        resize_keyboard=True
-    )
+if __name__ == "__main__":
+    asyncio.run(main())
 
-async def answer_with_keyboard(message: Message, result: dict):
-    """Универсальная отправка ответа с клавиатурой."""
-    if not result:
-        return
-    # финал сценария
-    if result.get("action") == "done":
-        kb = ReplyKeyboardMarkup(
-            keyboard=[
-                [KeyboardButton(text="Back to sections")],
-                [KeyboardButton(text="Back to main menu")],
-            ],
-            resize_keyboard=True,
-        )
-        await message.answer(result["text"], reply_markup=kb)
-        return
-    # промежуточный шаг
-    kb = _make_kb(result.get("options"))
-    await message.answer(result["text"], reply_markup=kb)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Гистограммы задержек по маршрутам в формате Prometheus.
+# Маршрут — хендлер, который обработал апдейт (cmd_menu, start_matching, ...),
+# для шагов мастера — имя состояния. Внутри апдейта отдельно меряются
+# стадии: запись в logs.db, generate_instruction и каждый вызов Bot API.
+# Всё пишется из event loop, поэтому без блокировок.
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108  # 0 — эндпоинт не поднимаем
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# секунды; верхняя граница +Inf добавляется при выводе
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class HistogramFamily:
+    """Одна метрика с набором меток: значения меток → Histogram."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.children: dict[tuple[str, ...], Histogram] = {}
+
+    def observe(self, values: tuple[str, ...], seconds: float) -> None:
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = Histogram()
+        child.observe(seconds)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, child in sorted(self.children.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values))
+            cumulative = 0
+            for bound, n in zip((*BUCKETS, "+Inf"), child.counts):
+                cumulative += n
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {child.sum:.6f}"
+            yield f"{self.name}_count{{{labels}}} {child.count}"
+
+
+class ValueFamily:
+    """Gauge или counter с метками: значения меток → число."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.kind = kind
+        self.children: dict[tuple[str, ...], float] = {}
+
+    def set(self, values: tuple[str, ...], value: float) -> None:
+        self.children[values] = value
+
+    def inc(self, values: tuple[str, ...], amount: float = 1) -> None:
+        self.children[values] = self.children.get(values, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, value in sorted(self.children.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values))
+            yield f"{self.name}{{{labels}}} {value:g}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+UPDATE_SECONDS = HistogramFamily(
+    "bot_update_seconds", "Time to handle one update, by route.", ("route",))
+STAGE_SECONDS = HistogramFamily(
+    "bot_stage_seconds", "Time spent in a stage of update handling, by route.", ("route", "stage"))
+# исходящие вызовы через send_scheduler: ожидание токена, очередь, 429 от Telegram
+SEND_WAIT_SECONDS = HistogramFamily(
+    "bot_send_wait_seconds", "Time an outgoing Bot API call waited for rate limit tokens, by priority.",
+    ("priority",))
+SEND_QUEUE_DEPTH = ValueFamily(
+    "bot_send_queue_depth", "Outgoing Bot API calls waiting for rate limit tokens, by priority.", ("priority",))
+SEND_RETRY_AFTER = ValueFamily(
+    "bot_send_retry_after_total", "Outgoing Bot API calls rejected with retry_after (429).", ("method",),
+    kind="counter")
+FAMILIES = (UPDATE_SECONDS, STAGE_SECONDS, SEND_WAIT_SECONDS, SEND_QUEUE_DEPTH, SEND_RETRY_AFTER)
+
+
+def render() -> str:
+    return "\n".join(line for family in FAMILIES for line in family.render()) + "\n"
+
+
+# ---------- замер одного апдейта ----------
+class Span:
+    """Текущий апдейт: маршрут и накопленные стадии; в гистограммы — по завершении."""
+    __slots__ = ("route", "stages")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.stages: list[tuple[str, float]] = []
+
+
+_span: ContextVar[Optional[Span]] = ContextVar("metrics_span", default=None)
+
+
+def set_route(route: str) -> None:
+    """Уточнить маршрут изнутри хендлера (единая точка входа знает больше, чем aiogram)."""
+    span = _span.get()
+    if span is not None:
+        span.route = route
+
+
+@contextmanager
+def stage(name: str):
+    """Замер стадии внутри апдейта; вне апдейта (CLI, bulk) ничего не пишет."""
+    span = _span.get()
+    if span is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span.stages.append((name, time.perf_counter() - start))
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внутренняя мидлварь message/callback_query: открывает Span, по выходу
+    пишет общее время и стадии в гистограммы. Видит только апдейты, для
+    которых aiogram уже нашёл хендлер (маршрут — из data["handler"]):
+    время внешних мидлварей (учёт апдейтов, очереди чатов) и апдейты без
+    хендлера в замер не входят. Регистрируется первой из внутренних, чтобы
+    время остальных (журнал в БД) попало в замер.
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        span = Span(getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown")
+        token = _span.set(span)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - start
+            _span.reset(token)
+            UPDATE_SECONDS.observe((span.route,), elapsed)
+            for name, seconds in span.stages:
+                STAGE_SECONDS.observe((span.route, name), seconds)
+
+
+class RequestTimer(BaseRequestMiddleware):
+    """Мидлварь сессии Bot: каждый исходящий вызов — стадия с именем метода (sendMessage, ...)."""
+
+    async def __call__(self, make_request, bot, method) -> Any:
+        with stage(method.__api_method__):
+            return await make_request(bot, method)
+
+
+# ---------- локальный HTTP-эндпоинт ----------
+async def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """GET /metrics на host:port; возвращает runner для stop_server. port=0 — не поднимаем."""
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics on http://%s:%d/metrics", host, port)
+    return runner
+
+
+async def stop_server(runner) -> None:
+    if runner is not None:
+        await runner.cleanup()
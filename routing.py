@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Mapping, Optional
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+def route_text(text: Optional[str]) -> Optional[str]:
+    """Ключ текста для таблицы: команды без аргументов и @упоминания бота."""
+    if text and text[0] == "/":
+        return text.split(maxsplit=1)[0].split("@", 1)[0]
+    return text
+
+
+class CompiledRouter:
+    """
+    Таблица (состояние, текст) → хендлер, собираемая один раз на старте.
+
+    Вместо цепочки фильтров F.text == ... (aiogram проверяет их по очереди
+    на каждый апдейт) все кнопки раскладываются в один словарь, и горячий
+    путь — это один dict.get по паре (state, text) плюс, для свободного
+    ввода, второй — по state.
+
+    Приоритет совпадает с прежним порядком регистрации хендлеров:
+    глобальные кнопки → кнопки конкретного состояния → обработчик состояния
+    по умолчанию → fallback.
+    """
+
+    def __init__(self):
+        self._global: dict[str, Handler] = {}
+        self._global_except: dict[str, tuple[Handler, frozenset]] = {}
+        self._by_state: dict[tuple[Hashable, str], Handler] = {}
+        self._defaults: dict[Hashable, Handler] = {}
+        self._fallback: Optional[Handler] = None
+        self._table: Mapping[tuple[Hashable, Optional[str]], Handler] = MappingProxyType({})
+        self._state_defaults: Mapping[Hashable, Handler] = MappingProxyType({})
+        self._states: frozenset = frozenset()
+        self._globals: Mapping[str, tuple[Handler, frozenset]] = MappingProxyType({})
+
+    # ---------- регистрация ----------
+    def button(self, *texts: str, except_states: Iterable[Hashable] = ()):
+        """Глобальная кнопка/команда: срабатывает в любом состоянии, кроме except_states."""
+        skip = frozenset(except_states)
+
+        def decorator(handler: Handler) -> Handler:
+            for text in texts:
+                if skip:
+                    self._global_except[text] = (handler, skip)
+                else:
+                    self._global[text] = handler
+            return handler
+        return decorator
+
+    def on(self, state: Hashable, *texts: str):
+        """Кнопка, которая действует только в указанном состоянии."""
+        def decorator(handler: Handler) -> Handler:
+            for text in texts:
+                self._by_state[(state, text)] = handler
+            return handler
+        return decorator
+
+    def default(self, state: Hashable, handler: Handler) -> None:
+        """Обработчик любого текста в состоянии state (если не сработала кнопка)."""
+        self._defaults[state] = handler
+
+    def fallback(self, handler: Handler) -> Handler:
+        """Последний обработчик: нет состояния / неизвестное состояние."""
+        self._fallback = handler
+        return handler
+
+    # ---------- сборка ----------
+    def compile(self, states: Iterable[Hashable] = ()) -> None:
+        """
+        Раскладывает глобальные кнопки по всем известным состояниям и
+        замораживает таблицы. Вызывать после регистрации всех хендлеров.
+        """
+        all_states = {None, *states, *self._defaults, *(s for s, _ in self._by_state)}
+        table: dict[tuple[Hashable, Optional[str]], Handler] = {}
+        for state in all_states:
+            # порядок важен: более приоритетные записи пишутся последними
+            for text, (handler, skip) in self._global_except.items():
+                if state not in skip:
+                    table[(state, text)] = handler
+        table.update(self._by_state)
+        for state in all_states:
+            for text, handler in self._global.items():
+                table[(state, text)] = handler
+        self._table = MappingProxyType(table)
+        self._state_defaults = MappingProxyType(dict(self._defaults))
+        # для состояний, которых не было при compile (сессия со старым или
+        # удалённым состоянием), — глобальные кнопки без раскладки по состояниям
+        self._states = frozenset(all_states)
+        self._globals = MappingProxyType({
+            **self._global_except, **{text: (handler, frozenset()) for text, handler in self._global.items()}})
+
+    def resolve(self, state: Hashable, text: Optional[str]) -> Handler:
+        key = route_text(text)
+        handler = self._table.get((state, key))
+        if handler is None and state not in self._states:
+            handler, skip = self._globals.get(key, (None, ()))
+            if state in skip:
+                handler = None
+        if handler is None:
+            handler = self._state_defaults.get(state, self._fallback)
+        return handler
+
+    def texts(self) -> frozenset[str]:
+        """Все тексты кнопок и команд из собранной таблицы."""
+        return frozenset(text for _, text in self._table if text is not None)
+
+    def __len__(self) -> int:
+        return len(self._table)
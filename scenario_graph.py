@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, NamedTuple, Optional, Union
+
+# Шаги мастера описываются данными в scenarios/*.py (переменная SCENARIO),
+# а ScenarioGraph один раз, при импорте, раскладывает их в замороженные
+# таблицы переходов. Шаг в рантайме — поиск ответа в словаре, без сборки
+# карт «кнопка → enum» и списков вариантов на каждый вызов.
+
+FINISH = "<finish>"  # сценарий собран: generate_instruction → доп. инструкции
+DEFAULT_INVALID = "Please select one of the options."
+
+# Действие над объектом сценария:
+#   ("set_x", A, B) → obj.set_x(A, B[, ответ])  — ответ добавляется для Text
+#   callable        → f(obj) для Option, f(obj, ответ) для Text
+Effect = Union[None, tuple, Callable[..., Any]]
+
+
+@dataclass(frozen=True)
+class Option:
+    label: str
+    set: Effect = None
+    next: Optional[str] = None   # следующий шаг или FINISH
+    back: Optional[str] = None   # action «назад в раздел» (back_to_vocabulary, ...)
+
+
+@dataclass(frozen=True)
+class Reprompt:
+    """Ответ на текст мимо кнопок; состояние при этом не меняется."""
+    text: str = DEFAULT_INVALID
+    options: bool = False        # повторить кнопки шага
+
+
+@dataclass(frozen=True)
+class Choice:
+    state: str
+    question: str                # может содержать {answer} / {answer_lower} — предыдущий ответ
+    options: tuple[Option, ...] = ()
+    invalid: Reprompt = Reprompt()
+    # набор кнопок зависит от уже выбранного: variant(obj) → ключ в variants
+    variant: Optional[Callable[[Any], Any]] = None
+    variants: Mapping[Any, tuple[Option, ...]] = field(default_factory=dict)
+    # имя параметра для build_instruction (bulk, cli); None — состояние без префикса сценария
+    param: Optional[str] = None
+    default: Optional[str] = None  # кнопка, если параметра нет
+
+
+@dataclass(frozen=True)
+class Text:
+    state: str
+    question: str
+    set: Effect
+    next: str
+    strip: bool = True
+    empty: Optional[str] = None  # повторный вопрос на пустой ввод; None — пустое не проверяется
+    param: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Scenario:
+    key: str                     # ключ сессии: labelling, matching, ...
+    button: str                  # кнопка в меню раздела
+    section: str                 # vocabulary / grammar / reading
+    factory: Callable[[], Any]
+    start: str
+    steps: tuple[Union[Choice, Text], ...]
+
+
+# ---------- скомпилированный вид ----------
+class Transition(NamedTuple):
+    apply: Optional[Callable[..., Any]]
+    next: Optional[str]
+    back: Optional[str]
+
+
+class Outcome(NamedTuple):
+    kind: str                    # "ask" | "finish" | "back" | "invalid"
+    state: Optional[str] = None  # для ask — следующий шаг
+    answer: Any = None           # для ask — ответ для шаблона вопроса
+    result: Optional[dict] = None  # для invalid — готовый ответ; для back — action
+
+
+def _param(scenario: str, step: Union[Choice, Text]) -> str:
+    return step.param or step.state.removeprefix(f"{scenario}_")
+
+
+def _compile_effect(effect: Effect, with_value: bool) -> Optional[Callable[..., Any]]:
+    if effect is None or callable(effect):
+        return effect
+    name, *args = effect
+    if with_value:
+        return lambda obj, value: getattr(obj, name)(*args, value)
+    return lambda obj: getattr(obj, name)(*args)
+
+
+class CompiledChoice:
+    __slots__ = ("scenario", "state", "param", "default", "question", "templated", "labels", "table", "variant",
+                 "invalid")
+
+    def __init__(self, scenario: str, step: Choice):
+        self.scenario = scenario
+        self.state = step.state
+        self.param = _param(scenario, step)
+        self.default = step.default
+        self.question = step.question
+        self.templated = "{" in step.question
+        self.variant = step.variant
+        if step.variant is None:
+            self.labels, self.table = self._table(step.options)
+        else:
+            # для вариантов: ключ → (кнопки, переходы)
+            self.labels = None
+            self.table = MappingProxyType({k: self._table(opts) for k, opts in step.variants.items()})
+        self.invalid = step.invalid
+
+    @staticmethod
+    def _table(options: Iterable[Option]):
+        options = tuple(options)
+        return tuple(o.label for o in options), MappingProxyType({
+            o.label: Transition(_compile_effect(o.set, False), o.next, o.back) for o in options
+        })
+
+    def _resolve(self, obj):
+        if self.variant is None:
+            return self.labels, self.table
+        return self.table.get(self.variant(obj), ((), MappingProxyType({})))
+
+    def options(self, obj) -> tuple[str, ...]:
+        return self._resolve(obj)[0]
+
+    def answers(self, obj) -> tuple[str, ...]:
+        """Кнопки, которые двигают сценарий вперёд (без «назад в раздел»)."""
+        labels, table = self._resolve(obj)
+        return tuple(label for label in labels if table[label].back is None)
+
+    def transition(self, obj, label: str) -> Transition:
+        return self._resolve(obj)[1][label]
+
+    def advance(self, obj, text: str) -> Outcome:
+        labels, table = self._resolve(obj)
+        tr = table.get(text)
+        if tr is None:
+            result = {"text": self.invalid.text}
+            if self.invalid.options:
+                result["options"] = list(labels)
+            return Outcome("invalid", result=result)
+        if tr.apply is not None:
+            tr.apply(obj)
+        if tr.back is not None:
+            return Outcome("back", result={"action": tr.back})
+        if tr.next == FINISH:
+            return Outcome("finish")
+        return Outcome("ask", tr.next, text)
+
+
+class CompiledText:
+    __slots__ = ("scenario", "state", "param", "question", "templated", "apply", "next", "strip", "empty")
+
+    def __init__(self, scenario: str, step: Text):
+        self.scenario = scenario
+        self.state = step.state
+        self.param = _param(scenario, step)
+        self.question = step.question
+        self.templated = "{" in step.question
+        self.apply = _compile_effect(step.set, True)
+        self.next = step.next
+        self.strip = step.strip
+        self.empty = step.empty
+
+    def options(self, obj) -> tuple[str, ...]:
+        return ()
+
+    def advance(self, obj, text: str) -> Outcome:
+        value = (text or "").strip() if self.strip else text
+        if self.empty is not None and not value:
+            return Outcome("invalid", result={"text": self.empty})
+        self.apply(obj, value)
+        if self.next == FINISH:
+            return Outcome("finish")
+        return Outcome("ask", self.next, value)
+
+
+class ScenarioGraph:
+    """Все сценарии мастера, скомпилированные в таблицы «состояние → шаг»."""
+
+    def __init__(self, scenarios: Iterable[Scenario]):
+        by_key: dict[str, Scenario] = {}
+        steps: dict[str, Union[CompiledChoice, CompiledText]] = {}
+        for scenario in scenarios:
+            if scenario.key in by_key:
+                raise ValueError(f"duplicate scenario {scenario.key!r}")
+            by_key[scenario.key] = scenario
+            for step in scenario.steps:
+                if step.state in steps:
+                    raise ValueError(f"duplicate step {step.state!r} in {scenario.key!r}")
+                compiled = CompiledText if isinstance(step, Text) else CompiledChoice
+                steps[step.state] = compiled(scenario.key, step)
+        self.scenarios = MappingProxyType(by_key)
+        self.steps = MappingProxyType(steps)
+        self._check()
+
+    def _check(self) -> None:
+        # битая ссылка на шаг должна падать при старте, а не у пользователя
+        for scenario in self.scenarios.values():
+            if scenario.start not in self.steps:
+                raise ValueError(f"{scenario.key!r}: unknown start step {scenario.start!r}")
+        for step in self.steps.values():
+            targets = [step.next] if isinstance(step, CompiledText) else [
+                tr.next
+                for _, table in ([(step.labels, step.table)] if step.variant is None else step.table.values())
+                for tr in table.values()
+            ]
+            for target in targets:
+                if target is not None and target != FINISH and target not in self.steps:
+                    raise ValueError(f"{step.state!r}: unknown next step {target!r}")
+
+    def labels(self) -> frozenset[str]:
+        """Тексты всех кнопок всех шагов, включая варианты."""
+        return frozenset(
+            label
+            for step in self.steps.values() if isinstance(step, CompiledChoice)
+            for labels, _ in ([(step.labels, step.table)] if step.variant is None else step.table.values())
+            for label in labels
+        )
+
+    def prompt(self, state: str, obj, answer: Any = None) -> tuple[str, tuple[str, ...]]:
+        """Текст вопроса и кнопки шага state."""
+        step = self.steps[state]
+        text = step.question
+        if step.templated:
+            text = text.format(answer=answer, answer_lower=str(answer).lower())
+        return text, step.options(obj)
@@ -0,0 +1,34 @@
+from scenario_graph import ScenarioGraph
+
+from . import (
+    grammar_completion,
+    grammar_error_correction,
+    grammar_multiple_choice,
+    grammar_transformation,
+    reading_multiple_choice,
+    reading_true_false,
+    vocabulary_categorising,
+    vocabulary_labelling,
+    vocabulary_matching,
+    vocabulary_odd_one_out,
+    vocabulary_synonyms,
+    vocabulary_word_building,
+)
+
+# Все сценарии мастера. Порядок важен: по нему нумеруются сценарии
+# в callback_data inline-мастера (inline_wizard.SCENARIOS).
+# Новый сценарий — файл в scenarios/ с SCENARIO и строчка здесь.
+SCENARIO_GRAPH = ScenarioGraph((
+    vocabulary_labelling.SCENARIO,
+    vocabulary_categorising.SCENARIO,
+    vocabulary_word_building.SCENARIO,
+    vocabulary_matching.SCENARIO,
+    vocabulary_odd_one_out.SCENARIO,
+    vocabulary_synonyms.SCENARIO,
+    grammar_multiple_choice.SCENARIO,
+    grammar_completion.SCENARIO,
+    grammar_transformation.SCENARIO,
+    grammar_error_correction.SCENARIO,
+    reading_multiple_choice.SCENARIO,
+    reading_true_false.SCENARIO,
+))
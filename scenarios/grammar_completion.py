@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class GrammarCompletionTextType(Enum):
     TEXT = "text"
@@ -86,4 +88,89 @@ class GrammarCompletion:
             return f"{base} with the phrases" + (f" {self.where.value}." if self.phrases_given else ".")
         elif self.task_type == GrammarCompletionTaskType.OTHER:
             return f"{base} with the {self.other_word}" + (f" {self.where.value}." if self.other_given else ".")
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- шаги мастера ----------
+TENSES = (
+    "Present Simple", "Present Continuous", "Past Simple", "Past Continuous",
+    "Present Perfect", "Past Perfect", "Future Simple",
+)
+
+
+def _tenses(set_tense, next: str, other: str) -> tuple:
+    return tuple(
+        Option(tense, lambda s, t=tense: set_tense(s, t), next) for tense in TENSES
+    ) + (Option("Other", next=other),)
+
+
+def _where_or_finish(setter: str) -> tuple:
+    return (
+        Option("Yes", (setter, True), "grammar_completion_where"),
+        Option("No", (setter, False), FINISH),
+    )
+
+
+_YES_NO = Reprompt("Please select Yes or No.")
+
+SCENARIO = Scenario(
+    key="grammar_completion",
+    button="Sentence/dialogue completion",
+    section="grammar",
+    factory=GrammarCompletion,
+    start="grammar_completion_text_type",
+    steps=(
+        Choice("grammar_completion_text_type", "What should be completed?", (
+            Option("Text", ("set_text_type", GrammarCompletionTextType.TEXT), "grammar_completion_task_type"),
+            Option("Sentences", ("set_text_type", GrammarCompletionTextType.SENTENCES),
+                   "grammar_completion_task_type"),
+            Option("Conversation", ("set_text_type", GrammarCompletionTextType.CONVERSATION),
+                   "grammar_completion_task_type"),
+            Option("Other", next="grammar_completion_text_type_other"),
+            Option("Back to grammar", back="back_to_grammar"),
+        )),
+        Text("grammar_completion_text_type_other", "Please enter your own type:",
+             ("set_text_type", GrammarCompletionTextType.OTHER), "grammar_completion_task_type", strip=False),
+        Choice("grammar_completion_task_type", "What type of completing the {answer_lower} task do you want to create?", (
+            Option("Correct form of the verbs", ("set_task_type", GrammarCompletionTaskType.CORRECT_FORM),
+                   "grammar_completion_verbs_given"),
+            Option("Certain form of the verb", ("set_task_type", GrammarCompletionTaskType.CERTAIN_FORM),
+                   "grammar_completion_tense"),
+            Option("Choose one of two forms of the verb", ("set_task_type", GrammarCompletionTaskType.CHOOSE_TWO),
+                   "grammar_completion_tense1"),
+            Option("Phrases", ("set_task_type", GrammarCompletionTaskType.PHRASES),
+                   "grammar_completion_phrases_given"),
+            Option("Other", ("set_task_type", GrammarCompletionTaskType.OTHER), "grammar_completion_other_word"),
+        )),
+        Choice("grammar_completion_verbs_given", "Are verbs given?", _where_or_finish("set_verbs_given"),
+               invalid=_YES_NO, param="given"),
+        Choice("grammar_completion_where", "Where?", tuple(
+            Option(w.value, ("set_where", w), FINISH) for w in GrammarCompletionWhere
+        )),
+        # Certain form: одно время
+        Choice("grammar_completion_tense", "What tense?",
+               _tenses(GrammarCompletion.set_tense, FINISH, "grammar_completion_tense_custom"),
+               invalid=Reprompt(options=True)),
+        Text("grammar_completion_tense_custom", "Please enter the tense:", ("set_tense",), FINISH, strip=False,
+             param="tense_other"),
+        # Choose one of two: два времени
+        Choice("grammar_completion_tense1", "First tense?",
+               _tenses(lambda s, t: s.set_tenses(t, None), "grammar_completion_tense2",
+                       "grammar_completion_tense1_custom"),
+               invalid=Reprompt(options=True)),
+        Text("grammar_completion_tense1_custom", "Please enter the first tense:",
+             lambda s, t: s.set_tenses(t, None), "grammar_completion_tense2", strip=False, param="tense1_other"),
+        Choice("grammar_completion_tense2", "Second tense?",
+               _tenses(lambda s, t: s.set_tenses(s.tense1, t), FINISH, "grammar_completion_tense2_custom"),
+               invalid=Reprompt(options=True)),
+        Text("grammar_completion_tense2_custom", "Please enter the second tense:",
+             lambda s, t: s.set_tenses(s.tense1, t), FINISH, strip=False, param="tense2_other"),
+        # Phrases / Other
+        Choice("grammar_completion_phrases_given", "Are phrases given?", _where_or_finish("set_phrases_given"),
+               invalid=_YES_NO, param="given"),
+        Text("grammar_completion_other_word", "What should be completed with?", ("set_other_word",),
+             "grammar_completion_other_given", empty="Please enter a non-empty value."),
+        Choice("grammar_completion_other_given", "{answer} are given?", _where_or_finish("set_other_given"),
+               invalid=_YES_NO, param="given"),
+    ),
+)
@@ -1,5 +1,7 @@
 from enum import Enum
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class GivenType(Enum):
     PHRASES = "Phrases"
@@ -60,4 +62,54 @@ class GrammarErrorCorrection:
         if not self.need_correction:
             return f"{action} {info}. Are the {type_str} right (✓) or wrong (✗)?"
         else:
-            return f"{action} {info}. Are the {type_str} right (✓) or wrong (✗)? Correct the wrong {type_str}."
\ No newline at end of file
+            return f"{action} {info}. Are the {type_str} right (✓) or wrong (✗)? Correct the wrong {type_str}."
+
+
+# ---------- шаги мастера ----------
+def _clarify(*labels: str) -> tuple:
+    return tuple(
+        Option(label, ("set_prep_info_clarify", label), FINISH) for label in labels
+    ) + (Option("Other", next="grammar_error_correction_prep_info_clarify_other"),)
+
+
+_YES_NO = Reprompt("Please select Yes or No.")
+
+SCENARIO = Scenario(
+    key="grammar_error_correction",
+    button="Error Correction",
+    section="grammar",
+    factory=GrammarErrorCorrection,
+    start="grammar_error_correction_type",
+    steps=(
+        Choice("grammar_error_correction_type", "What is given? (in plural)", (
+            Option("Phrases", ("set_given_type", GivenType.PHRASES), "grammar_error_correction_need_correction"),
+            Option("Questions", ("set_given_type", GivenType.QUESTIONS), "grammar_error_correction_need_correction"),
+            Option("Other", next="grammar_error_correction_type_other"),
+            Option("Back to Grammar", back="back_to_grammar"),
+        ), param="given_type"),
+        Text("grammar_error_correction_type_other", "Please enter your own type (in plural):",
+             ("set_given_type", GivenType.OTHER), "grammar_error_correction_need_correction",
+             empty="Please enter a non-empty type (in plural).", param="given_type_other"),
+        Choice("grammar_error_correction_need_correction", "Is it necessary to correct {answer_lower}?", (
+            Option("Yes", ("set_need_correction", True), "grammar_error_correction_prep_info"),
+            Option("No", ("set_need_correction", False), "grammar_error_correction_prep_info"),
+        ), invalid=_YES_NO),
+        Choice("grammar_error_correction_prep_info", "Any preparatory information given?", (
+            Option("Yes", next="grammar_error_correction_prep_info_type"),
+            Option("No", ("set_prep_info", PrepInfo.NONE), FINISH),
+        ), invalid=_YES_NO, default="No"),
+        Choice("grammar_error_correction_prep_info_type", "Type of preparatory information:", tuple(
+            Option(p.value, ("set_prep_info", p), "grammar_error_correction_prep_info_clarify")
+            for p in (PrepInfo.TEXT, PrepInfo.AUDIO, PrepInfo.PICTURE)
+        )),
+        # варианты уточнения зависят от выбранного типа
+        Choice("grammar_error_correction_prep_info_clarify", "Clarify the preparatory information:",
+               variant=lambda s: s.prep_info, variants={
+                   PrepInfo.TEXT: _clarify("Text", "Story"),
+                   PrepInfo.AUDIO: _clarify("Dialogue"),
+                   PrepInfo.PICTURE: _clarify("Picture", "Photo"),
+               }),
+        Text("grammar_error_correction_prep_info_clarify_other", "Please enter your own type:",
+             ("set_prep_info_clarify",), FINISH, empty="Please enter a non-empty value."),
+    ),
+)
@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class GrammarMultipleChoiceType(Enum):
     CIRCLE_CORRECT = "Circle the correct one"
@@ -36,4 +38,30 @@ class GrammarMultipleChoice:
             if self.subject == GrammarMultipleChoiceSubject.OTHER
             else self.subject.value
         )
-        return f"Circle the correct {subj}."
\ No newline at end of file
+        return f"Circle the correct {subj}."
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="grammar_mc",
+    button="Grammar Multiple Choice",
+    section="grammar",
+    factory=GrammarMultipleChoice,
+    start="grammar_mc_type",
+    steps=(
+        Choice("grammar_mc_type", "Choose the type of task:", (
+            Option("Circle the correct one", ("set_task_type", GrammarMultipleChoiceType.CIRCLE_CORRECT),
+                   "grammar_mc_subject"),
+            Option("Other", ("set_task_type", GrammarMultipleChoiceType.OTHER), "grammar_mc_subject"),
+        ), invalid=Reprompt("Invalid task type. Please choose from the options.", options=True),
+           param="task_type", default="Circle the correct one"),
+        Choice("grammar_mc_subject", "Choose the subject:", (
+            Option("Word", ("set_subject", GrammarMultipleChoiceSubject.WORD), FINISH),
+            Option("Verb", ("set_subject", GrammarMultipleChoiceSubject.VERB), FINISH),
+            Option("Answer", ("set_subject", GrammarMultipleChoiceSubject.ANSWER), FINISH),
+            Option("Other", next="grammar_mc_subject_other"),
+        ), invalid=Reprompt("Invalid subject. Please choose from the options.", options=True)),
+        Text("grammar_mc_subject_other", "Please specify the subject:",
+             ("set_subject", GrammarMultipleChoiceSubject.OTHER), FINISH, empty="Please enter a non-empty value."),
+    ),
+)
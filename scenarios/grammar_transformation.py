@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class GrammarTransformationType(Enum):
     OPPOSITE_ADJECTIVE = "Opposite adjective"
@@ -27,4 +29,40 @@ class GrammarTransformation:
             return "Rewrite the sentences using the opposite adjective."
         if self.transformation_type == GrammarTransformationType.CHANGE_TENSE:
             return f"Change the sentences from the {self.tense1} to the {self.tense2}."
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- шаги мастера ----------
+TENSES = ("Present Simple", "Present Continuous", "Past Simple", "Past Continuous", "Present Perfect")
+
+
+def _tenses(setter: str, next: str, other: str) -> tuple:
+    return tuple(Option(t, (setter, t), next) for t in TENSES) + (Option("Other", next=other),)
+
+
+SCENARIO = Scenario(
+    key="grammar_transformation",
+    button="Transformation",
+    section="grammar",
+    factory=GrammarTransformation,
+    start="grammar_transformation_type",
+    steps=(
+        Choice("grammar_transformation_type", "What type of transformation do you want to create?", (
+            Option("Opposite adjective", ("set_transformation_type", GrammarTransformationType.OPPOSITE_ADJECTIVE),
+                   FINISH),
+            Option("Change tense", ("set_transformation_type", GrammarTransformationType.CHANGE_TENSE),
+                   "grammar_transformation_tense1"),
+            Option("Back to Grammar", back="back_to_grammar"),
+        ), param="transformation_type"),
+        Choice("grammar_transformation_tense1", "What is the initial tense?",
+               _tenses("set_tense1", "grammar_transformation_tense2", "grammar_transformation_tense1_other"),
+               invalid=Reprompt(options=True)),
+        Text("grammar_transformation_tense1_other", "Please enter the initial tense:",
+             ("set_tense1",), "grammar_transformation_tense2", strip=False),
+        Choice("grammar_transformation_tense2", "What is the target tense?",
+               _tenses("set_tense2", FINISH, "grammar_transformation_tense2_other"),
+               invalid=Reprompt(options=True)),
+        Text("grammar_transformation_tense2_other", "Please enter the target tense:",
+             ("set_tense2",), FINISH, strip=False),
+    ),
+)
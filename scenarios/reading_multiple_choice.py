@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Scenario, Text
+
 
 class ReadingTextType(Enum):
     TEXT = "text"
@@ -24,4 +26,26 @@ class ReadingMultipleChoice:
             if self.text_type == ReadingTextType.OTHER
             else (self.text_type.value if self.text_type else "text")
         )
-        return f"Read the {text_type}. Circle a, b, or c."
\ No newline at end of file
+        return f"Read the {text_type}. Circle a, b, or c."
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="reading_mc",
+    button="Reading Multiple Choice",
+    section="reading",
+    factory=ReadingMultipleChoice,
+    start="reading_multiple_choice_type",
+    steps=(
+        Choice("reading_multiple_choice_type", "What type of text is given?", (
+            Option("Text", ("set_text_type", ReadingTextType.TEXT), FINISH),
+            Option("Story", ("set_text_type", ReadingTextType.STORY), FINISH),
+            Option("Dialogue", ("set_text_type", ReadingTextType.DIALOGUE), FINISH),
+            Option("Other", next="reading_multiple_choice_type_other"),
+            Option("Back to Reading", back="back_to_reading"),
+        ), param="text_type"),
+        Text("reading_multiple_choice_type_other", "Please enter your own type:",
+             ("set_text_type", ReadingTextType.OTHER), FINISH, empty="Please enter a non-empty type.",
+             param="text_type_other"),
+    ),
+)
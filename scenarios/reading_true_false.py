@@ -1,5 +1,7 @@
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario
+
 
 class ReadingTrueFalse:
     def __init__(self):
@@ -12,4 +14,21 @@ class ReadingTrueFalse:
         instruction = "Match the sentences T (true) or F (false)."
         if self.read_first:
             instruction = "Read the text. " + instruction
-        return instruction
\ No newline at end of file
+        return instruction
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="reading_tf",
+    button="True/False",
+    section="reading",
+    factory=ReadingTrueFalse,
+    start="reading_true_false_read_first",
+    steps=(
+        Choice("reading_true_false_read_first", "Ask to read the text first?", (
+            Option("Yes", ("set_read_first", True), FINISH),
+            Option("No", ("set_read_first", False), FINISH),
+            Option("Back to Reading", back="back_to_reading"),
+        ), invalid=Reprompt("Please select Yes or No."), param="read_first"),
+    ),
+)
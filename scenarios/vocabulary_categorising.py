@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Scenario, Text
+
 
 class TaskType(Enum):
     FILL_TABLE = "Fill the table"
@@ -41,4 +43,27 @@ class VocabularyCategorising:
             base_instruction += f" with {self.custom_type.lower()}"
 
         base_instruction += "."
-        return base_instruction
\ No newline at end of file
+        return base_instruction
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="categorising",
+    button="Categorisation",
+    section="vocabulary",
+    factory=VocabularyCategorising,
+    start="categorising_task_type",
+    steps=(
+        Choice("categorising_task_type", "What type of categorising task do you want to create?", (
+            Option("Fill the table", ("set_task_type", TaskType.FILL_TABLE), "categorising_table_type"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        ), default="Fill the table"),
+        Choice("categorising_table_type", "What do you want students to complete in the table?", (
+            Option("Countries and nationalities", ("set_table_type", TableType.COUNTRIES_NATIONALITIES), FINISH),
+            Option("Just a chart", ("set_table_type", TableType.JUST_CHART), FINISH),
+            Option("Other", next="categorising_table_type_other"),
+        )),
+        Text("categorising_table_type_other", "Please enter your own type:",
+             ("set_table_type", TableType.OTHER), FINISH, empty="Please enter a non-empty type."),
+    ),
+)
@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional, List
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class LabelType(Enum):
     ACTIONS = "Actions (verbs)"
@@ -67,4 +69,34 @@ class VocabularyLabelling:
             base_instruction += " with the +ing form of the verbs"
 
         base_instruction += "."
-        return base_instruction
\ No newline at end of file
+        return base_instruction
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="labelling",
+    button="Labelling",
+    section="vocabulary",
+    factory=VocabularyLabelling,
+    start="labelling_label_type",
+    steps=(
+        Choice("labelling_label_type", "What do you want to label?", (
+            Option("Actions (verbs)", ("set_label_type", LabelType.ACTIONS), "labelling_task_format"),
+            Option("Places/buildings", ("set_label_type", LabelType.PLACES), "labelling_task_format"),
+            Option("Objects/things", ("set_label_type", LabelType.OBJECTS), "labelling_task_format"),
+            Option("Other", next="labelling_label_type_other"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        )),
+        Text("labelling_label_type_other", "Please enter your own type:",
+             ("set_label_type", LabelType.OTHER), "labelling_task_format",
+             empty="Please enter a non-empty type (e.g., 'Food', 'Transportation')."),
+        Choice("labelling_task_format", "What is the format of the task?", (
+            Option("Just label the pictures", ("set_task_format", TaskFormat.SIMPLE), "labelling_word_list_option"),
+            Option("Label using the verb +ing form", ("set_task_format", TaskFormat.ING_FORM), "labelling_word_list_option"),
+        )),
+        Choice("labelling_word_list_option", "Do you want to provide a word list for students?", (
+            Option("Yes", ("set_word_list_option", WordListOption.WITH_LIST), FINISH),
+            Option("No", ("set_word_list_option", WordListOption.WITHOUT_LIST), FINISH),
+        ), invalid=Reprompt("Please select Yes or No."), param="word_list"),
+    ),
+)
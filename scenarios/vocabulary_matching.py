@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Scenario, Text
+
 
 class MatchingType(Enum):
     SENTENCES_TO_PICTURES = "Sentences to pictures"
@@ -92,4 +94,56 @@ class VocabularyMatching:
             )
             return f"Match the {self.other_first} to the {second}."
 
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- шаги мастера ----------
+def _word_types(setter: str, other: str) -> tuple:
+    return tuple(
+        Option(label, (setter, WordType(label)), FINISH) for label in ("Words", "Nouns", "Adjectives", "Verbs")
+    ) + (Option("Other", next=other),)
+
+
+SCENARIO = Scenario(
+    key="matching",
+    button="Matching",
+    section="vocabulary",
+    factory=VocabularyMatching,
+    start="matching_type",
+    steps=(
+        Choice("matching_type", "What type of matching task do you want to create?", (
+            Option("Sentences to pictures", ("set_matching_type", MatchingType.SENTENCES_TO_PICTURES),
+                   "matching_sentences_range"),
+            Option("Descriptions to words", ("set_matching_type", MatchingType.DESCRIPTIONS_TO_WORDS),
+                   "matching_desc_word_type"),
+            Option("Questions to answers", ("set_matching_type", MatchingType.QUESTIONS_TO_ANSWERS),
+                   "matching_questions_range"),
+            Option("Other", ("set_matching_type", MatchingType.OTHER), "matching_other_first"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        ), param="matching_type"),
+        # Sentences to pictures
+        Text("matching_sentences_range", "How many sentences? Example: 1-6",
+             ("set_sentences_range",), "matching_pictures_range", param="sentences"),
+        Text("matching_pictures_range", "How many pictures? Example: a-f", ("set_pictures_range",), FINISH,
+             param="pictures"),
+        # Descriptions to words
+        Choice("matching_desc_word_type", "Descriptions for which kind of words?",
+               _word_types("set_desc_word_type", "matching_desc_word_type_other"), param="word_type"),
+        Text("matching_desc_word_type_other", "Please enter your own type:",
+             ("set_desc_word_type", WordType.OTHER), FINISH, empty="Please enter a non-empty type.",
+             param="word_type_other"),
+        # Questions to answers
+        Text("matching_questions_range", "How many questions? Example: 1-6",
+             ("set_questions_range",), "matching_answers_range", param="questions"),
+        Text("matching_answers_range", "How many answers? Example: a-f", ("set_answers_range",), FINISH,
+             param="answers"),
+        # Other
+        Text("matching_other_first", "Match what?", ("set_other_first",), "matching_other_second",
+             empty="Please enter a non-empty value.", param="first"),
+        Choice("matching_other_second", "Match to what?",
+               _word_types("set_other_second", "matching_other_second_other"), param="second"),
+        Text("matching_other_second_other", "Please enter your own type:",
+             ("set_other_second", WordType.OTHER), FINISH, empty="Please enter a non-empty type.",
+             param="second_other"),
+    ),
+)
@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Scenario, Text
+
 class OddOneOutType(Enum):
     CIRCLE_DIFFERENT = "Circle the different word"
     CIRCLE_SOUND = "Circle the word with certain sound"
@@ -35,4 +37,32 @@ class VocabularyOddOneOut:
         elif self.task_type == OddOneOutType.CIRCLE_SOUND:
             return f"Circle one word in each group which ends in {self.sound}."
         else:
-            return "" 
\ No newline at end of file
+            return "" 
+
+
+# ---------- шаги мастера ----------
+SCENARIO = Scenario(
+    key="odd_one_out",
+    button="Odd one out",
+    section="vocabulary",
+    factory=VocabularyOddOneOut,
+    start="odd_one_out_type",
+    steps=(
+        Choice("odd_one_out_type", "What type of odd one out task do you want to create?", (
+            Option("Circle the different word", ("set_task_type", OddOneOutType.CIRCLE_DIFFERENT),
+                   "odd_one_out_criterion"),
+            Option("Circle the word with certain sound", ("set_task_type", OddOneOutType.CIRCLE_SOUND),
+                   "odd_one_out_sound"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        ), param="task_type"),
+        Choice("odd_one_out_criterion", "What is different?", (
+            Option("Sound", ("set_criterion", DifferenceCriterion.SOUND), FINISH),
+            Option("Meaning", ("set_criterion", DifferenceCriterion.MEANING), FINISH),
+            Option("Other", next="odd_one_out_criterion_other"),
+        )),
+        Text("odd_one_out_criterion_other", "Please enter your own criterion:",
+             ("set_criterion", DifferenceCriterion.OTHER), FINISH, empty="Please enter a non-empty criterion."),
+        Text("odd_one_out_sound", "Type the sound. Example: /iz/.", ("set_sound",), FINISH,
+             empty="Please enter a non-empty sound (e.g., /iz/)."),
+    ),
+)
@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Reprompt, Scenario, Text
+
 
 class SynonymsTaskType(Enum):
     CHOOSE_POS = "Choose part of speech out of two"
@@ -72,4 +74,46 @@ class VocabularySynonyms:
                 raise ValueError("Adjective type must be set for OPP_SIM_ADJ task")
             return f"Write the {self.adj_type.value.lower()} adjectives."
 
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- шаги мастера ----------
+def _parts_of_speech(setter: str, next: str, other: str) -> tuple:
+    return tuple(
+        Option(p.value, (setter, p), next) for p in PartOfSpeech if p is not PartOfSpeech.OTHER
+    ) + (Option("Other", next=other),)
+
+
+def _other_pos(state: str, setter: str, next: str) -> Text:
+    return Text(state, "Please enter your own part of speech:", (setter, PartOfSpeech.OTHER), next,
+                empty="Please enter a non-empty part of speech.")
+
+
+SCENARIO = Scenario(
+    key="synonyms",
+    button="Synonyms/antonyms/definitions/lexical sets",
+    section="vocabulary",
+    factory=VocabularySynonyms,
+    start="synonyms_task_type",
+    steps=(
+        Choice("synonyms_task_type", "What type of task do you want to create?", (
+            Option("Choose part of speech out of two", ("set_task_type", SynonymsTaskType.CHOOSE_POS),
+                   "synonyms_pos1"),
+            Option("Opposite/similar adjectives", ("set_task_type", SynonymsTaskType.OPP_SIM_ADJ),
+                   "synonyms_adj_type"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        )),
+        Choice("synonyms_pos1", "Choose the first part of speech:",
+               _parts_of_speech("set_pos1", "synonyms_pos2", "synonyms_pos1_other"),
+               invalid=Reprompt(options=True)),
+        _other_pos("synonyms_pos1_other", "set_pos1", "synonyms_pos2"),
+        Choice("synonyms_pos2", "Choose the second part of speech:",
+               _parts_of_speech("set_pos2", FINISH, "synonyms_pos2_other"),
+               invalid=Reprompt(options=True)),
+        _other_pos("synonyms_pos2_other", "set_pos2", FINISH),
+        Choice("synonyms_adj_type", "What kind of adjectives?", (
+            Option("Opposite", ("set_adj_type", AdjectiveType.OPPOSITE), FINISH),
+            Option("Similar", ("set_adj_type", AdjectiveType.SIMILAR), FINISH),
+        ), invalid=Reprompt(options=True)),
+    ),
+)
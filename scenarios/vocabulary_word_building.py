@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Optional
 
+from scenario_graph import Choice, FINISH, Option, Scenario, Text
+
 
 class WordBuildingType(Enum):
     MISSING_LETTERS = "Missing letters"
@@ -113,4 +115,63 @@ class VocabularyWordBuilding:
             )
             return f"Make {build_type} from {given_type} in the list."
 
-        return ""
\ No newline at end of file
+        return ""
+
+
+# ---------- шаги мастера ----------
+def _word_types(setter: str, labels: tuple, next: str, other: str) -> tuple:
+    return tuple(
+        Option(label, (setter, WordType(label)), next) for label in labels
+    ) + (Option("Other", next=other),)
+
+
+def _other_type(state: str, setter: str, next: str, param: str) -> Text:
+    return Text(state, "Please enter your own type:", (setter, WordType.OTHER), next,
+                empty="Please enter a non-empty type.", param=param)
+
+
+_BUILD_LABELS = ("Words", "Nouns", "Verbs", "Adjectives")
+
+SCENARIO = Scenario(
+    key="word_building",
+    button="Word-building",
+    section="vocabulary",
+    factory=VocabularyWordBuilding,
+    start="word_building_task_type",
+    steps=(
+        Choice("word_building_task_type", "What type of word-building task do you want to create?", (
+            Option("Missing letters", ("set_task_type", WordBuildingType.MISSING_LETTERS),
+                   "word_building_missing_word_type"),
+            Option("Words from letters", ("set_task_type", WordBuildingType.WORDS_FROM_LETTERS),
+                   "word_building_words_from_letters_type"),
+            Option("Forms of words", ("set_task_type", WordBuildingType.FORMS_OF_WORDS),
+                   "word_building_forms_build_type"),
+            Option("Back to vocabulary", back="back_to_vocabulary"),
+        )),
+        # Missing letters
+        Choice("word_building_missing_word_type", "What type of words?", _word_types(
+            "set_word_type", ("Words", "Adjectives", "Nouns", "Verbs"),
+            "word_building_missing_type", "word_building_missing_word_type_other",
+        ), param="word_type"),
+        _other_type("word_building_missing_word_type_other", "set_word_type", "word_building_missing_type",
+                    "word_type_other"),
+        Choice("word_building_missing_type", "What is missing?", tuple(
+            Option(t.value, ("set_missing_type", t), FINISH) for t in MissingType
+        )),
+        # Words from letters
+        Choice("word_building_words_from_letters_type", "What type of words should students build?", _word_types(
+            "set_word_type", _BUILD_LABELS, FINISH, "word_building_words_from_letters_type_other",
+        ), param="word_type"),
+        _other_type("word_building_words_from_letters_type_other", "set_word_type", FINISH, "word_type_other"),
+        # Forms of words
+        Choice("word_building_forms_build_type", "What type of words should students build?", _word_types(
+            "set_build_type", _BUILD_LABELS, "word_building_forms_given_type", "word_building_forms_build_type_other",
+        ), param="build_type"),
+        _other_type("word_building_forms_build_type_other", "set_build_type", "word_building_forms_given_type",
+                    "build_type_other"),
+        Choice("word_building_forms_given_type", "What type of words is given?", _word_types(
+            "set_given_type", _BUILD_LABELS, FINISH, "word_building_forms_given_type_other",
+        ), param="given_type"),
+        _other_type("word_building_forms_given_type_other", "set_given_type", FINISH, "given_type_other"),
+    ),
+)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+import metrics
+
+# Планировщик исходящих сообщений. Хендлеры по-прежнему зовут message.answer,
+# а мидлварь сессии Bot придерживает каждый send*/edit*/copy*/forward* до
+# токена: сначала из ведра чата (Telegram: ~1 сообщение в секунду в чат,
+# 20 в минуту в группу), потом из общего ведра бота (~30 в секунду).
+# Правка уже отправленного сообщения (edit*: inline-мастер перерисовывает
+# экран на каждое нажатие) — не новое сообщение в чат и ждёт только общее
+# ведро; ответ на нажатие (answerCallbackQuery) не ждёт ничего.
+# Очередь к каждому ведру — по приоритету: ответы мастера (INTERACTIVE)
+# идут раньше рассылок (BULK), поэтому большая рассылка не удлиняет
+# ожидание интерактивных пользователей. На 429 ждёт весь бот: retry_after
+# относится к боту, а повтор сразу же лишь продлил бы блокировку.
+
+SEND_RATE = 30.0        # сообщений в секунду на весь бот
+SEND_BURST = 30
+CHAT_RATE = 1.0         # в один личный чат
+CHAT_BURST = 3
+GROUP_RATE = 20 / 60    # в группу или канал (chat_id < 0 или @username)
+SEND_RETRIES = 3        # повторов после retry_after, дальше — исключение хендлеру
+CHAT_GATES_MAX = 10_000  # ведер чатов в памяти; сверх — выбрасываем простаивающие
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = ("interactive", "bulk")
+
+# вызовы, которые Telegram считает отправкой сообщений
+_THROTTLED_PREFIXES = ("send", "copy", "forward", "edit")
+_UNTHROTTLED = frozenset({"sendChatAction"})
+# из них — без ведра чата
+_CHAT_EXEMPT_PREFIXES = ("edit",)
+
+logger = logging.getLogger(__name__)
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(value: int):
+    """Приоритет вызовов Bot API внутри блока (и в задачах, созданных в нём)."""
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bulk():
+    """Рассылки и прочие массовые отправки: with send_scheduler.bulk(): ..."""
+    return priority(BULK)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def throttled(method) -> bool:
+    name = method.__api_method__
+    return name.startswith(_THROTTLED_PREFIXES) and name not in _UNTHROTTLED
+
+
+def chat_limited(method) -> bool:
+    return not method.__api_method__.startswith(_CHAT_EXEMPT_PREFIXES)
+
+
+class TokenBucket:
+    """В среднем rate токенов в секунду, всплеск до burst. Время — time.monotonic()."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до следующего токена (0 — есть сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class _Gate:
+    """
+    Ожидающие одного ведра. Токены выдаёт одна задача: голова кучи —
+    меньший приоритет, при равном — кто раньше пришёл.
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._granter: Optional[asyncio.Task] = None
+
+    def idle(self, now: float) -> bool:
+        return not self._waiters and self.bucket.full(now)
+
+    def acquire(self, prio: int, seq: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (prio, seq, future))
+        if self._granter is None:
+            self._granter = asyncio.create_task(self._grant())
+        return future
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def _grant(self) -> None:
+        try:
+            while self._waiters:
+                future = self._waiters[0][2]
+                if future.done():  # ожидающий отменён
+                    heapq.heappop(self._waiters)
+                    continue
+                now = time.monotonic()
+                wait = max(self.paused_until - now, self.bucket.delay(now))
+                if wait > 0:
+                    # за время сна мог прийти кто-то важнее — голову смотрим заново
+                    await asyncio.sleep(wait)
+                    continue
+                heapq.heappop(self._waiters)
+                self.bucket.take()
+                future.set_result(None)
+        finally:
+            self._granter = None
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Мидлварь сессии Bot: bot.session.middleware(SendScheduler()).
+    Регистрируется раньше RequestTimer — тогда стадия sendMessage в /metrics
+    остаётся временем самого вызова, а ожидание видно в bot_send_wait_seconds.
+    """
+
+    def __init__(
+        self,
+        rate: float = SEND_RATE,
+        burst: float = SEND_BURST,
+        chat_rate: float = CHAT_RATE,
+        chat_burst: float = CHAT_BURST,
+        group_rate: float = GROUP_RATE,
+        retries: int = SEND_RETRIES,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.retries = retries
+        self._global = _Gate(TokenBucket(rate, burst))
+        self._chats: dict[Any, _Gate] = {}
+        self._seq = itertools.count()
+        self.waiting = [0] * len(PRIORITY_NAMES)
+
+    def _chat_gate(self, chat_id: Any) -> _Gate:
+        gate = self._chats.get(chat_id)
+        if gate is None:
+            if len(self._chats) >= CHAT_GATES_MAX:
+                self._prune()
+            group = not isinstance(chat_id, int) or chat_id < 0
+            gate = self._chats[chat_id] = _Gate(
+                TokenBucket(self.group_rate if group else self.chat_rate, self.chat_burst))
+        return gate
+
+    def _prune(self) -> None:
+        # ведро, которое успело наполниться, ничем не отличается от нового
+        now = time.monotonic()
+        for chat_id in [c for c, gate in self._chats.items() if gate.idle(now)]:
+            del self._chats[chat_id]
+
+    def _set_depth(self, prio: int, delta: int) -> None:
+        self.waiting[prio] += delta
+        metrics.SEND_QUEUE_DEPTH.set((PRIORITY_NAMES[prio],), self.waiting[prio])
+
+    async def acquire(self, chat_id: Any = None, prio: Optional[int] = None, seq: Optional[int] = None) -> None:
+        """Дождаться права на одно сообщение в chat_id (None — только общий лимит)."""
+        prio = current_priority() if prio is None else prio
+        seq = next(self._seq) if seq is None else seq
+        start = time.perf_counter()
+        self._set_depth(prio, +1)
+        try:
+            if chat_id is not None:
+                await self._chat_gate(chat_id).acquire(prio, seq)
+            await self._global.acquire(prio, seq)
+        finally:
+            self._set_depth(prio, -1)
+            metrics.SEND_WAIT_SECONDS.observe((PRIORITY_NAMES[prio],), time.perf_counter() - start)
+
+    def pause(self, seconds: float) -> None:
+        """Никому ничего не отправлять seconds секунд (retry_after от Telegram)."""
+        self._global.pause(seconds)
+
+    async def __call__(self, make_request, bot, method) -> Any:
+        if not throttled(method):
+            return await make_request(bot, method)
+        chat_id = getattr(method, "chat_id", None) if chat_limited(method) else None
+        prio = current_priority()
+        # повтор сохраняет место в очереди: порядок сообщений чата не меняется
+        seq = next(self._seq)
+        for attempt in itertools.count():
+            await self.acquire(chat_id, prio, seq)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                metrics.SEND_RETRY_AFTER.inc((method.__api_method__,))
+                self.pause(e.retry_after)
+                if attempt >= self.retries:
+                    raise
+                logger.warning("%s to %s: retry after %ss (attempt %d)",
+                               method.__api_method__, chat_id, e.retry_after, attempt + 1)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SESSION_DB_PATH = Path("sessions.db")
+SESSION_FLUSH_INTERVAL = 1.0   # сек: как часто SessionStore сбрасывает грязные сессии
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    chat_id INTEGER PRIMARY KEY,
+    updated REAL NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+_UPSERT = "INSERT OR REPLACE INTO sessions (chat_id, updated, data) VALUES (?,?,?)"
+_DELETE = "DELETE FROM sessions WHERE chat_id = ?"
+
+_STOP = object()
+
+
+class SessionBackend:
+    """
+    Интерфейс долговременного хранилища сессий для SessionStore.
+
+    Все методы, кроме load/keys, не должны трогать диск в вызывающем
+    потоке: save только ставит готовые блобы в очередь записи.
+    """
+
+    def start(self, max_age: float | None = None) -> None:
+        """Открыть хранилище; max_age — заодно удалить записи старше этого возраста."""
+
+    def keys(self, max_age: float) -> set[int]:
+        """chat_id сохранённых сессий не старше max_age (без чтения самих данных)."""
+        return set()
+
+    def load(self, chat_id: int, max_age: float) -> bytes | None:
+        return None
+
+    def save(self, items: list[tuple[int, bytes | None]]) -> None:
+        """Записать пачку (chat_id, blob); blob=None — удалить сессию."""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Write-behind хранилище сессий в SQLite.
+
+    save() кладёт пачку в очередь, отдельный поток пишет её одной
+    транзакцией. Пока пачка не закоммичена, load() отдаёт блоб из
+    _pending, так что чтение всегда видит последнее состояние.
+    """
+
+    def __init__(self, path: Path | str = SESSION_DB_PATH):
+        self.path = Path(path)
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: dict[int, bytes | None] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._reader: sqlite3.Connection | None = None
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+    def start(self, max_age: float | None = None) -> None:
+        if self._thread is not None:
+            return
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+            if max_age is not None:
+                conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age,))
+            conn.commit()
+        finally:
+            conn.close()
+        # читающее соединение живёт в потоке event loop'а
+        self._reader = self._connect(check_same_thread=False)
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def keys(self, max_age: float) -> set[int]:
+        if self._reader is None:
+            return set()
+        rows = self._reader.execute(
+            "SELECT chat_id FROM sessions WHERE updated >= ?", (time.time() - max_age,)
+        )
+        return {chat_id for (chat_id,) in rows}
+
+    def load(self, chat_id: int, max_age: float) -> bytes | None:
+        with self._lock:
+            if chat_id in self._pending:
+                return self._pending[chat_id]
+        if self._reader is None:
+            return None
+        row = self._reader.execute(
+            "SELECT updated, data FROM sessions WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        return row[1]
+
+    def save(self, items: list[tuple[int, bytes | None]]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._pending.update(items)
+        self._queue.put(items)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    # ---------- поток записи ----------
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            stop = False
+            while not stop:
+                batches = [self._queue.get()]
+                # забираем всё, что успело накопиться, — одна транзакция
+                while True:
+                    try:
+                        batches.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                latest: dict[int, bytes | None] = {}
+                for items in batches:
+                    if items is _STOP:
+                        stop = True
+                    else:
+                        latest.update(items)
+                self._write(conn, latest)
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, latest: dict[int, bytes | None]) -> None:
+        if not latest:
+            return
+        now = time.time()
+        upserts = [(cid, now, blob) for cid, blob in latest.items() if blob is not None]
+        deletes = [(cid,) for cid, blob in latest.items() if blob is None]
+        try:
+            with conn:
+                if upserts:
+                    conn.executemany(_UPSERT, upserts)
+                if deletes:
+                    conn.executemany(_DELETE, deletes)
+        except sqlite3.Error:
+            logger.exception("Session batch of %d rows failed", len(latest))
+            return
+        with self._lock:
+            for cid, blob in latest.items():
+                # снимаем из _pending, только если поверх не легло более новое значение
+                if cid in self._pending and self._pending[cid] is blob:
+                    del self._pending[cid]
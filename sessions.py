@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import logging
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# ключи сценариев, под которыми generation.py кладёт инстансы в сессию
+SCENARIO_KEYS = (
+    "labelling", "categorising", "word_building", "matching", "odd_one_out",
+    "synonyms", "grammar_mc", "grammar_completion", "grammar_transformation",
+    "grammar_error_correction", "reading_mc", "reading_tf",
+)
+_SCENARIO_KEYS = frozenset(SCENARIO_KEYS)
+_FIELDS = frozenset(("task_type", "state", "pending_instruction"))
+
+# версия бинарного формата Session.dumps()
+_DUMP_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    Компактная сессия чата.
+
+    Вместо словаря на 16 ключей держим только то, что реально бывает
+    заполнено: раздел, состояние, один активный сценарий и extras.
+    Доступ по ключам (sess["state"], sess["labelling"], sess.get(...))
+    сохранён, чтобы generation.py и оба бота работали без изменений.
+    """
+
+    __slots__ = (
+        "task_type", "state", "scenario_key", "scenario", "pending_instruction", "extras",
+        "touched",
+    )
+
+    def __init__(self, task_type: str | None = None):
+        self.task_type: Optional[str] = task_type
+        self.state: Optional[str] = None
+        self.scenario_key: Optional[str] = None
+        self.scenario: Any = None
+        self.pending_instruction: Optional[str] = None
+        # словарь extras создаётся лениво — до него доходят немногие
+        self.extras: Optional[dict] = None
+        # время последнего обращения (ставит SessionStore)
+        self.touched: float = 0.0
+
+    def clear_scenario(self) -> None:
+        self.scenario_key = None
+        self.scenario = None
+
+    def is_empty(self) -> bool:
+        """Нечего сохранять: ни раздела, ни шага мастера."""
+        return self.state is None and self.task_type is None and self.scenario is None
+
+    # ---------- бинарная сериализация ----------
+    def dumps(self) -> bytes:
+        return pickle.dumps(
+            (_DUMP_VERSION, self.task_type, self.state, self.scenario_key, self.scenario,
+             self.pending_instruction, self.extras),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+
+    @classmethod
+    def loads(cls, blob: bytes) -> "Session":
+        version, task_type, state, scenario_key, scenario, pending, extras = pickle.loads(blob)
+        if version != _DUMP_VERSION:
+            raise ValueError(f"unsupported session format: {version}")
+        sess = cls(task_type)
+        sess.state = state
+        sess.scenario_key, sess.scenario = scenario_key, scenario
+        sess.pending_instruction = pending
+        sess.extras = extras
+        return sess
+
+    # ---------- dict-совместимый доступ ----------
+    def __getitem__(self, key: str) -> Any:
+        if key in _SCENARIO_KEYS:
+            return self.scenario if self.scenario_key == key else None
+        if key == "extras":
+            if self.extras is None:
+                self.extras = {"work_mode": None, "time": None}
+            return self.extras
+        if key in _FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _SCENARIO_KEYS:
+            if value is not None:
+                self.scenario_key, self.scenario = key, value
+            elif self.scenario_key == key:
+                self.clear_scenario()
+            return
+        if key == "extras" or key in _FIELDS:
+            setattr(self, key, value)
+            return
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in _SCENARIO_KEYS or key in _FIELDS or key == "extras"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return (
+            f"Session(task_type={self.task_type!r}, state={self.state!r}, "
+            f"scenario={self.scenario_key!r})"
+        )
+
+
+# --- ограничения хранилища по умолчанию ---
+SESSION_TTL = 2 * 60 * 60     # сек простоя, после которых сессия считается протухшей
+SESSION_MAX = 50_000          # максимум сессий в памяти (дальше — вытеснение LRU)
+SESSION_SWEEP = 8             # сколько протухших записей убираем за одно обращение
+
+
+class SessionStore:
+    """
+    Ограниченное хранилище сессий: idle-TTL + LRU по количеству.
+
+    Записи лежат в OrderedDict в порядке последнего обращения, поэтому
+    самые старые всегда в начале: при каждом обращении снимаем с головы
+    не больше SESSION_SWEEP протухших записей — без полного прохода.
+
+    С backend'ом (см. session_backend.py) хранилище становится write-behind:
+    обращение только помечает чат грязным, а flush_dirty() периодически
+    сериализует грязные сессии и отдаёт их backend'у на фоновую запись.
+    Сохранённые сессии подгружаются лениво — при первом обращении к чату.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL,
+        max_size: int = SESSION_MAX,
+        sweep_batch: int = SESSION_SWEEP,
+        clock=time.monotonic,
+        backend=None,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sweep_batch = sweep_batch
+        self.backend = backend
+        self._clock = clock
+        self._data: OrderedDict[int, Session] = OrderedDict()
+        # чаты, изменённые с последнего flush_dirty()
+        self._dirty: set[int] = set()
+        # чаты, чьё актуальное состояние лежит только в backend'е
+        self._persisted: set[int] = set()
+        # счётчики
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0      # вытеснено по max_size
+        self.expirations = 0    # удалено по TTL
+        self.loads = 0          # поднято из backend'а
+
+    def open(self) -> None:
+        """Подключить backend: читаем только список chat_id, сами сессии — лениво."""
+        if self.backend is None:
+            return
+        self.backend.start(max_age=self.ttl)
+        self._persisted = self.backend.keys(self.ttl)
+        logger.info("Session backend opened, %d sessions available", len(self._persisted))
+
+    def close(self) -> None:
+        """Сбросить всё грязное и закрыть backend (дожидается записи)."""
+        if self.backend is None:
+            return
+        self.flush_dirty()
+        self.backend.close()
+        # всё уже в backend'е; после open() (новый захват аренды) читаем оттуда,
+        # а не из памяти — сессии мог менять другой экземпляр
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, chat_id: int) -> bool:
+        sess = self._data.get(chat_id)
+        return sess is not None and self._clock() - sess.touched <= self.ttl
+
+    def get(self, chat_id: int, dirty: bool = True) -> Session | None:
+        """
+        Сессия чата или None (нет / протухла). Обновляет LRU-позицию.
+        dirty=False — только чтение, сессию не нужно пересохранять.
+        """
+        now = self._clock()
+        self._sweep(now)
+        sess = self._data.get(chat_id)
+        if sess is not None and now - sess.touched > self.ttl:
+            self._expire(chat_id)
+            sess = None
+        if sess is None and chat_id in self._persisted:
+            sess = self._load(chat_id)
+        if sess is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        sess.touched = now
+        self._data.move_to_end(chat_id)
+        if dirty:
+            self._dirty.add(chat_id)
+        return sess
+
+    def get_or_create(self, chat_id: int) -> Session:
+        sess = self.get(chat_id)
+        if sess is None:
+            sess = Session()
+            self.put(chat_id, sess)
+        return sess
+
+    def put(self, chat_id: int, sess: Session) -> None:
+        sess.touched = self._clock()
+        self._data[chat_id] = sess
+        self._data.move_to_end(chat_id)
+        self._persisted.discard(chat_id)
+        self._mark_dirty(chat_id)
+        while len(self._data) > self.max_size:
+            self._evict(next(iter(self._data)))
+
+    def discard(self, chat_id: int) -> None:
+        self._data.pop(chat_id, None)
+        self._persisted.discard(chat_id)
+        self._mark_dirty(chat_id)
+
+    def flush_dirty(self) -> int:
+        """
+        Сериализует грязные сессии и отдаёт их backend'у (без записи на диск
+        в этом потоке). Пустые и удалённые сессии стираются из backend'а.
+        """
+        if self.backend is None or not self._dirty:
+            self._dirty.clear()
+            return 0
+        items = []
+        for chat_id in self._dirty:
+            sess = self._data.get(chat_id)
+            items.append((chat_id, None if sess is None or sess.is_empty() else sess.dumps()))
+        self._dirty.clear()
+        self.backend.save(items)
+        return len(items)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "dirty": len(self._dirty),
+        }
+
+    # ---------- внутреннее ----------
+    def _mark_dirty(self, chat_id: int) -> None:
+        if self.backend is not None:
+            self._dirty.add(chat_id)
+
+    def _load(self, chat_id: int) -> Session | None:
+        self._persisted.discard(chat_id)
+        blob = self.backend.load(chat_id, self.ttl)
+        if blob is None:
+            return None
+        try:
+            sess = Session.loads(blob)
+        except Exception:
+            logger.exception("Failed to restore session for chat %s", chat_id)
+            return None
+        self.loads += 1
+        self._data[chat_id] = sess
+        while len(self._data) > self.max_size:
+            self._evict(next(iter(self._data)))
+        return sess
+
+    def _sweep(self, now: float) -> None:
+        data = self._data
+        for _ in range(self.sweep_batch):
+            if not data:
+                return
+            chat_id = next(iter(data))
+            if now - data[chat_id].touched <= self.ttl:
+                return
+            self._expire(chat_id)
+
+    def _expire(self, chat_id: int) -> None:
+        # протухшая сессия не должна воскреснуть после рестарта
+        self._data.pop(chat_id, None)
+        self._mark_dirty(chat_id)
+        self.expirations += 1
+
+    def _evict(self, chat_id: int) -> None:
+        sess = self._data.pop(chat_id, None)
+        self.evictions += 1
+        if self.backend is not None and sess is not None and chat_id in self._dirty:
+            # вытесненную, но ещё живую сессию сохраняем сразу — её можно будет поднять
+            self._dirty.discard(chat_id)
+            self.backend.save([(chat_id, None if sess.is_empty() else sess.dumps())])
+        if self.backend is not None and sess is not None and not sess.is_empty():
+            self._persisted.add(chat_id)
@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from aiogram.types import Update
+
+import catch_up
+from catch_up import CatchUpRules
+from update_ledger import DedupMiddleware, UpdateLedger
+
+NOW = 1_800_000_000.0
+RULES = CatchUpRules(view=frozenset({"Help"}), starts=frozenset({"Matching"}), resets=frozenset({"/menu"}))
+_ids = iter(range(1, 1_000_000))
+
+
+def message(chat_id, age, text=None, document=False):
+    payload = {
+        "message_id": next(_ids),
+        "date": datetime.fromtimestamp(NOW - age, timezone.utc),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+    }
+    if document:
+        payload["document"] = {"file_id": "f", "file_unique_id": "u", "file_name": "tasks.csv"}
+    else:
+        payload["text"] = text
+    return Update.model_validate({"update_id": next(_ids), "message": payload})
+
+
+def callback(chat_id, data, in_chat=True):
+    query = {
+        "id": str(next(_ids)), "chat_instance": "c", "data": data,
+        "from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+    }
+    if in_chat:
+        query["message"] = message(chat_id, 3600, "menu").message
+    return Update.model_validate({"update_id": next(_ids), "callback_query": query})
+
+
+def plan(updates):
+    return catch_up.plan(updates, RULES, max_age=120, now=NOW)
+
+
+def test_stale_update_drops_everything_before_it_in_its_chat():
+    old, older_step, fresh = message(1, 600, "Matching"), message(1, 300, "1-5"), message(1, 10, "a-f")
+    other = message(2, 10, "Matching")
+    result = plan([old, other, older_step, fresh])
+    assert result.keep == [other, fresh]
+    assert result.stale == {1: 2}
+
+
+def test_documents_survive_the_age_cut():
+    document = message(1, 900, document=True)
+    step, fresh = message(1, 600, "1-5"), message(1, 5, "Help")
+    # старый документ — всё равно в работу; соседние старые шаги мастера — нет
+    result = plan([document, step, fresh])
+    assert result.keep == [document, fresh]
+    assert result.stale == {1: 1}
+    # документ последним и старым не двигает отсечку
+    result = plan([message(2, 5, "Matching"), message(2, 700, document=True)])
+    assert len(result.keep) == 2 and result.stale == {}
+
+
+def test_superseded_taps():
+    view, start, reset = message(1, 30, "Help"), message(1, 20, "Matching"), message(1, 10, "/menu")
+    document = message(1, 5, document=True)
+    result = plan([view, start, reset, document])
+    # Help перекрыт чем угодно, старт — /menu; документ не перекрывает и не перекрывается
+    assert result.keep == [reset, document] and result.superseded == 2
+
+    taps = [callback(2, "a"), callback(2, "b"), callback(2, "c")]
+    result = plan(taps)
+    assert result.keep == taps[-1:] and result.superseded == 2
+
+
+def test_updates_without_chat_are_kept():
+    # без чата апдейты не группируются и не прореживаются
+    taps = [callback(3, "a", in_chat=False), callback(3, "b", in_chat=False)]
+    assert plan(taps) == catch_up.CatchUpPlan(taps, {}, 0)
+
+
+class FakeBot:
+    """getUpdates по правилам Bot API: offset подтверждает всё, что ниже."""
+
+    def __init__(self, updates):
+        self.pending = list(updates)
+        self.calls = []
+
+    async def get_updates(self, offset=None, limit=100, timeout=0, allowed_updates=None):
+        self.calls.append(offset)
+        if offset is not None:
+            self.pending = [u for u in self.pending if u.update_id >= offset]
+        return self.pending[:limit]
+
+    async def send_message(self, chat_id, text):
+        pass
+
+
+class FakeDispatcher:
+    def __init__(self, ledger):
+        self.dedup = DedupMiddleware(ledger)
+        self.handled = []
+
+    def resolve_used_update_types(self):
+        return ["message"]
+
+    async def feed_update(self, bot, update, **data):
+        async def handler(event, data):
+            await asyncio.sleep(0.01)
+            self.handled.append(event.update_id)
+
+        await self.dedup(handler, update, data)
+
+
+def test_drain_leaves_the_last_batch_unconfirmed(monkeypatch):
+    monkeypatch.setattr(catch_up, "CATCH_UP_BATCH", 2)
+    updates = [message(1, 5, "Help") for _ in range(5)]
+    bot = FakeBot(updates)
+    assert asyncio.run(catch_up.drain(bot)) == updates
+    # 2 + 2 + 1: последняя пачка короче лимита, подтверждающего запроса нет
+    assert bot.calls == [None, updates[1].update_id + 1, updates[3].update_id + 1]
+    assert bot.pending == updates[4:]
+
+
+def test_run_handles_kept_updates_and_records_dropped_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(catch_up, "time", SimpleNamespace(time=lambda: NOW))
+    old, fresh = message(1, 600, "Matching"), message(1, 10, "1-5")
+    view, reset = message(2, 20, "Help"), message(2, 10, "/menu")
+    updates = [old, view, fresh, reset]
+    ledger = UpdateLedger(tmp_path / "updates.db", window=64)
+    dp = FakeDispatcher(ledger)
+    bot = FakeBot(updates)
+
+    result = asyncio.run(catch_up.run(dp, bot, ledger, RULES, max_age=120))
+    # run вернулся, когда оставленное уже обработано; в учёте — все четыре
+    assert dp.handled == [fresh.update_id, reset.update_id] == [u.update_id for u in result.keep]
+    assert all(ledger.seen(u.update_id) for u in updates) and not ledger.in_flight
+    assert ledger.offset == max(u.update_id for u in updates) + 1
+    assert bot.pending == updates  # подтвердит первый getUpdates опроса
+    ledger.close()
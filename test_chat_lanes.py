@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+from chat_lanes import ChatLanesMiddleware
+
+
+def chat(chat_id):
+    return {"event_chat": SimpleNamespace(id=chat_id)}
+
+
+def run_all(lanes, updates, work):
+    """updates — [(имя, data)]; work(имя) — корутина хендлера."""
+    async def scenario():
+        async def handler(name, data):
+            return await work(name)
+
+        return await asyncio.gather(*(lanes(handler, name, data) for name, data in updates))
+
+    return asyncio.run(scenario())
+
+
+def test_one_chat_in_order_others_in_parallel():
+    lanes = ChatLanesMiddleware()
+    log = []
+    peak = 0
+
+    async def work(name):
+        nonlocal peak
+        log.append(f"start {name}")
+        peak = max(peak, lanes.in_flight)
+        await asyncio.sleep(0.01)
+        log.append(f"end {name}")
+        return name
+
+    results = run_all(lanes, [("a1", chat(1)), ("a2", chat(1)), ("b1", chat(2)), ("a3", chat(1))], work)
+    assert results == ["a1", "a2", "b1", "a3"]
+    own = [entry for entry in log if entry.endswith(("a1", "a2", "a3"))]
+    assert own == ["start a1", "end a1", "start a2", "end a2", "start a3", "end a3"]
+    # b1 не ждёт очередь чата 1
+    assert log.index("start b1") < log.index("end a1")
+    assert peak == 2
+    # пустые очереди удаляются
+    assert lanes.chats == 0 and lanes.in_flight == 0
+
+
+def test_concurrency_limit_across_chats():
+    lanes = ChatLanesMiddleware(concurrency=2)
+    peak = 0
+
+    async def work(name):
+        nonlocal peak
+        peak = max(peak, lanes.in_flight)
+        await asyncio.sleep(0.01)
+
+    run_all(lanes, [(i, chat(i)) for i in range(6)], work)
+    assert peak == 2
+
+
+def test_chat_key_falls_back_to_user_and_none():
+    user = {"event_from_user": SimpleNamespace(id=7)}
+    assert ChatLanesMiddleware.chat_key(chat(5)) == 5
+    assert ChatLanesMiddleware.chat_key(user) == 7
+    assert ChatLanesMiddleware.chat_key({}) is None
+
+    lanes = ChatLanesMiddleware()
+
+    async def work(name):
+        await asyncio.sleep(0)
+        return name
+
+    assert run_all(lanes, [("x", {}), ("y", user)], work) == ["x", "y"]
+    assert lanes.chats == 0
+
+
+def test_failed_update_frees_the_lane():
+    lanes = ChatLanesMiddleware()
+
+    async def work(name):
+        if name == "bad":
+            raise RuntimeError(name)
+        return name
+
+    async def scenario():
+        async def handler(name, data):
+            return await work(name)
+
+        return await asyncio.gather(lanes(handler, "bad", chat(1)), lanes(handler, "ok", chat(1)),
+                                    return_exceptions=True)
+
+    bad, ok = asyncio.run(scenario())
+    assert isinstance(bad, RuntimeError) and ok == "ok"
+    assert lanes.chats == 0 and lanes.in_flight == 0
@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db_utils
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_PATH", tmp_path / "logs.db")
+    db_utils.init_db()
+    return db_utils.DB_PATH
+
+
+def test_stop_with_full_queue_drops_tail_and_joins(db, monkeypatch):
+    writer = db_utils.LogWriter(maxsize=3, flush_interval=0.01)
+    gate = threading.Event()
+    # писатель занят первой пачкой, очередь за ним забивается
+    monkeypatch.setattr(writer, "_write", lambda conn, encoder, rows: gate.wait(5))
+    writer.start()
+    writer.put((1, "u", 0, "a", None))
+    while writer._queue.qsize():
+        pass
+    for i in range(3):
+        assert writer.put((1, "u", i, "a", None))
+    assert not writer.put((1, "u", 9, "a", None))
+
+    stopper = threading.Thread(target=writer.stop, kwargs={"timeout": 0.05})
+    stopper.start()
+    stopper.join(1)
+    gate.set()
+    stopper.join(5)
+    assert not stopper.is_alive()
+    assert writer._thread is None
+
+
+def test_writer_flushes_rows(db):
+    writer = db_utils.LogWriter(flush_interval=0.01)
+    writer.start()
+    writer.put((1, "alice", 1000, "Vocabulary", None))
+    writer.put((1, "alice", 2000, "FEEDBACK: ", "great bot"))
+    writer.put((1, "alice", 3000, "FEEDBACK: ", "too slow"))
+    assert writer.flush()
+    writer.stop()
+    assert rows(db, "SELECT user_id, username, ts, action FROM action_log") == [
+        (1, "alice", 1000, "Vocabulary"), (1, "alice", 2000, "FEEDBACK: great bot"),
+        (1, "alice", 3000, "FEEDBACK: too slow")]
+    # свободный текст — в events.detail, словарь растёт только на известные действия
+    assert rows(db, "SELECT text FROM actions ORDER BY id") == [("Vocabulary",), ("FEEDBACK: ",)]
+
+
+def rows(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER, username TEXT, time_utc TEXT, action TEXT
+)
+"""
+
+
+def legacy(path, count):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany("INSERT INTO logs (user_id, username, time_utc, action) VALUES (?,?,?,?)", [
+            (i % 3, f"user{i % 3}", f"2024-05-01T10:00:{i:02d}+00:00", "Help" if i % 2 else f"FEEDBACK: note {i}")
+            for i in range(count)])
+    conn.close()
+
+
+def split(text):
+    if text.startswith("FEEDBACK: "):
+        return "FEEDBACK: ", text[len("FEEDBACK: "):]
+    return text, None
+
+
+def test_migration_moves_legacy_rows_in_chunks(db):
+    legacy(db, 7)
+    db_utils.init_db()
+    assert db_utils.migrate_legacy(chunk=3, pause=0, split=split) == 7
+    assert rows(db, "SELECT name FROM sqlite_master WHERE name = 'logs'") == []
+    log = rows(db, "SELECT user_id, username, ts, action FROM action_log ORDER BY id")
+    assert [row[3] for row in log] == [f"FEEDBACK: note {i}" if i % 2 == 0 else "Help" for i in range(7)]
+    assert log[1] == (1, "user1", 1714557601000, "Help")
+    assert rows(db, "SELECT text FROM actions ORDER BY id") == [("FEEDBACK: ",), ("Help",)]
+    assert rows(db, "SELECT user_id, username FROM users ORDER BY user_id") == [
+        (0, "user0"), (1, "user1"), (2, "user2")]
+    assert db_utils.migrate_legacy(pause=0) == 0
+
+
+def test_migration_resumes_after_a_failed_chunk(db, monkeypatch):
+    legacy(db, 5)
+    db_utils.init_db()
+    calls = 0
+    real_iso_to_ms = db_utils._iso_to_ms
+
+    def failing(time_utc):
+        nonlocal calls
+        calls += 1
+        if calls == 3:  # вторая пачка, её первая строка
+            raise ValueError("broken row")
+        return real_iso_to_ms(time_utc)
+
+    monkeypatch.setattr(db_utils, "_iso_to_ms", failing)
+    with pytest.raises(ValueError):
+        db_utils.migrate_legacy(chunk=2, pause=0)
+    # первая пачка перенесена и удалена из logs, вторая откатилась целиком
+    assert rows(db, "SELECT count(*) FROM events") == [(2,)]
+    assert rows(db, "SELECT min(id), count(*) FROM logs") == [(3, 3)]
+
+    monkeypatch.setattr(db_utils, "_iso_to_ms", real_iso_to_ms)
+    assert db_utils.migrate_legacy(chunk=2, pause=0) == 3
+    assert rows(db, "SELECT count(*), count(DISTINCT ts) FROM events") == [(5, 5)]
+
+
+def test_init_db_adds_detail_to_an_existing_events_table(tmp_path, monkeypatch):
+    path = tmp_path / "logs.db"
+    monkeypatch.setattr(db_utils, "DB_PATH", path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE actions (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE);
+        CREATE TABLE events (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, ts INTEGER NOT NULL,
+                             action_id INTEGER NOT NULL REFERENCES actions(id));
+        CREATE VIEW action_log AS SELECT e.id, e.ts, a.text AS action FROM events e JOIN actions a ON a.id = e.action_id;
+        INSERT INTO actions (id, text) VALUES (1, 'Help');
+        INSERT INTO events (user_id, ts, action_id) VALUES (1, 5, 1);
+    """)
+    conn.close()
+    db_utils.init_db()
+    db_utils.init_db()  # повторный старт ничего не ломает
+    db_utils.log_user_action(1, "alice", "FEEDBACK: ", "hi")
+    assert rows(path, "SELECT username, action FROM action_log ORDER BY id") == [
+        ("alice", "Help"), ("alice", "FEEDBACK: hi")]
+
+
+def test_encoder_caches_are_bounded(db):
+    encoder = db_utils.Encoder(cache_size=2, user_cache_size=2)
+    conn = sqlite3.connect(db)
+    with conn:
+        encoder.encode(conn, [(user_id, f"u{user_id}", 0, f"a{user_id}", None) for user_id in range(5)])
+    conn.close()
+    assert len(encoder.usernames) <= 2 and len(encoder.action_ids) <= 2
+
+
+def test_failed_batch_does_not_leave_stale_action_ids(db):
+    writer = db_utils.LogWriter()
+    encoder = db_utils.Encoder()
+    conn = db_utils._get_conn()
+    try:
+        # user_id NULL валит вставку events уже после того, как "Alpha" попал в actions
+        writer._write(conn, encoder, [(1, "u", 1000, "Alpha", None), (None, "u", 1000, "x", None)])
+        assert rows(db, "SELECT count(*) FROM actions") == [(0,)]
+        writer._write(conn, encoder, [(1, "u", 2000, "Beta", None), (1, "u", 3000, "Alpha", None)])
+    finally:
+        conn.close()
+    assert rows(db, "SELECT ts, action FROM action_log ORDER BY ts") == [(2000, "Beta"), (3000, "Alpha")]
@@ -0,0 +1,64 @@
+import pytest
+
+import inline_wizard
+from inline_wizard import StaleCallback, decode, encode
+from wizard_paths import SCENARIOS
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    inline_wizard._pending.clear()
+    yield
+    inline_wizard._pending.clear()
+
+
+@pytest.mark.parametrize("path", [
+    (),
+    (0, 1, 2),
+    ("food",),
+    ("",),                      # пустой свободный ответ
+    (1, "", 0, "drinks", ""),
+])
+def test_encode_decode_round_trip(path):
+    scenario = SCENARIOS[0]
+    assert decode(encode(scenario, path)) == (scenario, path)
+
+
+def test_split_data_keeps_free_text_out_of_the_button_path():
+    scenario = SCENARIOS[0]
+    assert inline_wizard.split_data(encode(scenario, (0, 1))) == (encode(scenario, (0, 1)), None)
+    data = encode(scenario, (1, "food", ""))
+    head, detail = inline_wizard.split_data(data)
+    assert detail == "|food|" and head + detail == data
+    # тот же путь по кнопкам с другим вводом — то же действие
+    assert inline_wizard.split_data(encode(scenario, (1, "soup", "x")))[0] == head
+    head, detail = inline_wizard.split_data(encode(scenario, ("x" * 80,)))
+    assert head == inline_wizard.TOKEN_PREFIX and detail
+
+
+@pytest.mark.parametrize("data", ["w", "x0", "w0.", "w0|extra", "w0.|a|b", "w~", "tmissing"])
+def test_malformed_data_is_stale(data):
+    with pytest.raises(StaleCallback):
+        decode(data)
+
+
+def test_on_text_with_outdated_path_restarts_instead_of_raising():
+    # путь, который граф больше не примет: кнопка за пределами вариантов
+    inline_wizard._wait_text(1, (SCENARIOS[0], (63,)))
+    screen = inline_wizard.on_text(1, "anything")
+    assert screen.markup is not None and screen.pending is None
+    assert not inline_wizard.is_waiting(1)
+
+
+def test_empty_free_text_answer_keeps_the_wizard_going():
+    # Reading Multiple Choice → Other: шаг без кнопок, пустой ответ не принимается
+    pending = ("reading_mc", (3,))
+    screen = inline_wizard.on_callback(1, encode(*pending))
+    assert screen == inline_wizard.Screen("Please enter your own type:", pending=pending)
+    after = inline_wizard.on_text(1, "")
+    assert after == inline_wizard.Screen("Please enter a non-empty type.", pending=pending)
+    assert inline_wizard._pending[1] == pending
+    # мастер ждёт дальше, и следующий ответ принимается
+    after = inline_wizard.on_text(1, "Poem")
+    assert after.text == "Do you want to give additional instructions?" and after.pending is None
+    assert not inline_wizard.is_waiting(1)
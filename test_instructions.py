@@ -0,0 +1,89 @@
+import subprocess
+import sys
+
+import pytest
+
+from formulate import formulate
+from generation import SCENARIO_GRAPH, CreateTaskFormulation
+from instructions import ParamError, build_instruction
+from wizard_paths import iter_steps
+
+_CHAT = 0
+_PREFIX = "Task formulation:\n"
+
+
+def wizard(scenario, answers):
+    text = formulate(scenario, [*answers, "-"])
+    assert text.startswith(_PREFIX)
+    return text[len(_PREFIX):]
+
+
+def wizard_cases():
+    """(сценарий, ответы мастера, те же ответы как параметры) для каждого пути до доп. инструкций."""
+    formulator = CreateTaskFormulation()
+    for step in iter_steps(CreateTaskFormulation):
+        if step.state != "additional_instructions":
+            continue
+        formulator.reset_session(_CHAT)
+        formulator.start(_CHAT, step.scenario)
+        params = {"task": step.scenario}
+        for text in step.path:
+            params[SCENARIO_GRAPH.steps[formulator.get_state(_CHAT)].param] = text
+            formulator.handle(_CHAT, text)
+        yield step.scenario, step.path, params
+
+
+@pytest.mark.parametrize("scenario, path, params", [
+    pytest.param(*case, id="/".join(case[:1] + case[1])) for case in wizard_cases()
+])
+def test_same_text_as_wizard(scenario, path, params):
+    assert build_instruction(params) == wizard(scenario, path)
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({"task": "matching", "matching_type": "Sentences to pictures", "sentences": "1-5", "pictures": "a-f",
+      "work_mode": "In pairs", "time": 2},
+     "Match sentences 1-5 to pictures a-f. Work in pairs. You have 2 minutes."),
+    # регистр, «_» вместо пробелов, yes/no и bool
+    ({"task": "Reading-TF", "read_first": "YES"}, "Read the text. Match the sentences T (true) or F (false)."),
+    ({"task": "labelling", "label_type": "objects/things", "task_format": "just_label_the_pictures",
+      "word_list": False},
+     wizard("labelling", ["Objects/things", "Just label the pictures", "No"])),
+    # своё значение прямо в параметре — как «Other» плюс <параметр>_other
+    ({"task": "grammar_completion", "text_type": "Text", "task_type": "Certain form of the verb",
+      "tense": "Future Perfect"},
+     wizard("grammar_completion", ["Text", "Certain form of the verb", "Other", "Future Perfect"])),
+    # параметр по умолчанию у шага
+    ({"task": "categorising", "table_type": "Just a chart"}, wizard("categorising", ["Fill", "chart"])),
+])
+def test_params(params, expected):
+    assert build_instruction(params) == expected
+
+
+@pytest.mark.parametrize("params, message", [
+    ({}, "'task' is required"),
+    ({"task": "essay"}, "Unknown task 'essay'"),
+    ({"task": "matching", "matching_type": "Sentences to pictures", "sentences": "1-5"}, "'pictures' is required"),
+    # «Other» с действием (тип задания) не принимает свой текст вместо кнопки
+    ({"task": "matching", "matching_type": "Poems to authors"}, "'matching_type': 'Poems to authors' is not one of"),
+    ({"task": "reading_tf", "read_first": "maybe"}, "'read_first': 'maybe' is not one of: Yes, No"),
+    ({"task": "matching", "matching_type": "Other", "first": "  ", "second": "Verbs"}, "'first' is required"),
+    ({"task": "reading_tf", "read_first": "yes", "time": "soon"}, "'time' must be a number"),
+])
+def test_param_errors(params, message):
+    with pytest.raises(ParamError, match=message):
+        build_instruction(params)
+
+
+def test_cli_path_does_not_load_the_bot():
+    # cli и bulk работают без Telegram и сессий: граф сценариев — не через generation
+    code = ("import sys, cli, instructions; "
+            "print(sorted(m for m in ('generation', 'sessions', 'aiogram', 'aiohttp') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_generation_does_not_load_aiogram():
+    code = "import sys, generation; print(sorted(m for m in ('metrics', 'aiogram') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+import leader_lease
+from leader_lease import SQLiteLease
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "lease.db"
+
+
+def test_from_env(monkeypatch, path):
+    monkeypatch.setenv("LEASE_DB", str(path))
+    monkeypatch.setenv("LEASE_TTL", "9")
+    monkeypatch.setenv("LEASE_HEARTBEAT", "2")
+    lease = leader_lease.from_env(holder="a")
+    assert (lease.path, lease.ttl, lease.heartbeat, lease.holder) == (path, 9.0, 2.0, "a")
+
+
+def test_defaults_leave_room_for_missed_heartbeats():
+    assert leader_lease.LEASE_TTL >= leader_lease.LEASE_MIN_RENEWALS * leader_lease.LEASE_HEARTBEAT
+    SQLiteLease(ttl=1.0, heartbeat=0.5)  # секундная аренда — допустимая настройка
+    with pytest.raises(ValueError, match="at least 2 heartbeats"):
+        SQLiteLease(ttl=1.0, heartbeat=0.6)
+
+
+def test_default_failover_is_sub_second(path):
+    assert leader_lease.LEASE_TTL + leader_lease.LEASE_POLL < 1.0
+    leader, standby = SQLiteLease(path, holder="a"), SQLiteLease(path, holder="b")
+
+    async def scenario():
+        assert leader.try_acquire()
+        crashed = time.monotonic()  # лидер больше не продлевает и не отдаёт аренду
+        await standby.wait()
+        return time.monotonic() - crashed
+
+    failover = asyncio.run(scenario())
+    assert leader_lease.LEASE_TTL - 0.05 <= failover < 1.0
+    assert standby.current()[0] == "b"
+    leader.close()
+    standby.close()
+
+
+def test_release_and_expiry_hand_over(path):
+    a = SQLiteLease(path, ttl=0.3, heartbeat=0.05, holder="a")
+    b = SQLiteLease(path, ttl=0.3, heartbeat=0.05, holder="b")
+    assert a.try_acquire() and not b.try_acquire()
+    a.release()
+    assert b.try_acquire() and not a.renew()
+    time.sleep(0.35)
+    assert a.try_acquire() and a.current()[0] == "a"
+    a.close()
+    b.close()
+
+
+def test_hold_reports_lost_lease(path):
+    lease = SQLiteLease(path, ttl=0.3, heartbeat=0.05, holder="a")
+    lost = asyncio.Event()
+
+    async def on_lost():
+        lost.set()
+
+    async def scenario():
+        await lease.wait()
+        async with lease.hold(on_lost=on_lost):
+            conn = sqlite3.connect(path)
+            with conn:
+                conn.execute("UPDATE lease SET holder = 'b'")
+            conn.close()
+            await asyncio.wait_for(lost.wait(), 1)
+        assert lease.lost
+        # аренда 'b' не продлевается: резерв дожидается срока и снова лидер
+        await lease.wait()
+        async with lease.hold(on_lost=on_lost):
+            pass
+        assert not lease.lost
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import logging
+import queue
+import sys
+
+from log_pipeline import DroppingQueueHandler
+
+
+def make_record():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        return logging.getLogger("test").makeRecord(
+            "test", logging.ERROR, __file__, 1, "update %s failed", ("42",), sys.exc_info())
+
+
+def test_local_queue_defers_formatting():
+    q = queue.Queue()
+    handler = DroppingQueueHandler(q)
+    record = make_record()
+    handler.handle(record)
+    queued = q.get_nowait()
+    # ни сообщение, ни traceback здесь не собраны — это работа listener'а
+    assert queued is not record
+    assert (queued.msg, queued.args) == ("update %s failed", ("42",))
+    assert queued.exc_info is not None and queued.exc_text is None
+    text = logging.Formatter("%(message)s").format(queued)
+    assert text.startswith("update 42 failed\nTraceback") and "RuntimeError: boom" in text
+
+
+def test_process_queue_gets_formatted_record():
+    q = queue.Queue()
+    DroppingQueueHandler(q, pickle=True).handle(make_record())
+    queued = q.get_nowait()
+    assert queued.args is None and queued.exc_info is None
+    assert queued.msg.startswith("update 42 failed\nTraceback")
+
+
+def test_full_queue_counts_drops():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        handler.handle(make_record())
+    assert handler.dropped == 2
@@ -0,0 +1,69 @@
+import pytest
+
+from routing import CompiledRouter, route_text
+
+
+def handler(name):
+    async def h(*args):
+        return name
+    h.__name__ = name
+    return h
+
+
+@pytest.fixture
+def router():
+    r = CompiledRouter()
+    r.button("/menu")(handler("menu"))
+    r.button("Help", except_states=("feedback",))(handler("help"))
+    r.on("step", "Yes")(handler("step_yes"))
+    r.on("step", "Help")(handler("step_help"))
+    r.on("feedback", "/menu")(handler("feedback_menu"))
+    r.default("step", handler("step_default"))
+    r.default("feedback", handler("feedback_text"))
+    r.fallback(handler("fallback"))
+    r.compile(states=("other",))
+    return r
+
+
+@pytest.mark.parametrize("state, text, expected", [
+    # глобальная кнопка — в любом состоянии, даже если у состояния своя
+    ("step", "/menu", "menu"),
+    ("feedback", "/menu", "menu"),
+    (None, "/menu", "menu"),
+    # кнопка состояния сильнее глобальной с except_states
+    ("step", "Help", "step_help"),
+    ("other", "Help", "help"),
+    (None, "Help", "help"),
+    # исключённое состояние: кнопка уходит в обработчик по умолчанию
+    ("feedback", "Help", "feedback_text"),
+    ("step", "Yes", "step_yes"),
+    # свободный ввод
+    ("step", "anything", "step_default"),
+    (None, "Yes", "fallback"),
+    ("other", "anything", "fallback"),
+    # состояние, не известное при compile (сессия после переименования шага), —
+    # глобальные кнопки работают, остальное — в fallback
+    ("unknown", "/menu", "menu"),
+    ("unknown", "Help", "help"),
+    ("unknown", "Yes", "fallback"),
+])
+def test_precedence(router, state, text, expected):
+    assert router.resolve(state, text).__name__ == expected
+
+
+def test_commands_match_without_arguments_and_mentions(router):
+    assert router.resolve(None, "/menu@some_bot extra").__name__ == "menu"
+    assert route_text("/formulate matching 1-5") == "/formulate"
+    assert route_text("Yes please") == "Yes please"
+    assert route_text(None) is None
+
+
+def test_registration_after_compile_needs_recompile(router):
+    router.button("/new")(handler("new"))
+    assert router.resolve(None, "/new").__name__ == "fallback"
+    router.compile()
+    assert router.resolve(None, "/new").__name__ == "new"
+
+
+def test_texts_lists_every_button(router):
+    assert router.texts() == {"/menu", "Help", "Yes"}
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+
+import send_scheduler
+from send_scheduler import SendScheduler
+
+CHAT = 1001
+
+
+async def send_all(scheduler, methods):
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method.__api_method__)
+
+    start = time.monotonic()
+    for method in methods:
+        await scheduler(make_request, None, method)
+    return sent, time.monotonic() - start
+
+
+def test_edits_and_callback_answers_skip_the_chat_bucket():
+    # в чат — одно сообщение в 10 секунд: любое ожидание его ведра видно сразу
+    scheduler = SendScheduler(chat_rate=0.1, chat_burst=1)
+    methods = [SendMessage(chat_id=CHAT, text="screen")]
+    methods += [EditMessageText(chat_id=CHAT, message_id=1, text=f"step {i}") for i in range(5)]
+    methods += [AnswerCallbackQuery(callback_query_id=str(i)) for i in range(5)]
+    sent, elapsed = asyncio.run(send_all(scheduler, methods))
+    assert len(sent) == 11 and elapsed < 1
+
+
+def test_edits_still_take_global_tokens():
+    scheduler = SendScheduler(rate=1, burst=4)
+    asyncio.run(send_all(scheduler, [EditMessageText(chat_id=CHAT, message_id=1, text="x")] * 3))
+    assert scheduler._global.bucket.tokens < 2
+    assert CHAT not in scheduler._chats
+
+
+def test_new_messages_wait_for_the_chat_bucket():
+    scheduler = SendScheduler(chat_rate=20, chat_burst=1)
+    sent, elapsed = asyncio.run(send_all(scheduler, [SendMessage(chat_id=CHAT, text="x")] * 3))
+    assert len(sent) == 3 and elapsed >= 0.09
+
+
+def test_throttled_methods():
+    assert send_scheduler.throttled(EditMessageText(chat_id=CHAT, message_id=1, text="x"))
+    assert not send_scheduler.throttled(AnswerCallbackQuery(callback_query_id="1"))
+    assert not send_scheduler.chat_limited(EditMessageText(chat_id=CHAT, message_id=1, text="x"))
+    assert send_scheduler.chat_limited(SendMessage(chat_id=CHAT, text="x"))
@@ -0,0 +1,107 @@
+from sessions import Session, SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class MemoryBackend:
+    """save/load/keys как у SQLiteSessionBackend, без диска."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def start(self, max_age):
+        pass
+
+    def keys(self, max_age):
+        return set(self.rows)
+
+    def save(self, items):
+        for chat_id, blob in items:
+            if blob is None:
+                self.rows.pop(chat_id, None)
+            else:
+                self.rows[chat_id] = blob
+
+    def load(self, chat_id, max_age):
+        return self.rows.get(chat_id)
+
+    def close(self):
+        pass
+
+
+def test_idle_session_expires_after_ttl():
+    clock = Clock()
+    store = SessionStore(ttl=10, clock=clock)
+    store.get_or_create(1).state = "step"
+    clock.now = 10
+    assert store.get(1).state == "step"  # ровно TTL — ещё жива, и обращение продлевает её
+    clock.now = 20.5
+    assert store.get(1) is None
+    assert store.expirations == 1
+
+
+def test_sweep_removes_expired_head_without_touching_it():
+    clock = Clock()
+    store = SessionStore(ttl=10, sweep_batch=2, clock=clock)
+    for chat_id in (1, 2, 3):
+        store.get_or_create(chat_id)
+    clock.now = 5
+    store.get_or_create(4)
+    clock.now = 12
+    store.get(4)
+    # за одно обращение — не больше sweep_batch протухших с головы
+    assert len(store) == 2
+    store.get(4)
+    assert len(store) == 1 and 4 in store
+
+
+def test_lru_evicts_least_recently_used():
+    clock = Clock()
+    store = SessionStore(ttl=100, max_size=2, clock=clock)
+    store.get_or_create(1)
+    store.get_or_create(2)
+    store.get(1)  # 2 теперь самый старый
+    store.get_or_create(3)
+    assert 1 in store and 3 in store and 2 not in store
+    assert store.evictions == 1
+
+
+def test_evicted_session_is_saved_and_loaded_back():
+    clock = Clock()
+    backend = MemoryBackend()
+    store = SessionStore(ttl=100, max_size=1, clock=clock, backend=backend)
+    store.open()
+    store.get_or_create(1).state = "step"
+    store.get_or_create(2)
+    assert 1 not in store and 1 in backend.rows
+    assert store.get(1).state == "step"
+    assert store.loads == 1
+
+
+def test_expired_session_is_erased_from_backend_on_flush():
+    clock = Clock()
+    backend = MemoryBackend()
+    store = SessionStore(ttl=10, clock=clock, backend=backend)
+    store.open()
+    store.get_or_create(1).state = "step"
+    store.flush_dirty()
+    assert 1 in backend.rows
+    clock.now = 11
+    assert store.get(1) is None
+    store.flush_dirty()
+    assert 1 not in backend.rows
+
+
+def test_empty_session_is_not_persisted():
+    backend = MemoryBackend()
+    store = SessionStore(backend=backend)
+    store.open()
+    store.put(1, Session())
+    store.flush_dirty()
+    assert backend.rows == {}
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.methods import GetUpdates, SendMessage
+
+from update_ledger import DedupMiddleware, ResumeOffset, UpdateLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UpdateLedger(tmp_path / "updates.db", window=64)
+    yield ledger
+    ledger.close()
+
+
+def test_claim_done_and_offset(ledger):
+    assert ledger.offset is None
+    assert ledger.claim(100) and ledger.claim(101)
+    assert not ledger.claim(100)            # уже в работе
+    ledger.done(101)
+    assert ledger.offset == 100             # 100 ещё в работе — продолжать с неё
+    ledger.done(100)
+    assert ledger.offset == 102
+    assert not ledger.claim(100) and not ledger.claim(101)
+    assert ledger.duplicates == 3
+
+
+def test_window_slides(ledger):
+    ledger.claim(1000)
+    ledger.done(1000)
+    base = ledger.base
+    ledger.claim(1000 + 100)
+    ledger.done(1000 + 100)
+    # окно уехало вперёд: всё ниже base — обработано, даже если его не видели
+    assert ledger.base == 1100 - 63 > base
+    assert ledger.seen(ledger.base - 1)
+    assert not ledger.seen(1099) and ledger.seen(1100)
+    # не по порядку, но в окне — учитывается
+    assert ledger.claim(1090)
+    ledger.done(1090)
+    assert ledger.seen(1090) and ledger.offset == 1101
+
+
+def test_restart_resumes_from_saved_state(tmp_path, ledger):
+    for update_id in (5, 6, 8):
+        ledger.claim(update_id)
+    ledger.done(5)
+    ledger.done(8)
+    asyncio.run(ledger.flush())             # 6 ещё в работе
+
+    restarted = UpdateLedger(tmp_path / "updates.db", window=64)
+    restarted.load()
+    assert restarted.offset == 6
+    assert not restarted.claim(5) and not restarted.claim(8)
+    assert restarted.claim(6)
+    restarted.close()
+
+
+def test_snapshot_only_when_dirty(ledger):
+    assert ledger.snapshot() is None
+    ledger.claim(1)
+    ledger.done(1)
+    assert ledger.snapshot() == (2, ledger.base, ledger.bits)
+    assert ledger.snapshot() is None
+
+
+def test_dedup_middleware_marks_failed_updates_done(ledger):
+    dedup = DedupMiddleware(ledger)
+    calls = []
+
+    async def handler(event, data):
+        calls.append(event.update_id)
+        if event.update_id == 2:
+            raise RuntimeError("boom")
+        return "ok"
+
+    async def scenario():
+        assert await dedup(handler, SimpleNamespace(update_id=1), {}) == "ok"
+        with pytest.raises(RuntimeError):
+            await dedup(handler, SimpleNamespace(update_id=2), {})
+        assert await dedup(handler, SimpleNamespace(update_id=1), {}) is None
+        assert await dedup(handler, SimpleNamespace(update_id=2), {}) is None
+
+    asyncio.run(scenario())
+    assert calls == [1, 2] and ledger.offset == 3 and not ledger.in_flight
+
+
+def test_resume_offset_fills_only_missing_getupdates_offset(ledger):
+    resume = ResumeOffset(ledger)
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method)
+
+    async def scenario():
+        await resume(make_request, None, GetUpdates())
+        ledger.claim(40)
+        ledger.done(40)
+        for method in (GetUpdates(), GetUpdates(offset=7), SendMessage(chat_id=1, text="x")):
+            await resume(make_request, None, method)
+
+    asyncio.run(scenario())
+    # учёт пуст — offset не трогаем; дальше — с учёта, явный offset не меняем
+    assert [getattr(m, "offset", "-") for m in sent] == [None, 41, 7, "-"]
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+import db_utils
+import usage_stats
+from usage_stats import DAY_MS, UsageRollups
+
+DAY = 20_000
+
+
+def classify(text):
+    if text.startswith("DONE: "):
+        return usage_stats.DONE, text[len("DONE: "):]
+    if text == "Matching" or text.startswith("/formulate matching"):
+        return usage_stats.START, "matching"
+    return None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_PATH", tmp_path / "logs.db")
+    db_utils.init_db()
+    return db_utils.DB_PATH
+
+
+@pytest.fixture
+def rollups(db):
+    rollups = UsageRollups(db, classify=classify)
+    yield rollups
+    rollups.close()
+
+
+def write(db, rows):
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.executemany(db_utils._INSERT, db_utils.Encoder().encode(conn, [
+            (user_id, None, day * DAY_MS + i, action, detail) for i, (user_id, day, action, detail) in enumerate(rows)
+        ]))
+    conn.close()
+
+
+def test_daily_users_counted_once_across_batches(db, rollups):
+    write(db, [(1, DAY, "Help", None), (2, DAY, "Help", None), (1, DAY, "Matching", None),
+               (1, DAY + 1, "Help", None)])
+    assert rollups.fold_all(batch=2) == 4
+    write(db, [(1, DAY, "Help", None), (3, DAY, "Help", None)])
+    assert rollups.fold_all(batch=2) == 2
+
+    report = rollups.report(now=(DAY + 1) * DAY_MS / 1000)
+    assert report.dau == {DAY: 3, DAY + 1: 1} and report.pending == 0
+
+
+def test_scenarios_count_commands_with_free_text_arguments(db, rollups):
+    write(db, [(1, DAY, "Matching", None), (1, DAY, "/formulate ", "matching sentences"),
+               (1, DAY, "DONE: matching", None), (2, DAY, "", "matching")])
+    rollups.fold_all()
+    report = rollups.report(now=DAY * DAY_MS / 1000)
+    assert report.scenarios == [("matching", 2, 1)]
+    assert dict(report.actions)[""] == 1
+    assert "(typed text)" in usage_stats.format_report(report)
+
+
+def test_kind_cache_is_bounded(db, rollups, monkeypatch):
+    monkeypatch.setattr(usage_stats, "STATS_KIND_CACHE", 2)
+    write(db, [(1, DAY, f"Button {i}", None) for i in range(5)])
+    assert rollups.fold_all() == 5
+    assert len(rollups._kinds) <= 2
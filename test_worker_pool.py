@@ -0,0 +1,61 @@
+import asyncio
+import queue
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import GetMe
+from aiogram.types import Update
+
+import update_ledger
+import worker_pool
+
+TOKEN = "42:TEST"
+
+
+def test_forwarded_request_times_out():
+    async def scenario():
+        requests, replies = queue.Queue(), queue.Queue()
+        session = worker_pool.ForwardingSession(0, requests, replies)
+        session.start()
+        bot = Bot(TOKEN, session=session)
+        with pytest.raises(TelegramNetworkError, match="timeout"):
+            await session.make_request(bot, GetMe(), timeout=0.05)
+        # родитель ответил поздно — ответ никого не ждёт и просто теряется
+        request_id = requests.get_nowait()[1]
+        assert session._waiting == {}
+        session._on_reply((request_id, ("ok", {})))
+        await session.close()
+
+    asyncio.run(scenario())
+
+
+class FakePool:
+    def __init__(self):
+        self.dispatched = []
+
+    async def dispatch(self, update):
+        self.dispatched.append(update["update_id"])
+
+
+def test_forward_skips_updates_already_handed_over(tmp_path):
+    async def scenario():
+        ledger = update_ledger.UpdateLedger(tmp_path / "updates.db")
+        pool = FakePool()
+        updates = [Update(update_id=i) for i in (10, 11, 11, 12)]
+        for update in updates:
+            await worker_pool._forward(pool, ledger, update)
+        assert pool.dispatched == [10, 11, 12] and ledger.offset == 13
+        await ledger.flush()
+
+        # рестарт родителя: та же пачка ещё раз
+        restarted = update_ledger.UpdateLedger(tmp_path / "updates.db")
+        restarted.load()
+        again = FakePool()
+        for update in updates:
+            await worker_pool._forward(again, restarted, update)
+        assert again.dispatched == [] and restarted.offset == 13
+        ledger.close()
+        restarted.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.methods import GetUpdates
+
+# Какие update_id уже обработаны. Telegram подтверждает пачку getUpdates
+# только следующим запросом, так что после остановки (деплой, передача
+# аренды резерву) последняя пачка приходит снова — и без учёта хендлеры
+# прогоняются второй раз: повторные ответы и дубли строк в logs. Здесь:
+#   - окно последних UPDATE_WINDOW id — битовая маска от base: всё ниже
+#     base считается обработанным, бит i — апдейт base + i;
+#   - offset, с которого безопасно продолжить опрос: наименьший апдейт
+#     в работе или следующий за последним обработанным;
+# и то и другое раз в UPDATE_FLUSH_INTERVAL пишется одной строкой в SQLite.
+# DedupMiddleware отсекает повтор раньше всех мидлварей и хендлеров,
+# ResumeOffset подставляет сохранённый offset в первый getUpdates.
+
+UPDATE_DB_PATH = Path("updates.db")
+UPDATE_LEDGER_NAME = "polling"
+UPDATE_WINDOW = 8192           # id в окне дедупликации (1 КБ маски)
+UPDATE_FLUSH_INTERVAL = 1.0    # сек
+UPDATE_DRAIN_TIMEOUT = 10.0    # сек: на остановке ждём апдейты в работе, прежде чем записать учёт
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS update_ledger (
+    name TEXT PRIMARY KEY,
+    next_offset INTEGER NOT NULL,
+    base INTEGER NOT NULL,
+    bits BLOB NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class UpdateLedger:
+    """
+    Учёт обработанных апдейтов одного получателя (name): основной бот —
+    "polling", воркеры worker_pool — каждый свой. Методы claim/done —
+    из event loop, без диска; запись — снимок из loop, сам диск в потоке.
+    """
+
+    def __init__(self, path: Path | str = UPDATE_DB_PATH, name: str = UPDATE_LEDGER_NAME,
+                 window: int = UPDATE_WINDOW):
+        self.path = Path(path)
+        self.name = name
+        self.window = window
+        self.base: Optional[int] = None   # None — ещё не видели ни одного апдейта
+        self.bits = 0
+        self.max_done: Optional[int] = None
+        self.saved_offset: Optional[int] = None
+        self.in_flight: set[int] = set()
+        self.duplicates = 0
+        self._dirty = False
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    # ---------- учёт (event loop) ----------
+    def seen(self, update_id: int) -> bool:
+        if update_id in self.in_flight:
+            return True
+        if self.base is None:
+            return False
+        offset = update_id - self.base
+        return offset < 0 or (offset < self.window and bool(self.bits >> offset & 1))
+
+    def claim(self, update_id: int) -> bool:
+        """Взять апдейт в работу; False — он уже обработан или обрабатывается."""
+        if self.seen(update_id):
+            self.duplicates += 1
+            return False
+        if self.base is None:
+            # запас назад: webhook может прислать соседние апдейты не по порядку
+            self.base = update_id - self.window // 2
+        self.in_flight.add(update_id)
+        return True
+
+    def done(self, update_id: int) -> None:
+        self.in_flight.discard(update_id)
+        offset = update_id - self.base
+        if offset >= self.window:
+            # окно едет вперёд; всё, что ушло ниже base, считается обработанным
+            shift = offset - self.window + 1
+            self.bits >>= shift
+            self.base += shift
+            offset -= shift
+        if offset >= 0:
+            self.bits |= 1 << offset
+        if self.max_done is None or update_id > self.max_done:
+            self.max_done = update_id
+        self._dirty = True
+
+    @property
+    def offset(self) -> Optional[int]:
+        """С какого update_id продолжать getUpdates, не потеряв необработанное."""
+        if self.in_flight:
+            return min(self.in_flight)
+        if self.max_done is not None:
+            return self.max_done + 1
+        return self.saved_offset
+
+    # ---------- диск (load/write — из потока) ----------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def load(self) -> None:
+        """Восстановить окно и offset после рестарта (до первого апдейта)."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT next_offset, base, bits FROM update_ledger WHERE name = ?", (self.name,)).fetchone()
+        # повторный захват аренды: учёт мог вести другой экземпляр — своё забываем
+        self.max_done = None
+        if row is None:
+            return
+        self.saved_offset, self.base = row[0], row[1]
+        self.bits = int.from_bytes(row[2], "little")
+        logger.info("Update ledger %r: resume from update_id %d", self.name, self.saved_offset)
+
+    def snapshot(self) -> Optional[tuple[int, int, int]]:
+        """(offset, base, bits) для write — из event loop; None — писать нечего."""
+        if not self._dirty or self.base is None or self.offset is None:
+            return None
+        self._dirty = False
+        return self.offset, self.base, self.bits
+
+    def write(self, snapshot: tuple[int, int, int]) -> None:
+        offset, base, bits = snapshot
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO update_ledger (name, next_offset, base, bits, updated) VALUES (?,?,?,?,?)",
+                (self.name, offset, base, bits.to_bytes(self.window // 8, "little"), time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def wait_idle(self, timeout: float = UPDATE_DRAIN_TIMEOUT) -> None:
+        """Дождаться апдейтов в работе (остановка): их завершение тоже попадёт в учёт."""
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.in_flight:
+            logger.warning("Update ledger: %d updates still in flight at shutdown", len(self.in_flight))
+
+    async def flush(self) -> None:
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            await asyncio.to_thread(self.write, snapshot)
+
+    async def flush_periodically(self, interval: float = UPDATE_FLUSH_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except sqlite3.Error:
+                logger.exception("Update ledger flush failed")
+
+
+class DedupMiddleware(BaseMiddleware):
+    """
+    Внешняя мидлварь апдейта, первой после встроенных мидлварей aiogram:
+    повтор не доходит ни до очередей чатов, ни до DBLoggerMiddleware.
+    Апдейт с исключением тоже считается обработанным: polling aiogram
+    его не повторяет, и мы не повторим побочные эффекты.
+    """
+
+    def __init__(self, ledger: UpdateLedger):
+        self.ledger = ledger
+
+    async def __call__(self, handler, event, data) -> Any:
+        update_id = event.update_id
+        if not self.ledger.claim(update_id):
+            logger.info("Update id=%d is a duplicate, skipped", update_id)
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self.ledger.done(update_id)
+
+
+class ResumeOffset(BaseRequestMiddleware):
+    """
+    Мидлварь сессии Bot: getUpdates без offset (start_polling и catch_up
+    начинают с None — и после каждого нового захвата аренды) продолжает
+    с offset учёта — всё, что раньше, уже обработано, и Telegram считает
+    его подтверждённым.
+    """
+
+    def __init__(self, ledger: UpdateLedger):
+        self.ledger = ledger
+
+    async def __call__(self, make_request, bot, method) -> Any:
+        if isinstance(method, GetUpdates) and method.offset is None and self.ledger.offset is not None:
+            method = method.model_copy(update={"offset": self.ledger.offset})
+        return await make_request(bot, method)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from db_utils import DB_PATH
+
+# Сводки использования для /stats. Сырые events растут без предела, и
+# любой вопрос «что сегодня» к ним — скан по индексу за весь период.
+# Здесь — материализованные сводки в том же logs.db:
+#   - stats_hourly_actions: нажатия по (час, действие);
+#   - stats_daily_scenarios: старты и завершения сценариев по дням;
+#   - stats_daily_users + stats_dau: кто был активен в день и сколько их.
+# Периодическая задача добирает только новые строки events — от отметки
+# stats_watermark (последний учтённый id) — и пишет сводки и отметку
+# одной транзакцией: после падения ни строка не учтётся дважды, ни
+# пропадёт. Отчёт читает ограниченное число строк сводок, сколько бы ни
+# было событий.
+
+STATS_FOLD_INTERVAL = 30.0   # сек
+STATS_FOLD_BATCH = 5_000     # строк events за транзакцию
+STATS_DAYS = 7               # дней в отчёте
+STATS_TOP_ACTIONS = 10       # действий в отчёте
+STATS_KIND_CACHE = 10_000    # разобранных действий в памяти
+
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+
+# действие свободного ввода (пустой текст в actions, сам ввод — в events.detail)
+FREE_TEXT_LABEL = "(typed text)"
+
+# что значит действие для сводки сценариев
+START = "start"
+DONE = "done"
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stats_watermark (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats_hourly_actions (
+    hour INTEGER NOT NULL,
+    action_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, action_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_daily_scenarios (
+    day INTEGER NOT NULL,
+    scenario TEXT NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    completions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, scenario)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_daily_users (
+    day INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (day, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_dau (
+    day INTEGER PRIMARY KEY,
+    users INTEGER NOT NULL
+);
+"""
+
+_WATERMARK = "events"
+
+# текст действия → (START | DONE, сценарий) или None; его знает main.py
+Classify = Callable[[str], Optional[tuple[str, str]]]
+
+
+class Report(NamedTuple):
+    day: int                                  # сегодня, дней от эпохи (UTC)
+    dau: dict[int, int]                       # день → активных пользователей
+    actions: list[tuple[str, int]]            # топ действий за 24 часа
+    scenarios: list[tuple[str, int, int]]     # (сценарий, старты, завершения) за STATS_DAYS
+    pending: int                              # событий ещё не в сводках
+
+
+class UsageRollups:
+    """
+    Сводки по events из logs.db. fold/report — блокирующие, для потока
+    (asyncio.to_thread); соединение одно, под замком, как в update_ledger.
+    """
+
+    def __init__(self, path: Path | str = DB_PATH, classify: Optional[Classify] = None):
+        self.path = Path(path)
+        self.classify = classify or (lambda text: None)
+        self._kinds: dict[int, tuple[Optional[str], Optional[tuple[str, str]]]] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # ---------- сворачивание новых событий ----------
+    def fold(self, batch: int = STATS_FOLD_BATCH) -> int:
+        """Одна пачка событий после отметки; возвращает, сколько учтено."""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                # отметку читаем внутри записи: несколько процессов не учтут пачку дважды
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT last_id FROM stats_watermark WHERE name = ?", (_WATERMARK,)).fetchone()
+                last_id = row[0] if row else 0
+                events = conn.execute(
+                    "SELECT id, user_id, ts, action_id, detail FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch),
+                ).fetchall()
+                if not events:
+                    return 0
+                self._apply(conn, events)
+                conn.execute("INSERT OR REPLACE INTO stats_watermark (name, last_id) VALUES (?, ?)",
+                             (_WATERMARK, events[-1][0]))
+        return len(events)
+
+    def fold_all(self, batch: int = STATS_FOLD_BATCH) -> int:
+        total = 0
+        while (folded := self.fold(batch)) == batch:
+            total += folded
+        return total + folded
+
+    def _apply(self, conn: sqlite3.Connection, events: list[tuple]) -> None:
+        hourly: Counter = Counter()
+        starts: Counter = Counter()
+        completions: Counter = Counter()
+        active: dict[int, set[int]] = {}
+        for _, user_id, ts, action_id, detail in events:
+            day = ts // DAY_MS
+            hourly[ts // HOUR_MS, action_id] += 1
+            active.setdefault(day, set()).add(user_id)
+            kind = self._kind(conn, action_id, detail)
+            if kind is not None:
+                (starts if kind[0] == START else completions)[day, kind[1]] += 1
+
+        conn.executemany(
+            "INSERT INTO stats_hourly_actions (hour, action_id, count) VALUES (?,?,?) "
+            "ON CONFLICT (hour, action_id) DO UPDATE SET count = count + excluded.count",
+            [(hour, action_id, count) for (hour, action_id), count in hourly.items()],
+        )
+        conn.executemany(
+            "INSERT INTO stats_daily_scenarios (day, scenario, starts, completions) VALUES (?,?,?,?) "
+            "ON CONFLICT (day, scenario) DO UPDATE SET starts = starts + excluded.starts, "
+            "completions = completions + excluded.completions",
+            [(day, scenario, starts[day, scenario], completions[day, scenario])
+             for day, scenario in starts.keys() | completions.keys()],
+        )
+        # новый за день пользователь — только тот, кого ещё нет в stats_daily_users:
+        # пропущенные OR IGNORE строки в rowcount пачки не входят
+        new_users = {
+            day: conn.executemany("INSERT OR IGNORE INTO stats_daily_users (day, user_id) VALUES (?,?)",
+                                  [(day, user_id) for user_id in users]).rowcount
+            for day, users in active.items()
+        }
+        conn.executemany(
+            "INSERT INTO stats_dau (day, users) VALUES (?,?) "
+            "ON CONFLICT (day) DO UPDATE SET users = users + excluded.users",
+            [(day, count) for day, count in new_users.items() if count],
+        )
+
+    def _kind(self, conn: sqlite3.Connection, action_id: int, detail: Optional[str]) -> Optional[tuple[str, str]]:
+        # id действий не меняются: текст разбирается один раз (пока он в кэше);
+        # строку со свободным текстом (/formulate <аргументы>) — целиком, без кэша
+        try:
+            text, kind = self._kinds[action_id]
+        except KeyError:
+            row = conn.execute("SELECT text FROM actions WHERE id = ?", (action_id,)).fetchone()
+            text = row[0] if row else None
+            kind = self.classify(text) if row else None
+            if len(self._kinds) >= STATS_KIND_CACHE:
+                self._kinds.clear()
+            self._kinds[action_id] = text, kind
+        if detail is None or text is None:
+            return kind
+        return self.classify(text + detail)
+
+    async def fold_periodically(self, interval: float = STATS_FOLD_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.fold_all)
+            except sqlite3.Error:
+                logger.exception("Usage rollups fold failed")
+
+    # ---------- отчёт ----------
+    def report(self, now: Optional[float] = None) -> Report:
+        """Только сводки: строк не больше, чем дней × сценариев и часов × действий."""
+        now_ms = int((time.time() if now is None else now) * 1000)
+        day, hour = now_ms // DAY_MS, now_ms // HOUR_MS
+        since = day - STATS_DAYS + 1
+        with self._lock:
+            conn = self._db()
+            dau = dict(conn.execute("SELECT day, users FROM stats_dau WHERE day >= ?", (since,)))
+            actions = conn.execute(
+                "SELECT a.text, sum(h.count) FROM stats_hourly_actions h JOIN actions a ON a.id = h.action_id "
+                "WHERE h.hour > ? GROUP BY h.action_id ORDER BY 2 DESC LIMIT ?",
+                (hour - 24, STATS_TOP_ACTIONS),
+            ).fetchall()
+            scenarios = conn.execute(
+                "SELECT scenario, sum(starts), sum(completions) FROM stats_daily_scenarios WHERE day >= ? "
+                "GROUP BY scenario ORDER BY 2 DESC", (since,),
+            ).fetchall()
+            row = conn.execute("SELECT last_id FROM stats_watermark WHERE name = ?", (_WATERMARK,)).fetchone()
+            # max(id) — последний лист B-дерева, не скан
+            last = conn.execute("SELECT max(id) FROM events").fetchone()[0] or 0
+        return Report(day, dau, actions, scenarios, last - (row[0] if row else 0))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def format_report(report: Report) -> str:
+    today = report.dau.get(report.day, 0)
+    yesterday = report.dau.get(report.day - 1, 0)
+    week = " ".join(str(report.dau.get(day, 0)) for day in range(report.day - STATS_DAYS + 1, report.day + 1))
+    lines = [
+        "Usage (UTC)",
+        f"Active users: today {today}, yesterday {yesterday}",
+        f"Last {STATS_DAYS} days: {week}",
+        "",
+        "Top actions, last 24 hours:",
+    ]
+    lines += [f"  {count:>6}  {(text or FREE_TEXT_LABEL)[:40]}" for text, count in report.actions] or ["  none"]
+    lines += ["", f"Scenarios, last {STATS_DAYS} days (started / completed):"]
+    lines += [f"  {scenario}: {started} / {completed}" for scenario, started, completed in report.scenarios] \
+        or ["  none"]
+    if report.pending:
+        lines += ["", f"{report.pending} newest events are not counted yet."]
+    return "\n".join(lines)
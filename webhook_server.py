@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+from typing import Any, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+# Режим webhook вместо start_polling: Telegram сам POST-ит апдейты в
+# локальный aiohttp (обычно за reverse proxy с TLS). Нет долгого опроса,
+# а значит и TelegramConflictError/backoff, когда второй экземпляр бота
+# тоже зовёт getUpdates.
+
+WEBHOOK_HOST = "127.0.0.1"
+WEBHOOK_PORT = 8080
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_CONCURRENCY = 64   # апдейтов в обработке одновременно
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    SimpleRequestHandler с ограничением числа одновременно обрабатываемых апдейтов.
+
+    Апдейт по-прежнему обрабатывается в фоне (Telegram сразу получает 200),
+    но слот берётся до ответа: когда все concurrency слотов заняты, запрос
+    ждёт, и Telegram притормаживает доставку сам, вместо того чтобы у нас
+    копились тысячи задач.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: Optional[str],
+                 concurrency: int = WEBHOOK_CONCURRENCY, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._release)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    def _release(self, task: asyncio.Task) -> None:
+        self._background_feed_update_tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Webhook update failed", exc_info=task.exception())
+
+    async def close(self) -> None:
+        # дообработать принятые апдейты: Telegram их уже не пришлёт повторно
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+HANDLER_KEY = web.AppKey("webhook_handler", BoundedRequestHandler)
+
+
+def build_app(dp: Dispatcher, bot: Bot, secret_token: Optional[str], path: str = WEBHOOK_PATH,
+              concurrency: int = WEBHOOK_CONCURRENCY) -> web.Application:
+    """aiohttp-приложение: POST path → dp; startup/shutdown диспетчера привязаны к приложению."""
+    app = web.Application()
+    handler = app[HANDLER_KEY] = BoundedRequestHandler(dp, bot, secret_token, concurrency)
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    url: Optional[str],
+    secret_token: Optional[str] = None,
+    host: str = WEBHOOK_HOST,
+    port: int = WEBHOOK_PORT,
+    path: str = WEBHOOK_PATH,
+    concurrency: int = WEBHOOK_CONCURRENCY,
+) -> None:
+    """
+    Поднимает сервер и, если задан url (публичный адрес, который проксируется
+    на host:port), регистрирует webhook в Telegram. Без url — только локальный
+    сервер: webhook настроен снаружи или апдейты шлёт локальный стенд.
+    Работает до отмены задачи (Ctrl+C в asyncio.run).
+    """
+    if url and not secret_token:
+        # секрет знают только Telegram и мы: чужие POST-ы на path получат 401
+        secret_token = secrets.token_urlsafe(32)
+    app = build_app(dp, bot, secret_token, path, concurrency)
+    if url:
+        async def register_webhook(_app: web.Application) -> None:
+            await bot.set_webhook(
+                url.rstrip("/") + path,
+                secret_token=secret_token,
+                max_connections=min(concurrency, 100),
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+        app.on_startup.append(register_webhook)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Webhook server on http://%s:%d%s (concurrency %d)", host, port, path, concurrency)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from generation import SCENARIO_GRAPH
+
+# ключи сценариев в порядке реестра
+SCENARIOS = tuple(SCENARIO_GRAPH.scenarios)
+
+# текст, которым обходчик «отвечает» на шаги со свободным вводом
+FREE_TEXT_SAMPLE = "Other"
+# заведомо неверный ответ — чтобы увидеть повторные вопросы с вариантами
+INVALID_SAMPLE = "\x00"
+
+# общий хвост всех сценариев: одинаков для любого пути, раскрываем один раз
+SHARED_STATES = frozenset({"additional_instructions"})
+
+_CHAT = 0
+
+
+@dataclass(frozen=True)
+class Step:
+    scenario: str
+    path: tuple[str, ...]          # тексты кнопок/ввода после старта
+    state: Optional[str]           # состояние ПОСЛЕ шага (None — сценарий завершён)
+    result: dict[str, Any]
+    buttons_only: bool             # на пути не было свободного ввода
+
+    @property
+    def options(self) -> tuple[str, ...]:
+        return tuple(self.result.get("options") or ())
+
+
+def replay(formulator, scenario: str, path: tuple[str, ...], chat_id: int = _CHAT) -> dict[str, Any]:
+    """Проигрывает путь на формуляторе с нуля и возвращает последний ответ."""
+    formulator.reset_session(chat_id)
+    result = formulator.start(chat_id, scenario)
+    for text in path:
+        if formulator.get_state(chat_id) is None:
+            break
+        result = formulator.handle(chat_id, text)
+    return result
+
+
+def iter_steps(factory: Callable[[], Any], include_invalid: bool = False) -> Iterator[Step]:
+    """
+    Обходит все пути мастера: на шагах с кнопками — каждую кнопку,
+    на шагах со свободным вводом — FREE_TEXT_SAMPLE.
+    include_invalid — заодно отдавать ответы на неверный ввод (повторные вопросы).
+    Хвост из SHARED_STATES (доп. инструкции) раскрывается только один раз.
+    """
+    formulator = factory()
+    expanded: set[str] = set()
+    for scenario in SCENARIOS:
+        stack: list[tuple[tuple[str, ...], bool]] = [((), True)]
+        while stack:
+            path, buttons_only = stack.pop()
+            result = replay(formulator, scenario, path)
+            state = formulator.get_state(_CHAT)
+            yield Step(scenario, path, state, result, buttons_only)
+            if state is None:
+                continue
+            if state in SHARED_STATES:
+                if state in expanded:
+                    continue
+                expanded.add(state)
+            if include_invalid:
+                bad = path + (INVALID_SAMPLE,)
+                invalid = replay(formulator, scenario, bad)
+                yield Step(scenario, bad, formulator.get_state(_CHAT), invalid, False)
+            options = result.get("options") or []
+            if options:
+                for option in reversed(options):
+                    stack.append((path + (option,), buttons_only))
+            else:
+                stack.append((path + (FREE_TEXT_SAMPLE,), False))
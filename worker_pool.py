@@ -0,0 +1,473 @@
+"""
+Несколько процессов-обработчиков на один токен.
+
+Родитель только принимает апдейты (long polling под арендой leader_lease
+или webhook) и раскладывает их по N воркерам по hash(chat_id): все
+апдейты чата попадают в один процесс, и там — строго по очереди
+(chat_lanes.py). Каждый
+воркер импортирует main.py целиком и держит свою долю сессий
+CreateTaskFormulation — общих данных в памяти между процессами нет
+(sessions.db и logs.db — общие файлы SQLite в WAL).
+
+Исходящие вызовы Bot API воркеры не делают сами: ForwardingSession
+отправляет метод (и его приоритет) родителю, и единый Sender выполняет
+его через общий send_scheduler — лимит Telegram на бота, а не на процесс.
+bot.log тоже пишет только родитель: воркеры шлют записи ему в очередь.
+
+    python worker_pool.py                 # воркеров по числу ядер
+    python worker_pool.py --workers 4
+    WEBHOOK_MODE=1 python worker_pool.py --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hmac
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import threading
+from os import getenv
+from typing import Any, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram import exceptions as tg_exceptions
+from aiogram.types import TelegramObject
+from dotenv import load_dotenv
+from pydantic import TypeAdapter
+
+import catch_up
+import leader_lease
+import log_pipeline
+import metrics
+import send_scheduler
+import update_ledger
+import webhook_server
+
+POOL_WORKERS = os.cpu_count() or 1
+POOL_QUEUE_SIZE = 10_000        # апдейтов в очереди одного воркера
+POLL_TIMEOUT = 25               # сек: long polling getUpdates
+# типы апдейтов, на которые есть хендлеры в main.py (родитель dp не импортирует)
+UPDATE_TYPES = ["message", "callback_query"]
+
+logger = logging.getLogger("worker_pool")
+
+# события, у которых чат лежит прямо в event["chat"]
+_CHAT_EVENTS = ("message", "edited_message", "channel_post", "edited_channel_post",
+                "business_message", "edited_business_message", "my_chat_member",
+                "chat_member", "chat_join_request", "message_reaction")
+
+
+def update_chat_id(update: dict[str, Any]) -> Optional[int]:
+    """chat_id апдейта Telegram в виде JSON (для личных чатов — id пользователя)."""
+    for key in _CHAT_EVENTS:
+        event = update.get(key)
+        if event:
+            return event["chat"]["id"]
+    query = update.get("callback_query")
+    if query:
+        message = query.get("message")
+        return message["chat"]["id"] if message else query["from"]["id"]
+    for event in update.values():
+        if isinstance(event, dict):
+            user = event.get("from") or event.get("user")
+            if user:
+                return user["id"]
+    return None
+
+
+def shard_of(update: dict[str, Any], workers: int) -> int:
+    chat_id = update_chat_id(update)
+    return hash(chat_id) % workers if chat_id is not None else 0
+
+
+# ---------- провод между процессами ----------
+# ответ Sender'а: ("ok", результат в JSON) | ("api", класс ошибки, текст, доп. поля) | ("error", текст)
+_adapters: dict[Any, TypeAdapter] = {}
+
+
+def _to_wire(result: Any) -> Any:
+    # объекты, привязанные к Bot, не пиклятся — передаём JSON, как его отдал Telegram
+    if isinstance(result, TelegramObject):
+        return result.model_dump(mode="json", exclude_none=True, by_alias=True)
+    if isinstance(result, list):
+        return [_to_wire(item) for item in result]
+    return result
+
+
+def _from_wire(bot: Bot, method, data: Any) -> Any:
+    returning = method.__returning__
+    adapter = _adapters.get(returning)
+    if adapter is None:
+        adapter = _adapters[returning] = TypeAdapter(returning)
+    return adapter.validate_python(data, context={"bot": bot})
+
+
+def _error_to_wire(exc: Exception) -> tuple:
+    if isinstance(exc, tg_exceptions.TelegramAPIError):
+        extra = {k: getattr(exc, k) for k in ("retry_after", "migrate_to_chat_id") if hasattr(exc, k)}
+        return ("api", type(exc).__name__, exc.message, extra)
+    return ("error", repr(exc))
+
+
+def _error_from_wire(method, reply: tuple) -> Exception:
+    if reply[0] == "api":
+        _, name, message, extra = reply
+        cls = getattr(tg_exceptions, name, tg_exceptions.TelegramAPIError)
+        return cls(method=method, message=message, **extra)
+    return tg_exceptions.TelegramNetworkError(method=method, message=reply[1])
+
+
+def _pump(q, loop: asyncio.AbstractEventLoop, callback) -> threading.Thread:
+    """Поток, который перекладывает блокирующий mp.Queue.get в event loop; None — конец."""
+    def run():
+        while True:
+            item = q.get()
+            loop.call_soon_threadsafe(callback, item)
+            if item is None:
+                return
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+# ---------- родитель: общий отправитель ----------
+class Sender:
+    """Выполняет вызовы Bot API всех воркеров одним Bot (с SendScheduler на сессии)."""
+
+    def __init__(self, bot: Bot, requests, replies: list):
+        self.bot = bot
+        self.requests = requests
+        self.replies = replies
+        self.sent = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._done = asyncio.Event()
+
+    def start(self) -> None:
+        _pump(self.requests, asyncio.get_running_loop(), self._on_request)
+
+    def _on_request(self, item) -> None:
+        if item is None:
+            self._done.set()
+            return
+        task = asyncio.create_task(self._send(*item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, worker: int, request_id: int, prio: int, method) -> None:
+        try:
+            with send_scheduler.priority(prio):
+                reply = ("ok", _to_wire(await self.bot(method)))
+        except Exception as e:
+            reply = _error_to_wire(e)
+        self.sent += 1
+        self.replies[worker].put((request_id, reply))
+
+    async def stop(self) -> None:
+        """Дождаться конца потока запросов (воркеры уже вышли) и хвоста отправок."""
+        self.requests.put(None)
+        await self._done.wait()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# ---------- воркер ----------
+class ForwardingSession(BaseSession):
+    """
+    Сессия Bot воркера: метод уходит родителю, ответ приходит обратно.
+    Скачивание файлов (stream_content) — напрямую: это не отправка сообщений.
+    """
+
+    def __init__(self, worker: int, requests, replies):
+        super().__init__()
+        self.worker = worker
+        self.requests = requests
+        self.replies = replies
+        self._ids = itertools.count()
+        self._waiting: dict[int, asyncio.Future] = {}
+        self._http = AiohttpSession()
+
+    def start(self) -> None:
+        _pump(self.replies, asyncio.get_running_loop(), self._on_reply)
+
+    def _on_reply(self, item) -> None:
+        if item is None:
+            return
+        request_id, reply = item
+        future = self._waiting.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result(reply)
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        request_id = next(self._ids)
+        future = self._waiting[request_id] = asyncio.get_running_loop().create_future()
+        self.requests.put((self.worker, request_id, send_scheduler.current_priority(),
+                           method.model_copy().as_(None)))
+        # как у AiohttpSession: вызов, на который не ответили за timeout, — сетевая ошибка;
+        # поздний ответ родителя _on_reply просто не найдёт
+        try:
+            reply = await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            self._waiting.pop(request_id, None)
+            raise tg_exceptions.TelegramNetworkError(method=method, message="Request timeout error") from None
+        if reply[0] == "ok":
+            return _from_wire(bot, method, reply[1])
+        raise _error_from_wire(method, reply)
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        async for chunk in self._http.stream_content(url, headers, timeout, chunk_size, raise_for_status):
+            yield chunk
+
+    async def close(self) -> None:
+        self.replies.put(None)
+        await self._http.close()
+
+
+def _worker(index: int, updates, requests, replies, log_queue) -> None:
+    """Точка входа процесса-воркера (spawn: импортирует main.py заново)."""
+    log_pipeline.forward_to(log_queue)
+    port = int(getenv("METRICS_PORT", 9108))
+    # у каждого воркера свой /metrics: METRICS_PORT + 1 + index
+    os.environ["METRICS_PORT"] = str(port + 1 + index) if port else "0"
+    # и свой учёт обработанных update_id: чаты воркера не меняются, пока не меняется --workers
+    os.environ["UPDATE_LEDGER_NAME"] = f"worker-{index}"
+    import main
+
+    asyncio.run(_worker_loop(main, index, updates, requests, replies))
+
+
+async def _worker_loop(main, index: int, updates, requests, replies) -> None:
+    import metrics
+
+    session = ForwardingSession(index, requests, replies)
+    session.start()
+    bot = Bot(main.BOT_TOKEN, session=session)
+    bot.session.middleware(metrics.RequestTimer())
+    dp = main.dp
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    inbox: asyncio.Queue = asyncio.Queue()
+    _pump(updates, asyncio.get_running_loop(), inbox.put_nowait)
+    # порядок внутри чата и общий лимит держит chat_lanes.ChatLanesMiddleware в dp;
+    # задачи создаются в порядке прихода — в том же порядке встают в очередь чата
+    tasks: set[asyncio.Task] = set()
+
+    logger.info("Worker %d ready", index)
+    try:
+        while (update := await inbox.get()) is not None:
+            task = asyncio.create_task(dp.feed_raw_update(bot, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+class WorkerPool:
+    """Процессы-воркеры, очереди к ним и общий Sender; dispatch() — раскладка апдейта."""
+
+    def __init__(self, bot: Bot, workers: int = POOL_WORKERS,
+                 scheduler: Optional[send_scheduler.SendScheduler] = None, log_handlers=()):
+        self.bot = bot
+        self.workers = workers
+        ctx = mp.get_context("spawn")  # одинаково на Linux и Windows (run.bat)
+        self._log_queue = ctx.Queue(log_pipeline.LOG_QUEUE_SIZE)
+        self._updates = [ctx.Queue(POOL_QUEUE_SIZE) for _ in range(workers)]
+        self._requests = ctx.Queue()
+        self._replies = [ctx.Queue() for _ in range(workers)]
+        self._processes = [
+            ctx.Process(target=_worker, name=f"bot-worker-{i}",
+                        args=(i, self._updates[i], self._requests, self._replies[i], self._log_queue))
+            for i in range(workers)
+        ]
+        # обработчики, которыми родитель пишет записи воркеров (обычно — файл и консоль из setup)
+        self._log_handlers = tuple(log_handlers)
+        bot.session.middleware(scheduler or send_scheduler.SendScheduler())
+        self.sender = Sender(bot, self._requests, self._replies)
+
+    async def start(self) -> None:
+        if self._log_handlers:
+            log_pipeline.listen(self._log_queue, self._log_handlers)
+        self.sender.start()
+        for process in self._processes:
+            process.start()
+        logger.info("Worker pool: %d processes", self.workers)
+
+    async def dispatch(self, update: dict[str, Any]) -> None:
+        q = self._updates[shard_of(update, self.workers)]
+        try:
+            q.put_nowait(update)
+        except queue.Full:
+            # очередь воркера полна — ждём места, не блокируя event loop
+            await asyncio.to_thread(q.put, update)
+
+    async def stop(self) -> None:
+        """Воркеры дообрабатывают очереди, после них — хвост отправок."""
+        for q in self._updates:
+            q.put(None)
+        for process in self._processes:
+            await asyncio.to_thread(process.join)
+        await self.sender.stop()
+
+
+# ---------- приём апдейтов ----------
+async def _forward(pool: WorkerPool, ledger: update_ledger.UpdateLedger, update) -> None:
+    # повтор пачки после рестарта родителя уже отдан воркерам
+    if not ledger.claim(update.update_id):
+        return
+    try:
+        await pool.dispatch(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+    finally:
+        ledger.done(update.update_id)
+
+
+async def receive_polling(bot: Bot, pool: WorkerPool, ledger: update_ledger.UpdateLedger) -> None:
+    """
+    getUpdates → воркеры. Учёт ledger — «отдано воркеру»: первый getUpdates
+    продолжает с сохранённого offset (ResumeOffset на сессии bot), повтор
+    не отдаётся второй раз. Обработку дедуплицируют учёты самих воркеров.
+    """
+    await asyncio.to_thread(ledger.load)
+    flusher = asyncio.create_task(ledger.flush_periodically(
+        float(getenv("UPDATE_FLUSH_INTERVAL", update_ledger.UPDATE_FLUSH_INTERVAL))))
+    try:
+        if getenv("CATCH_UP", "1") != "0":
+            # бэклог после простоя: старое — мимо, с просьбой повторить. Правила
+            # перекрытия нажатий знает только main.py, родитель его не импортирует
+            backlog = await catch_up.drain(bot, UPDATE_TYPES)
+            result = catch_up.plan(backlog, max_age=float(getenv("CATCH_UP_MAX_AGE", catch_up.CATCH_UP_MAX_AGE)))
+            if backlog:
+                catch_up.log_plan(len(backlog), result)
+            catch_up.mark_dropped(ledger, backlog, result)
+            await catch_up.notify_stale(bot, result.stale)
+            for update in result.keep:
+                await _forward(pool, ledger, update)
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                allowed_updates=UPDATE_TYPES, request_timeout=POLL_TIMEOUT + 10)
+            except (tg_exceptions.TelegramNetworkError, tg_exceptions.TelegramServerError,
+                    tg_exceptions.TelegramConflictError) as e:
+                logger.warning("getUpdates failed: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await _forward(pool, ledger, update)
+                offset = update.update_id + 1
+    finally:
+        flusher.cancel()
+        await ledger.flush()
+        await asyncio.to_thread(ledger.close)
+
+
+async def receive_webhook(bot: Bot, pool: WorkerPool, url: Optional[str], secret_token: Optional[str],
+                          host: str, port: int, path: str) -> None:
+    from aiohttp import web
+
+    if url and not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+
+    async def handle(request: web.Request) -> web.Response:
+        if secret_token and not hmac.compare_digest(request.headers.get(webhook_server.SECRET_HEADER, ""),
+                                                    secret_token):
+            return web.Response(body="Unauthorized", status=401)
+        await pool.dispatch(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    if url:
+        await bot.set_webhook(url.rstrip("/") + path, secret_token=secret_token, allowed_updates=UPDATE_TYPES)
+    logger.info("Webhook receiver on http://%s:%d%s", host, port, path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run(workers: int) -> None:
+    load_dotenv()
+    token = getenv("BOT_TOKEN")
+    if not token:
+        raise RuntimeError("BOT_TOKEN is not set. Add it to .env (BOT_TOKEN=1234:ABC...)")
+    listener = log_pipeline.setup(
+        "bot.log",
+        level=getenv("LOG_LEVEL", "INFO"),
+        console=getenv("LOG_CONSOLE", "1") != "0",
+    )
+    bot = Bot(token)
+    # учёт родителя — то же имя, что у main.py: offset getUpdates у токена один
+    ledger = update_ledger.UpdateLedger(
+        getenv("UPDATE_DB", update_ledger.UPDATE_DB_PATH),
+        name=getenv("UPDATE_LEDGER_NAME", update_ledger.UPDATE_LEDGER_NAME),
+    )
+    bot.session.middleware(update_ledger.ResumeOffset(ledger))
+    scheduler = send_scheduler.SendScheduler(
+        rate=float(getenv("SEND_RATE", send_scheduler.SEND_RATE)),
+        burst=float(getenv("SEND_BURST", send_scheduler.SEND_BURST)),
+        chat_rate=float(getenv("SEND_CHAT_RATE", send_scheduler.CHAT_RATE)),
+        chat_burst=float(getenv("SEND_CHAT_BURST", send_scheduler.CHAT_BURST)),
+        group_rate=float(getenv("SEND_GROUP_RATE", send_scheduler.GROUP_RATE)),
+    )
+    pool = WorkerPool(bot, workers, scheduler, listener.handlers)
+    # /metrics родителя — очередь отправок; воркеры — на METRICS_PORT + 1 + index
+    metrics_server = await metrics.start_server(
+        getenv("METRICS_HOST", metrics.METRICS_HOST), int(getenv("METRICS_PORT", metrics.METRICS_PORT)))
+    await pool.start()
+    try:
+        if getenv("WEBHOOK_MODE", "0") == "1":
+            await receive_webhook(
+                bot, pool,
+                url=getenv("WEBHOOK_URL"),
+                secret_token=getenv("WEBHOOK_SECRET"),
+                host=getenv("WEBHOOK_HOST", webhook_server.WEBHOOK_HOST),
+                port=int(getenv("WEBHOOK_PORT", webhook_server.WEBHOOK_PORT)),
+                path=getenv("WEBHOOK_PATH", webhook_server.WEBHOOK_PATH),
+            )
+        else:
+            # опрашивает только держатель аренды, как main.poll_as_leader;
+            # потеряв аренду — обратно в резерв, воркеры при этом живут
+            lease = leader_lease.from_env()
+            while True:
+                await lease.wait()
+                polling = asyncio.create_task(receive_polling(bot, pool, ledger))
+
+                async def stop_polling(polling=polling):
+                    polling.cancel()
+
+                async with lease.hold(on_lost=stop_polling):
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await polling
+                if not lease.lost:
+                    break
+                logger.warning("Polling stopped: lease lost, back to standby")
+    finally:
+        await pool.stop()
+        await metrics.stop_server(metrics_server)
+        await bot.session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=POOL_WORKERS, help="процессов-обработчиков")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()